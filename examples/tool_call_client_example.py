@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field
 
 from openai_proxy import OpenAIProxyToolCallClient
 from openai_proxy.settings import OpenAIProxyClientSettings
+from openai_proxy.tool_call_client import ToolCachePolicy
 
 
 class WhatToDoRequest(BaseModel):
@@ -43,6 +44,7 @@ class ConcreteClient(OpenAIProxyToolCallClient):
 
     @OpenAIProxyToolCallClient.tool(
         description="Get a suggestion about what to do in the given situation.",
+        cache=ToolCachePolicy(ttl_seconds=300),
     )
     async def what_to_do(self, req: WhatToDoRequest) -> WhatToDoResponse:
         if "bored" in req.situation:
@@ -2,6 +2,12 @@ from fastapi import FastAPI
 
 from openai_proxy import routers
 from openai_proxy.exception_handler import endpoints_exception_handler
+from openai_proxy.middlewares import (
+    BodySizeLimitMiddleware,
+    CompressionMiddleware,
+    RequestDecompressionMiddleware,
+)
+from openai_proxy.settings import CompressionSettings, RequestLimitsSettings
 
 
 def create_app() -> FastAPI:
@@ -20,6 +26,30 @@ def create_app() -> FastAPI:
     )
 
     app.include_router(routers.openai_router)
+    app.include_router(routers.metrics_router)
+
+    request_limits_settings = RequestLimitsSettings()
+    app.add_middleware(
+        BodySizeLimitMiddleware,
+        limits=request_limits_settings.max_body_bytes_by_path,
+        default_limit=request_limits_settings.default_max_body_bytes,
+    )
+
+    # добавленные позже middleware оборачивают предыдущие: тело сначала распаковывается,
+    # а лимиты размера применяются уже к распакованным байтам
+    compression_settings = CompressionSettings()
+    app.add_middleware(
+        RequestDecompressionMiddleware,
+        paths=compression_settings.decompress_request_paths,
+    )
+    if compression_settings.responses_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=compression_settings.minimum_size,
+            gzip_level=compression_settings.gzip_level,
+            brotli_quality=compression_settings.brotli_quality,
+            zstd_level=compression_settings.zstd_level,
+        )
 
     app.exception_handler(Exception)(endpoints_exception_handler)
 
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterable, Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Generic, Optional, TypeVar, Union
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+DEFAULT_CONCURRENCY = 8
+
+
+@dataclass(slots=True)
+class BatchResult(Generic[ItemT, ResultT]):
+    """Outcome of one item of a batch: its result or the error of the last attempt."""
+
+    index: int
+    item: ItemT
+    result: Optional[ResultT] = None
+    error: Optional[Exception] = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def unwrap(self) -> ResultT:
+        if self.error is not None:
+            raise self.error
+        return self.result  # type: ignore[return-value]
+
+
+async def map_concurrently(
+    func: Callable[[ItemT], Awaitable[ResultT]],
+    items: Union[Iterable[ItemT], AsyncIterable[ItemT]],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+    retries: int = 0,
+    retry_backoff: float = 0.0,
+) -> AsyncIterator[BatchResult[ItemT, ResultT]]:
+    """
+    Runs func over items, at most concurrency calls at a time, and yields a BatchResult
+    per item: in input order if ordered, otherwise as soon as each call completes.
+    Items are pulled lazily, so items may be an endless async iterable. Failed calls are
+    retried retries times with exponential backoff; the last error is captured in the result.
+    """
+    if concurrency < 1:
+        err = "concurrency must be greater than zero"
+        raise ValueError(err)
+
+    iterator = _aiter(items)
+    pending: set[asyncio.Task[BatchResult[ItemT, ResultT]]] = set()
+    completed: dict[int, BatchResult[ItemT, ResultT]] = {}
+    # в упорядоченном режиме ограничиваем и число готовых, но еще не отданных результатов
+    max_unyielded = 2 * concurrency if ordered else None
+    started = 0
+    yielded = 0
+    exhausted = False
+    try:
+        while True:
+            while (
+                not exhausted
+                and len(pending) < concurrency
+                and (max_unyielded is None or started - yielded < max_unyielded)
+            ):
+                try:
+                    item = await anext(iterator)
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(
+                    asyncio.create_task(_run_item(func, started, item, retries, retry_backoff)),
+                )
+                started += 1
+
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                completed[task.result().index] = task.result()
+
+            for result in _pop_ready(completed, yielded, ordered):
+                yielded += 1
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _pop_ready(
+    completed: dict[int, BatchResult[ItemT, ResultT]],
+    yielded: int,
+    ordered: bool,
+) -> list[BatchResult[ItemT, ResultT]]:
+    if not ordered:
+        return [completed.pop(index) for index in sorted(completed)]
+
+    ready: list[BatchResult[ItemT, ResultT]] = []
+    while yielded + len(ready) in completed:
+        ready.append(completed.pop(yielded + len(ready)))
+    return ready
+
+
+async def _run_item(
+    func: Callable[[ItemT], Awaitable[ResultT]],
+    index: int,
+    item: ItemT,
+    retries: int,
+    retry_backoff: float,
+) -> BatchResult[ItemT, ResultT]:
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return BatchResult(index=index, item=item, result=await func(item), attempts=attempt)
+        except Exception as ex:  # noqa: BLE001
+            # ошибка одного элемента не прерывает пачку
+            if attempt > retries:
+                return BatchResult(index=index, item=item, error=ex, attempts=attempt)
+        await asyncio.sleep(retry_backoff * 2 ** (attempt - 1))
+
+
+async def _aiter(items: Union[Iterable[ItemT], AsyncIterable[ItemT]]) -> AsyncIterator[ItemT]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
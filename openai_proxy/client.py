@@ -1,29 +1,205 @@
-from functools import lru_cache
+from __future__ import annotations
 
-from openai import AsyncOpenAI
+import gzip
+import re
+import time
+from dataclasses import dataclass
+
+import httpx
+from openai import DEFAULT_MAX_RETRIES, AsyncOpenAI, DefaultAsyncHttpxClient
 
 from openai_proxy import openai_compat
-from openai_proxy.settings import (
-    DeepseekOpenAISettings,
-    OfficialOpenAISettings,
-    OpenAISettings,
-    PolzaOpenAISettings,
-)
+from openai_proxy.settings import OpenAIProviderOptions
+
+
+class GzipRequestTransport(httpx.AsyncBaseTransport):
+    """
+    Compresses request bodies sent to providers that accept gzip-encoded requests.
+    Response decompression is negotiated by httpx itself.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        minimum_size: int,
+        level: int = 5,
+    ) -> None:
+        self._transport = transport
+        self._minimum_size = minimum_size
+        self._level = level
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        if len(body) >= self._minimum_size and "content-encoding" not in request.headers:
+            compressed_body = gzip.compress(body, compresslevel=self._level)
+            headers = request.headers.copy()
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(compressed_body))
+            request = httpx.Request(
+                method=request.method,
+                url=request.url,
+                headers=headers,
+                content=compressed_body,
+                extensions=request.extensions,
+            )
+
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class NoRateLimitRetryTransport(httpx.AsyncBaseTransport):
+    """
+    Marks 429 responses as not retryable for the OpenAI SDK, which obeys ``x-should-retry``.
+    Other retryable errors (connection errors, timeouts, 408, 409, 5xx) are still retried
+    by the SDK, while rate limits are left to the caller, e.g. to switch to another key.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+            response.headers["x-should-retry"] = "false"
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+@dataclass(slots=True)
+class RateLimitState:
+    """
+    Provider rate limits parsed from ``x-ratelimit-*`` response headers.
+    Reset times are absolute ``time.monotonic()`` values.
+    """
+
+    remaining_requests: int | None = None
+    remaining_tokens: int | None = None
+    requests_reset_at: float | None = None
+    tokens_reset_at: float | None = None
+
+    @classmethod
+    def from_headers(cls, headers: httpx.Headers, now: float | None = None) -> RateLimitState:
+        now = time.monotonic() if now is None else now
+        requests_reset_in = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        tokens_reset_in = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+        return cls(
+            remaining_requests=_parse_int(headers.get("x-ratelimit-remaining-requests")),
+            remaining_tokens=_parse_int(headers.get("x-ratelimit-remaining-tokens")),
+            requests_reset_at=None if requests_reset_in is None else now + requests_reset_in,
+            tokens_reset_at=None if tokens_reset_in is None else now + tokens_reset_in,
+        )
+
+    def exhausted_until(self) -> float | None:
+        """Time until which the key has no requests or tokens left, if known."""
+
+        reset_times = [
+            reset_at
+            for remaining, reset_at in (
+                (self.remaining_requests, self.requests_reset_at),
+                (self.remaining_tokens, self.tokens_reset_at),
+            )
+            if remaining == 0 and reset_at is not None
+        ]
+        return max(reset_times, default=None)
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parses durations like ``20ms``, ``1s``, ``6m0s`` or a plain number of seconds."""
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART_PATTERN.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * _DURATION_UNIT_SECONDS[unit] for number, unit in parts)
+
+
+def _parse_int(value: str | None) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
 
 
 class OpenAIClient:
-    def __init__(self, settings: OpenAISettings) -> None:
+    def __init__(
+        self,
+        settings: OpenAIProviderOptions,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        *,
+        retry_rate_limits: bool = True,
+    ) -> None:
         self._default_model = settings.default_model
+        self._max_message_size = settings.max_message_size
+        self.rate_limit = RateLimitState()
         self._client = AsyncOpenAI(
             api_key=settings.token,
             base_url=str(settings.base_url),
+            http_client=self._build_http_client(settings, retry_rate_limits=retry_rate_limits),
+            max_retries=max_retries,
+        )
+
+    @staticmethod
+    def _build_http_client(
+        settings: OpenAIProviderOptions,
+        *,
+        retry_rate_limits: bool,
+    ) -> httpx.AsyncClient:
+        transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
         )
+        if settings.compress_requests:
+            transport = GzipRequestTransport(
+                transport,
+                minimum_size=settings.compress_requests_min_size,
+            )
+        if not retry_rate_limits:
+            transport = NoRateLimitRetryTransport(transport)
+
+        return DefaultAsyncHttpxClient(transport=transport)
 
     async def request(
         self,
         request: openai_compat.OpenAICompatibleRequest,
+        *,
+        normalized: bool = False,
     ) -> openai_compat.OpenAICompatibleResponse:
-        payload = openai_compat.normalize_chat_completion_request(request)
+        """
+        Sends a chat completion request to the provider.
+        :param request: request parameters.
+        :param normalized: request already went through normalize_chat_completion_request,
+            only message sizes are checked then.
+        :return: completion or stream of chunks.
+        """
+        if normalized:
+            payload = request
+            openai_compat.ensure_message_sizes(payload, self._max_message_size)
+        else:
+            payload = openai_compat.normalize_chat_completion_request(
+                request,
+                max_message_size=self._max_message_size,
+            )
         if str(payload["model"]) == "auto":
             if self._default_model is None:
                 err = "Provider does not define a default model for automatic routing"
@@ -31,34 +207,9 @@ class OpenAIClient:
 
             payload = {**payload, "model": self._default_model}
 
-        return await self._client.chat.completions.create(**payload)
-
-
-class OfficialOpenAIClient(OpenAIClient):
-    def __init__(self, settings: OfficialOpenAISettings) -> None:
-        super().__init__(settings)
-
-
-class DeepseekOpenAIClient(OpenAIClient):
-    def __init__(self, settings: DeepseekOpenAISettings) -> None:
-        super().__init__(settings)
-
-
-class PolzaOpenAIClient(OpenAIClient):
-    def __init__(self, settings: PolzaOpenAISettings) -> None:
-        super().__init__(settings)
-
-
-@lru_cache
-def get_official_openai_client() -> OfficialOpenAIClient:
-    return OfficialOpenAIClient(OfficialOpenAISettings())
-
-
-@lru_cache
-def get_deepseek_openai_client() -> DeepseekOpenAIClient:
-    return DeepseekOpenAIClient(DeepseekOpenAISettings())
-
+        raw_response = await self._client.chat.completions.with_raw_response.create(**payload)
+        self.rate_limit = RateLimitState.from_headers(raw_response.headers)
+        return raw_response.parse()
 
-@lru_cache
-def get_polza_openai_client() -> PolzaOpenAIClient:
-    return PolzaOpenAIClient(PolzaOpenAISettings())
+    async def close(self) -> None:
+        await self._client.close()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
+
+from loguru import logger
+from openai import OpenAIError, RateLimitError
+
+from openai_proxy import openai_compat
+from openai_proxy.client import OpenAIClient, parse_duration
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+from openai_proxy.settings import OpenAIProviderOptions
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+KeySelection = Literal["round_robin", "least_loaded"]
+
+
+@dataclass(slots=True)
+class PooledKey:
+    index: int
+    client: OpenAIClient
+    weight: float = 1.0
+    in_flight: int = 0
+    current_weight: float = 0.0
+    ejected_until: float = 0.0
+
+    def is_available(self, now: float) -> bool:
+        if self.ejected_until > now:
+            return False
+
+        exhausted_until = self.client.rate_limit.exhausted_until()
+        return exhausted_until is None or exhausted_until <= now
+
+
+class NoAvailableKeysError(OpenAIError):
+    pass
+
+
+class OpenAIClientPool:
+    """
+    Spreads requests of one provider over several API keys or endpoints.
+    A key answering 429 or reporting exhausted ``x-ratelimit-remaining-*`` is ejected
+    until its limit resets, and the request is retried on the next available key.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: Sequence[PooledKey],
+        selection: KeySelection = "round_robin",
+        ejection_seconds: float = 30.0,
+        *,
+        metrics: ProxyMetrics | None = None,
+        now_provider: Callable[[], float] | None = None,
+    ) -> None:
+        if not keys:
+            err = f"Provider {name} pool must contain at least one key"
+            raise ValueError(err)
+
+        self._name = name
+        self._keys = list(keys)
+        self._selection = selection
+        self._ejection_seconds = ejection_seconds
+        self._metrics = metrics or get_proxy_metrics()
+        self._now = now_provider or time.monotonic
+
+    @classmethod
+    def from_options(cls, name: str, options: OpenAIProviderOptions) -> OpenAIClientPool:
+        weights = [key.weight for key in options.keys] or [1.0]
+        return cls(
+            name=name,
+            keys=[
+                # SDK не повторяет только 429: пул сразу переключается на другой ключ,
+                # а сетевые ошибки и 5xx по-прежнему повторяются на том же ключе
+                PooledKey(
+                    index=index,
+                    client=OpenAIClient(key_options, retry_rate_limits=False),
+                    weight=weight,
+                )
+                for index, (key_options, weight) in enumerate(
+                    zip(options.key_options(), weights, strict=True),
+                )
+            ],
+            selection=options.key_selection,
+            ejection_seconds=options.key_ejection_seconds,
+        )
+
+    async def request(
+        self,
+        request: openai_compat.OpenAICompatibleRequest,
+        *,
+        normalized: bool = False,
+    ) -> openai_compat.OpenAICompatibleResponse:
+        tried_keys: set[int] = set()
+        last_error: RateLimitError | None = None
+
+        while (key := self._select_key(tried_keys)) is not None:
+            tried_keys.add(key.index)
+            key.in_flight += 1
+            try:
+                return await key.client.request(request, normalized=normalized)
+            except RateLimitError as ex:
+                last_error = ex
+                self._eject(key, ex)
+            finally:
+                key.in_flight -= 1
+
+        if last_error is not None:
+            raise last_error
+
+        err = f"All keys of provider {self._name} are rate limited"
+        raise NoAvailableKeysError(err)
+
+    async def close(self) -> None:
+        for key in self._keys:
+            await key.client.close()
+
+    def _select_key(self, excluded: set[int]) -> PooledKey | None:
+        now = self._now()
+        candidates = [
+            key for key in self._keys if key.index not in excluded and key.is_available(now)
+        ]
+        if not candidates:
+            return None
+
+        if self._selection == "least_loaded":
+            return min(candidates, key=lambda key: key.in_flight / key.weight)
+
+        # плавный взвешенный round-robin, как в nginx
+        total_weight = sum(key.weight for key in candidates)
+        for key in candidates:
+            key.current_weight += key.weight
+        selected = max(candidates, key=lambda key: key.current_weight)
+        selected.current_weight -= total_weight
+        return selected
+
+    def _eject(self, key: PooledKey, ex: RateLimitError) -> None:
+        retry_after = parse_duration(ex.response.headers.get("retry-after"))
+        ejection_seconds = self._ejection_seconds if retry_after is None else retry_after
+        key.ejected_until = self._now() + ejection_seconds
+        self._metrics.increment(
+            "provider_key_rate_limited_total",
+            provider=self._name,
+            key=str(key.index),
+        )
+        logger.warning(
+            f"Key {key.index} of provider {self._name} is rate limited, "
+            f"ejected for {ejection_seconds:.1f}s: {ex}",
+        )
@@ -1,3 +1,13 @@
 from openai_proxy.code_blocks_parser.parser import CodeBlocksParser
+from openai_proxy.code_blocks_parser.streaming import (
+    StreamingCodeBlocksParser,
+    iter_code_blocks,
+    parse_partial_json,
+)
 
-__all__ = ["CodeBlocksParser"]
+__all__ = [
+    "CodeBlocksParser",
+    "StreamingCodeBlocksParser",
+    "iter_code_blocks",
+    "parse_partial_json",
+]
@@ -1,13 +1,23 @@
 import json
+import re
+from functools import lru_cache
 from typing import Type, TypeVar
 
 from loguru import logger
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
 T = TypeVar("T", bound=BaseModel)
 
+FENCE = "```"
+
 
 class CodeBlocksParser:
+    """
+    Finds JSON in a model answer: either the whole answer is JSON, or it is in ```json blocks.
+    Blocks are found in one scan over the original string by offsets, and validation methods
+    hand slices of the answer straight to pydantic without parsing them with json first.
+    """
+
     def __init__(self, doc: str) -> None:
         self._doc = doc
 
@@ -39,7 +49,57 @@ class CodeBlocksParser:
         error_if_multiple_found: bool = False,
     ) -> str:
         json_blocks = self.find_json_blocks()
+        return self._choose_block(json_blocks, error_if_not_found, error_if_multiple_found)
 
+    def find_and_validate_json_block(
+        self,
+        model: Type[T],
+        error_if_not_found: bool = False,
+        error_if_multiple_found: bool = False,
+    ) -> T:
+        whole_doc = self._validate_whole_doc(model)
+        if whole_doc is not None:
+            return whole_doc
+
+        json_blocks = self._find_code_block_slices("json")
+        json_block = self._choose_block(json_blocks, error_if_not_found, error_if_multiple_found)
+        return model.model_validate_json(json_block)
+
+    def find_and_validate_json_blocks(self, model: Type[T]) -> list[T]:
+        """
+        Validates all json blocks against model in one pydantic call.
+        A block holding several comma-separated values would split into several items
+        of the joined list, so then blocks are validated one by one instead.
+        :param model: model of every block.
+        :return: validated blocks, empty if there are none.
+        """
+        whole_doc = self._validate_whole_doc(model)
+        if whole_doc is not None:
+            return [whole_doc]
+
+        json_blocks = self._find_code_block_slices("json")
+        if not json_blocks:
+            return []
+        result = _list_adapter(model).validate_json(f"[{','.join(json_blocks)}]")
+        if len(result) != len(json_blocks):
+            return [model.model_validate_json(block) for block in json_blocks]
+        return result
+
+    def _validate_whole_doc(self, model: Type[T]) -> T | None:
+        try:
+            return model.model_validate_json(self._doc)
+        except ValidationError as e:
+            # ответ целиком - json, но не той модели: блоки искать бессмысленно
+            if any(error["type"] != "json_invalid" for error in e.errors()):
+                raise
+            return None
+
+    def _choose_block(
+        self,
+        json_blocks: list[str],
+        error_if_not_found: bool,
+        error_if_multiple_found: bool,
+    ) -> str:
         if len(json_blocks) < 1:
             err = f"Json blocks not found: {self._doc}"
             if error_if_not_found:
@@ -57,31 +117,49 @@ class CodeBlocksParser:
 
         return json_blocks[0]
 
-    def find_and_validate_json_block(
-        self,
-        model: Type[T],
-        error_if_not_found: bool = False,
-        error_if_multiple_found: bool = False,
-    ) -> T:
-        json_block = self.find_json_block(error_if_not_found, error_if_multiple_found)
-        return model.model_validate_json(json_block)
-
     def _extract_code_blocks(self, language: str = "") -> list[str]:
-        code_blocks: list[str] = []
-        code_block_lines: list[str] = []
-        is_code_block: bool = False
-        for line in self._doc.split("\n"):
-            if is_code_block and "```" in line:
-                is_code_block = False
-            elif is_code_block:
-                code_block_lines.append(line.strip())
-            elif f"```{language}" in line and code_block_lines:
-                is_code_block = True
-                code_blocks.append("".join(code_block_lines))
-                code_block_lines.clear()
-            elif f"```{language}" in line:
-                is_code_block = True
-        if code_block_lines:
-            code_blocks.append("".join(code_block_lines))
-
-        return code_blocks
+        return [
+            "".join(line.strip() for line in block.split("\n"))
+            for block in self._find_code_block_slices(language)
+        ]
+
+    def _find_code_block_slices(self, language: str = "") -> list[str]:
+        """
+        Returns raw contents of code blocks. A block starts after a line containing
+        ```language and ends before the next line containing ```; a block left open
+        runs to the end of the document.
+        """
+        doc = self._doc
+        opening_pattern = _opening_fence_pattern(language)
+        blocks: list[str] = []
+        position = 0
+        while (opening := opening_pattern.search(doc, position)) is not None:
+            start = doc.find("\n", opening.end())
+            if start == -1:
+                break
+            start += 1
+
+            closing = doc.find(FENCE, start)
+            if closing == -1:
+                blocks.append(doc[start:])
+                break
+
+            end = doc.rfind("\n", start, closing) + 1 or start
+            if end > start:
+                blocks.append(doc[start:end])
+            line_end = doc.find("\n", closing)
+            if line_end == -1:
+                break
+            position = line_end + 1
+        return blocks
+
+
+@lru_cache
+def _opening_fence_pattern(language: str) -> re.Pattern[str]:
+    return re.compile(re.escape(f"{FENCE}{language}"))
+
+
+@lru_cache
+def _list_adapter(model: Type[T]) -> TypeAdapter[list[T]]:
+    # mypy не принимает переменную-класс как параметр типа
+    return TypeAdapter(list[model])  # type: ignore[valid-type]
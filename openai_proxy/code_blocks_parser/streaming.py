@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import itertools
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterable, AsyncIterator
+
+FENCE = "```"
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+class StreamingCodeBlocksParser:
+    """
+    Incremental counterpart of CodeBlocksParser for streamed answers.
+    Feed it text deltas; every code block of the given language is returned as soon as its
+    closing fence arrives, normalized the same way as CodeBlocksParser does it.
+    Only the current line and the open block are kept in memory.
+    """
+
+    def __init__(self, language: str = "json") -> None:
+        self._opening_fence = f"{FENCE}{language}"
+        self._line_parts: list[str] = []
+        # хвост текущей строки, чтобы найти забор, разрезанный между дельтами
+        self._line_end = ""
+        self._block_lines: list[str] = []
+        self._in_block = False
+        # закрывающая строка уже обработана, ее остаток игнорируется
+        self._skip_line = False
+
+    def feed(self, delta: str) -> list[str]:
+        """Consumes a text delta and returns code blocks closed by it."""
+
+        blocks: list[str] = []
+        *lines, tail = delta.split("\n")
+        for line in lines:
+            if not self._skip_line:
+                self._line_parts.append(line)
+                self._process_line("".join(self._line_parts), blocks)
+            self._line_parts.clear()
+            self._line_end = ""
+            self._skip_line = False
+
+        if tail and not self._skip_line:
+            self._line_parts.append(tail)
+            probe = self._line_end + tail
+            if self._in_block and FENCE in probe:
+                self._close_block(blocks)
+                self._line_parts.clear()
+                self._skip_line = True
+            self._line_end = probe[-(len(FENCE) - 1) :]
+        return blocks
+
+    def finish(self) -> list[str]:
+        """Flushes the last line and returns a block left unclosed at the end of the answer."""
+
+        blocks: list[str] = []
+        # последняя строка обрабатывается, даже если пустая, как после split("\n")
+        if not self._skip_line:
+            self._process_line("".join(self._line_parts), blocks)
+        self._line_parts.clear()
+        if self._in_block:
+            self._close_block(blocks)
+        return blocks
+
+    def current_json(self) -> Optional[Any]:
+        """
+        Best-effort parse of the block that is still streaming, e.g. to show partial objects.
+        :return: parsed prefix of the open block or None if nothing can be parsed yet.
+        """
+
+        if not self._in_block:
+            return None
+        text = "".join([*self._block_lines, "".join(self._line_parts).strip()])
+        return parse_partial_json(text)
+
+    def _process_line(self, line: str, blocks: list[str]) -> None:
+        if self._in_block and FENCE in line:
+            self._close_block(blocks)
+        elif self._in_block:
+            self._block_lines.append(line.strip())
+        elif self._opening_fence in line:
+            self._in_block = True
+
+    def _close_block(self, blocks: list[str]) -> None:
+        self._in_block = False
+        if self._block_lines:
+            blocks.append("".join(self._block_lines))
+            self._block_lines.clear()
+
+
+async def iter_code_blocks(
+    deltas: AsyncIterable[str],
+    language: str = "json",
+) -> AsyncIterator[str]:
+    """
+    Yields code blocks from a stream of text deltas, e.g. OpenAIProxyToolCallClient.request_stream.
+    """
+
+    parser = StreamingCodeBlocksParser(language)
+    async for delta in deltas:
+        for block in parser.feed(delta):
+            yield block
+    for block in parser.finish():
+        yield block
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """
+    Parses a prefix of a JSON document: open strings, arrays and objects are closed,
+    an incomplete trailing member is dropped.
+    """
+
+    scan = _scan_json_prefix(text)
+    prefix = text
+    if scan.in_string:
+        prefix = (prefix[:-1] if scan.escaped else prefix) + '"'
+    candidates = itertools.chain(
+        [prefix + scan.closers],
+        (text[:position] + closers for position, closers in reversed(scan.cut_points)),
+    )
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+@dataclass(slots=True)
+class _JsonPrefixScan:
+    closers: str
+    # позиции, на которых префикс можно обрезать, и скобки, закрывающие его в этих позициях
+    cut_points: list[tuple[int, str]]
+    in_string: bool
+    escaped: bool
+
+
+def _scan_json_prefix(text: str) -> _JsonPrefixScan:
+    stack: list[str] = []
+    cut_points: list[tuple[int, str]] = []
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            cut_points.append((index + 1, "".join(reversed(stack))))
+        elif char in "]}" and stack:
+            stack.pop()
+        elif char == ",":
+            cut_points.append((index, "".join(reversed(stack))))
+
+    return _JsonPrefixScan(
+        closers="".join(reversed(stack)),
+        cut_points=cut_points,
+        in_string=in_string,
+        escaped=escaped,
+    )
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import zlib
+from typing import TYPE_CHECKING, Any, Protocol
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None  # type: ignore[assignment]
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+IDENTITY = "identity"
+
+# порядок предпочтения сервера при одинаковом q у клиента
+PREFERRED_ENCODINGS = (ZSTD, BROTLI, GZIP)
+DECOMPRESSION_CHUNK_SIZE = 64 * 1024
+# выход одного среза входа zstd не превышает ~512 KiB
+ZSTD_INPUT_SLICE_SIZE = 16
+
+
+class DecompressionError(ValueError):
+    pass
+
+
+class StreamEncoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class StreamDecoder(Protocol):
+    def decompress(self, data: bytes) -> Iterator[bytes]: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int) -> None:
+        self._compressor = _require(brotli, BROTLI).Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)  # type: ignore[no-any-return]
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()  # type: ignore[no-any-return]
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()  # type: ignore[no-any-return]
+
+
+class ZstdEncoder:
+    def __init__(self, level: int) -> None:
+        zstd = _require(zstandard, ZSTD)
+        self._compressor = zstd.ZstdCompressor(level=level).compressobj()
+        self._flush_mode = zstd.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)  # type: ignore[no-any-return]
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(self._flush_mode)  # type: ignore[no-any-return]
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()  # type: ignore[no-any-return]
+
+
+class GzipDecoder:
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def decompress(self, data: bytes) -> Iterator[bytes]:
+        # отдаем результат кусками, чтобы маленький сжатый блок не раздувался в памяти целиком
+        try:
+            while True:
+                piece = self._decompressor.decompress(data, DECOMPRESSION_CHUNK_SIZE)
+                if piece:
+                    yield piece
+                data = self._decompressor.unconsumed_tail
+                if not data and len(piece) < DECOMPRESSION_CHUNK_SIZE:
+                    return
+        except zlib.error as ex:
+            raise DecompressionError(str(ex)) from ex
+
+    def finish(self) -> bytes:
+        if not self._decompressor.eof:
+            err = "Compressed gzip body is truncated"
+            raise DecompressionError(err)
+        return self._decompressor.flush()
+
+
+class BrotliDecoder:
+    def __init__(self) -> None:
+        self._decompressor = _require(brotli, BROTLI).Decompressor()
+
+    def decompress(self, data: bytes) -> Iterator[bytes]:
+        # как и для gzip, ограничиваем выход одного шага, иначе маленькое тело раздувается целиком
+        try:
+            piece = self._decompressor.process(data, output_buffer_limit=DECOMPRESSION_CHUNK_SIZE)
+            while piece or not self._decompressor.can_accept_more_data():
+                if piece:
+                    yield piece
+                piece = self._decompressor.process(
+                    b"",
+                    output_buffer_limit=DECOMPRESSION_CHUNK_SIZE,
+                )
+        except brotli.error as ex:
+            raise DecompressionError(str(ex)) from ex
+
+    def finish(self) -> bytes:
+        if not self._decompressor.is_finished():
+            err = "Compressed brotli body is truncated"
+            raise DecompressionError(err)
+        return b""
+
+
+class ZstdDecoder:
+    def __init__(self) -> None:
+        self._decompressor = _require(zstandard, ZSTD).ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> Iterator[bytes]:
+        # у decompressobj нет ограничения выхода, а stream_reader не умеет дочитывать вход
+        # по мере прихода, поэтому вход подается маленькими срезами: блок zstd дает
+        # не больше 128 KiB и занимает минимум 4 байта, так что срез ограничивает выход шага
+        view = memoryview(data)
+        try:
+            for start in range(0, len(view), ZSTD_INPUT_SLICE_SIZE):
+                piece = self._decompressor.decompress(view[start : start + ZSTD_INPUT_SLICE_SIZE])
+                for offset in range(0, len(piece), DECOMPRESSION_CHUNK_SIZE):
+                    yield piece[offset : offset + DECOMPRESSION_CHUNK_SIZE]
+        except zstandard.ZstdError as ex:
+            raise DecompressionError(str(ex)) from ex
+
+    def finish(self) -> bytes:
+        if not self._decompressor.eof:
+            err = "Compressed zstd body is truncated"
+            raise DecompressionError(err)
+        return b""
+
+
+def available_encodings() -> tuple[str, ...]:
+    optional_modules = {BROTLI: brotli, ZSTD: zstandard}
+    return tuple(
+        encoding
+        for encoding in PREFERRED_ENCODINGS
+        if encoding not in optional_modules or optional_modules[encoding] is not None
+    )
+
+
+def negotiate_encoding(accept_encoding: str, supported: tuple[str, ...]) -> str | None:
+    """
+    Picks the best encoding from the Accept-Encoding header.
+    Client q-values win, server preference (the order of ``supported``) breaks ties.
+    """
+
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+
+        weight = 1.0
+        param_name, _, param_value = params.strip().partition("=")
+        if param_name.strip() == "q":
+            try:
+                weight = float(param_value)
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    wildcard_weight = weights.get("*", 0.0)
+    best_encoding: str | None = None
+    best_weight = 0.0
+    for encoding in supported:
+        weight = weights.get(encoding, wildcard_weight)
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+
+    return best_encoding
+
+
+def create_encoder(
+    encoding: str,
+    gzip_level: int = 5,
+    brotli_quality: int = 4,
+    zstd_level: int = 3,
+) -> StreamEncoder:
+    if encoding == GZIP:
+        return GzipEncoder(gzip_level)
+    if encoding == BROTLI:
+        return BrotliEncoder(brotli_quality)
+    if encoding == ZSTD:
+        return ZstdEncoder(zstd_level)
+
+    err = f"Unsupported content encoding: {encoding}"
+    raise ValueError(err)
+
+
+def create_decoder(encoding: str) -> StreamDecoder:
+    if encoding == GZIP:
+        return GzipDecoder()
+    if encoding == BROTLI:
+        return BrotliDecoder()
+    if encoding == ZSTD:
+        return ZstdDecoder()
+
+    err = f"Unsupported content encoding: {encoding}"
+    raise ValueError(err)
+
+
+def _require(module: Any, encoding: str) -> Any:
+    if module is None:
+        err = f"Content encoding {encoding} requires an optional dependency to be installed"
+        raise RuntimeError(err)
+    return module
@@ -4,13 +4,17 @@ from fastapi import Request
 from fastapi.responses import JSONResponse
 from loguru import logger
 
-from openai_proxy.services.polza_cost_control import CostLimitExceededError
+from openai_proxy.openai_compat import MessageTooLargeError
+from openai_proxy.services.cost_control import CostLimitExceededError
 
 
 async def endpoints_exception_handler(_: Request, ex: Exception) -> JSONResponse:
     if isinstance(ex, CostLimitExceededError):
         logger.warning(ex)
         return JSONResponse(status_code=429, content={"detail": str(ex)})
+    if isinstance(ex, MessageTooLargeError):
+        logger.warning(ex)
+        return JSONResponse(status_code=413, content={"detail": str(ex)})
     if isinstance(ex, ValueError):
         logger.error(ex)
         return JSONResponse(status_code=400, content={"detail": str(ex)})
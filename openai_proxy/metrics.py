@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from functools import lru_cache
+
+MetricLabels = tuple[tuple[str, str], ...]
+
+
+class ProxyMetrics:
+    """
+    In-process counters of the proxy.
+    Values are kept per label set and exposed as a plain snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._counters: defaultdict[str, defaultdict[MetricLabels, float]] = defaultdict(
+            lambda: defaultdict(float),
+        )
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        self._counters[name][tuple(sorted(labels.items()))] += value
+
+    def get(self, name: str, **labels: str) -> float:
+        counter = self._counters.get(name)
+        if counter is None:
+            return 0
+        return counter.get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self) -> dict[str, list[dict[str, object]]]:
+        return {
+            name: [
+                {"labels": dict(labels), "value": value}
+                for labels, value in counter.items()
+            ]
+            for name, counter in self._counters.items()
+        }
+
+
+@lru_cache
+def get_proxy_metrics() -> ProxyMetrics:
+    return ProxyMetrics()
@@ -0,0 +1,11 @@
+from openai_proxy.middlewares.body_size_limit import BodySizeLimitMiddleware
+from openai_proxy.middlewares.compression import (
+    CompressionMiddleware,
+    RequestDecompressionMiddleware,
+)
+
+__all__ = [
+    "BodySizeLimitMiddleware",
+    "CompressionMiddleware",
+    "RequestDecompressionMiddleware",
+]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from loguru import logger
+
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_ENTITY_TOO_LARGE = 413
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects requests whose body exceeds the limit configured for their path.
+    Declared Content-Length is checked before anything is read, chunked bodies are
+    counted while they are received, so an oversized body is never buffered whole.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Mapping[str, int],
+        default_limit: int | None = None,
+        metrics: ProxyMetrics | None = None,
+    ) -> None:
+        self._app = app
+        self._limits = dict(limits)
+        self._default_limit = default_limit
+        self._metrics = metrics or get_proxy_metrics()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        path: str = scope["path"]
+        limit = self._limits.get(path, self._default_limit)
+        if limit is None:
+            await self._app(scope, receive, send)
+            return
+
+        content_length = self._get_content_length(scope)
+        if content_length is not None and content_length > limit:
+            self._record_rejection(path, content_length, limit)
+            response = JSONResponse(
+                status_code=REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": _build_error_message(limit)},
+            )
+            await response(scope, receive, send)
+            return
+
+        received_bytes = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                received_bytes += len(message.get("body", b""))
+                if received_bytes > limit:
+                    self._record_rejection(path, received_bytes, limit)
+                    # HTTPException пробрасывается FastAPI как есть и превращается в ответ 413
+                    raise HTTPException(
+                        status_code=REQUEST_ENTITY_TOO_LARGE,
+                        detail=_build_error_message(limit),
+                    )
+            return message
+
+        await self._app(scope, limited_receive, send)
+
+    def _record_rejection(self, path: str, rejected_bytes: int, limit: int) -> None:
+        logger.warning(
+            f"Request body to {path} rejected: {rejected_bytes} bytes exceed {limit} bytes limit",
+        )
+        self._metrics.increment("request_body_rejected_total", path=path)
+        self._metrics.increment("request_body_rejected_bytes_total", rejected_bytes, path=path)
+
+    @staticmethod
+    def _get_content_length(scope: Scope) -> int | None:
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+
+def _build_error_message(limit: int) -> str:
+    return f"Request body is too large, maximum allowed size is {limit} bytes"
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from openai_proxy import compression
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterator
+
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UNSUPPORTED_MEDIA_TYPE = 415
+BAD_REQUEST = 400
+# тела потоковых ответов сжимаются и отправляются по событию, без буферизации
+STREAMING_MEDIA_TYPES = ("text/event-stream", "application/x-ndjson")
+
+
+class RequestDecompressionMiddleware:
+    """
+    Accepts request bodies compressed with gzip, br or zstd on the configured paths.
+    The body is decompressed incrementally while the application reads it, so limits
+    applied further down the stack see decompressed bytes.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Collection[str]) -> None:
+        self._app = app
+        self._paths = frozenset(paths)
+        self._supported_encodings = compression.available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self._paths:
+            await self._app(scope, receive, send)
+            return
+
+        encoding = Headers(scope=scope).get("content-encoding", "").strip().lower()
+        if encoding in {"", compression.IDENTITY}:
+            await self._app(scope, receive, send)
+            return
+
+        if encoding not in self._supported_encodings:
+            response = JSONResponse(
+                status_code=UNSUPPORTED_MEDIA_TYPE,
+                content={"detail": f"Unsupported request content encoding: {encoding}"},
+            )
+            await response(scope, receive, send)
+            return
+
+        # размер и кодировка тела меняются, поэтому дальше они не передаются
+        scope = {
+            **scope,
+            "headers": [
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in {b"content-encoding", b"content-length"}
+            ],
+        }
+        await self._app(scope, _DecompressingReceive(receive, encoding), send)
+
+
+class _DecompressingReceive:
+    def __init__(self, receive: Receive, encoding: str) -> None:
+        self._receive = receive
+        self._decoder = compression.create_decoder(encoding)
+        self._pieces: Iterator[bytes] = iter(())
+        self._more_body = True
+        self._body_finished = False
+
+    async def __call__(self) -> Message:
+        try:
+            return await self._receive_decompressed()
+        except compression.DecompressionError as ex:
+            raise HTTPException(
+                status_code=BAD_REQUEST,
+                detail=f"Invalid compressed request body: {ex}",
+            ) from ex
+
+    async def _receive_decompressed(self) -> Message:
+        if self._body_finished:
+            # тело прочитано: дальше приходят только служебные сообщения, например disconnect
+            return await self._receive()
+
+        while True:
+            piece = next(self._pieces, None)
+            if piece is not None:
+                return {"type": "http.request", "body": piece, "more_body": True}
+
+            if not self._more_body:
+                self._body_finished = True
+                tail = self._decoder.finish()
+                return {"type": "http.request", "body": tail, "more_body": False}
+
+            message = await self._receive()
+            if message["type"] != "http.request":
+                return message
+
+            self._more_body = message.get("more_body", False)
+            self._pieces = self._decoder.decompress(message.get("body", b""))
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding accepted by the client.
+    Bodies smaller than ``minimum_size`` are sent as is. Streaming bodies are compressed
+    on the fly, and event streams are flushed after every frame so that each SSE event
+    reaches the client as soon as it is produced.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ) -> None:
+        self._app = app
+        self._minimum_size = minimum_size
+        self._gzip_level = gzip_level
+        self._brotli_quality = brotli_quality
+        self._zstd_level = zstd_level
+        self._supported_encodings = compression.available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        encoding = compression.negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding", ""),
+            self._supported_encodings,
+        )
+        if encoding is None:
+            await self._app(scope, receive, send)
+            return
+
+        await self._app(scope, receive, _CompressingSend(send, encoding, self))
+
+    def create_encoder(self, encoding: str) -> compression.StreamEncoder:
+        return compression.create_encoder(
+            encoding,
+            gzip_level=self._gzip_level,
+            brotli_quality=self._brotli_quality,
+            zstd_level=self._zstd_level,
+        )
+
+    @property
+    def minimum_size(self) -> int:
+        return self._minimum_size
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, middleware: CompressionMiddleware) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._middleware = middleware
+        self._start_message: Message | None = None
+        self._encoder: compression.StreamEncoder | None = None
+        self._flush_every_body = False
+        self._passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self._start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        if self._start_message is not None:
+            await self._start(message)
+            return
+
+        await self._send_compressed(message)
+
+    async def _start(self, message: Message) -> None:
+        start_message = self._start_message
+        if start_message is None:
+            err = "Response has already been started"
+            raise RuntimeError(err)
+        self._start_message = None
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        if "content-encoding" in headers or (
+            not more_body and len(body) < self._middleware.minimum_size
+        ):
+            self._passthrough = True
+            await self._send(start_message)
+            await self._send(message)
+            return
+
+        self._encoder = self._middleware.create_encoder(self._encoding)
+        self._flush_every_body = headers.get("content-type", "").startswith(STREAMING_MEDIA_TYPES)
+        headers["Content-Encoding"] = self._encoding
+        headers.add_vary_header("Accept-Encoding")
+
+        if not more_body:
+            compressed_body = self._encoder.compress(body) + self._encoder.finish()
+            headers["Content-Length"] = str(len(compressed_body))
+            await self._send({**start_message, "headers": headers.raw})
+            await self._send({"type": "http.response.body", "body": compressed_body})
+            return
+
+        if "content-length" in headers:
+            del headers["Content-Length"]
+        await self._send({**start_message, "headers": headers.raw})
+        await self._send_compressed(message)
+
+    async def _send_compressed(self, message: Message) -> None:
+        if self._encoder is None:
+            err = "Response encoder is not initialized"
+            raise RuntimeError(err)
+
+        more_body: bool = message.get("more_body", False)
+        compressed_body = self._encoder.compress(message.get("body", b""))
+        if not more_body:
+            compressed_body += self._encoder.finish()
+        elif self._flush_every_body:
+            compressed_body += self._encoder.flush()
+        elif not compressed_body:
+            return
+
+        await self._send(
+            {"type": "http.response.body", "body": compressed_body, "more_body": more_body},
+        )
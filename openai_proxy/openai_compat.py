@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import itertools
 from collections.abc import AsyncIterator, Iterable, Mapping
 from typing import Any, Protocol, TypeAlias, cast, runtime_checkable
 
@@ -20,6 +21,15 @@ _NON_STREAMING_CHAT_COMPLETION_REQUEST_ADAPTER = TypeAdapter(
 )
 
 
+class MessageTooLargeError(ValueError):
+    def __init__(self, index: int, size: int, max_message_size: int) -> None:
+        message = (
+            f"Message {index} is too large: {size} characters "
+            f"exceed the {max_message_size} characters limit"
+        )
+        super().__init__(message)
+
+
 @runtime_checkable
 class ChatCompletionStreamResponse(Protocol):
     def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]: ...
@@ -32,12 +42,16 @@ OpenAICompatibleResponse: TypeAlias = ChatCompletion | ChatCompletionStreamRespo
 
 def normalize_chat_completion_request(
     request: CompletionCreateParams,
+    max_message_size: int | None = None,
 ) -> OpenAICompatibleRequest:
     validated_request = _CHAT_COMPLETION_REQUEST_ADAPTER.validate_python(request)
-    return cast(
+    normalized_request = cast(
         "OpenAICompatibleRequest",
         _materialize_json_compatible_value(validated_request),
     )
+    if max_message_size is not None:
+        ensure_message_sizes(normalized_request, max_message_size)
+    return normalized_request
 
 
 def normalize_non_streaming_chat_completion_request(
@@ -58,18 +72,87 @@ def is_streaming_chat_completion_response(response: OpenAICompatibleResponse) ->
     return isinstance(response, ChatCompletionStreamResponse)
 
 
+def ensure_message_sizes(
+    request: OpenAICompatibleRequest,
+    max_message_size: int,
+) -> None:
+    for index, message in enumerate(request["messages"]):
+        size = _get_message_content_size(message)
+        if size > max_message_size:
+            raise MessageTooLargeError(index, size, max_message_size)
+
+
+def _get_message_content_size(message: Mapping[str, Any]) -> int:
+    content = message.get("content")
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return len(content)
+
+    # content из частей: учитываем только текстовые
+    return sum(
+        len(part["text"])
+        for part in content
+        if isinstance(part, Mapping) and isinstance(part.get("text"), str)
+    )
+
+
 def _materialize_json_compatible_value(value: Any) -> Any:
-    if isinstance(value, Mapping):
-        return {
-            key: _materialize_json_compatible_value(item)
-            for key, item in value.items()
-            if item is not None
-        }
-
-    if isinstance(value, (str, bytes, bytearray)):
+    """
+    Drops ``None`` values and turns iterables into lists.
+
+    Containers that are already JSON-compatible are returned as is, so only the paths
+    that actually change are copied.
+    """
+
+    # проверки на встроенные типы дешевле isinstance с ABC, поэтому идут первыми
+    if isinstance(value, (str, int, float, bytes, bytearray)):
         return value
 
-    if isinstance(value, Iterable):
-        return [_materialize_json_compatible_value(item) for item in value]
+    if isinstance(value, (dict, Mapping)):
+        return _materialize_mapping(value)
+
+    if isinstance(value, (list, Iterable)):
+        return _materialize_iterable(value)
 
     return value
+
+
+def _materialize_mapping(value: Mapping[Any, Any]) -> dict[Any, Any]:
+    materialized: dict[Any, Any] | None = None if isinstance(value, dict) else {}
+
+    for index, (key, item) in enumerate(value.items()):
+        materialized_item = None if item is None else _materialize_json_compatible_value(item)
+        if materialized is None:
+            if item is not None and materialized_item is item:
+                continue
+
+            # первое изменение: копируем уже пройденные ключи как есть
+            materialized = dict(itertools.islice(value.items(), index))
+
+        if materialized_item is not None:
+            materialized[key] = materialized_item
+
+    if materialized is None:
+        return cast("dict[Any, Any]", value)
+    return materialized
+
+
+def _materialize_iterable(value: Iterable[Any]) -> list[Any]:
+    if not isinstance(value, list):
+        return [_materialize_json_compatible_value(item) for item in value]
+
+    materialized: list[Any] | None = None
+    for index, item in enumerate(value):
+        materialized_item = _materialize_json_compatible_value(item)
+        if materialized is None:
+            if materialized_item is item:
+                continue
+
+            materialized = value[:index]
+
+        materialized.append(materialized_item)
+
+    if materialized is None:
+        return value
+    return materialized
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import typing
 import warnings
 
 import aiohttp
+from loguru import logger
 
 from openai_proxy import schemas
+from openai_proxy.batch import DEFAULT_CONCURRENCY, BatchResult, map_concurrently
 from openai_proxy.settings import OpenAIProxyClientSettings
 
+if typing.TYPE_CHECKING:
+    from types import TracebackType
+
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+
+_T = typing.TypeVar("_T")
+
 
 class OpenAIProxyClient:
+    """
+    Client for the deprecated simplified endpoint.
+    All requests share one aiohttp session with a keep-alive connection pool,
+    so use the client as an async context manager or call close() when done.
+    Failed connections and 429/502/503/504 answers are retried max_retries times
+    with exponential backoff. Timeouts are retried only with retry_timeouts: the request
+    is not idempotent, and the answer may be generated and billed already.
+    """
+
     def __init__(self, settings: typing.Optional[OpenAIProxyClientSettings] = None) -> None:
         self._settings: OpenAIProxyClientSettings = settings or OpenAIProxyClientSettings()
+        self._session: typing.Optional[aiohttp.ClientSession] = None
         warnings.warn(
             (
                 "OpenAIProxyClient is deprecated. "
@@ -21,17 +41,156 @@ class OpenAIProxyClient:
             stacklevel=2,
         )
 
-    def __get_session(self) -> aiohttp.ClientSession:
-        return aiohttp.ClientSession(base_url=str(self._settings.base_url), raise_for_status=True)
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> OpenAIProxyClient:
+        return self
+
+    async def __aexit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc: BaseException | None,
+        _tb: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # сессия создается лениво: ей нужен запущенный event loop
+        if self._session is None or self._session.closed:
+            settings = self._settings
+            self._session = aiohttp.ClientSession(
+                base_url=str(settings.base_url),
+                raise_for_status=True,
+                connector=self._build_connector(),
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.request_timeout,
+                    connect=settings.connect_timeout,
+                ),
+            )
+        return self._session
+
+    def _build_connector(self) -> aiohttp.TCPConnector:
+        settings = self._settings
+        if settings.keepalive_timeout is None:
+            keepalive: dict[str, typing.Any] = {"force_close": True}
+        else:
+            keepalive = {"keepalive_timeout": settings.keepalive_timeout}
+        return aiohttp.TCPConnector(
+            limit=settings.max_connections,
+            limit_per_host=settings.max_connections_per_host,
+            **keepalive,
+        )
 
     async def request(self, request: schemas.OpenAIRequest) -> schemas.OpenAIResponse:
-        async with (
-            self.__get_session() as session,
-            session.post(
+        payload = request.model_dump()
+        return await self._with_retries(lambda: self._post(payload))
+
+    async def request_stream(
+        self,
+        request: schemas.OpenAIRequest,
+    ) -> typing.AsyncIterator[schemas.OpenAIStreamEvent]:
+        """
+        Streams the answer: content deltas as they are generated, then the assembled message.
+        Only opening the stream is retried; errors after the first event are raised as is.
+        The stream is not limited by request_timeout, only by stream_idle_timeout between reads.
+        :param request: request to send, its stream fields are overridden.
+        :return: async iterator of stream events.
+        """
+        settings = self._settings
+        payload = request.model_copy(update={"stream": True, "stream_format": "ndjson"})
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=settings.connect_timeout,
+            sock_read=settings.stream_idle_timeout,
+        )
+        response = await self._with_retries(
+            lambda: self._get_session().post(
                 url="/api/v1/openai/request",
-                json=request.model_dump(),
-                ssl=self._settings.verify_ssl,
-            ) as response,
-        ):
+                json=payload.model_dump(),
+                ssl=settings.verify_ssl,
+                timeout=timeout,
+            ),
+        )
+        async with response:
+            buffer = b""
+            async for data in response.content.iter_any():
+                *lines, buffer = (buffer + data).split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield schemas.OpenAIStreamEvent.model_validate_json(line)
+            if buffer.strip():
+                yield schemas.OpenAIStreamEvent.model_validate_json(buffer)
+
+    async def _with_retries(
+        self,
+        call: typing.Callable[[], typing.Awaitable[_T]],
+    ) -> _T:
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                if attempt >= self._settings.max_retries or not _is_retryable(
+                    ex,
+                    retry_timeouts=self._settings.retry_timeouts,
+                ):
+                    raise
+
+                delay = self._settings.retry_backoff * 2**attempt
+                attempt += 1
+                logger.warning(f"Proxy request failed, retry {attempt} in {delay:.1f}s: {ex!r}")
+                await asyncio.sleep(delay)
+
+    def request_many(
+        self,
+        requests: typing.Union[
+            typing.Iterable[schemas.OpenAIRequest],
+            typing.AsyncIterable[schemas.OpenAIRequest],
+        ],
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+        retries: int = 0,
+        retry_backoff: float = 0.0,
+    ) -> typing.AsyncIterator[BatchResult[schemas.OpenAIRequest, schemas.OpenAIResponse]]:
+        """
+        Sends requests concurrently over the shared connection pool.
+        :param requests: iterable or async iterable of requests, consumed lazily.
+        :param concurrency: max requests in flight.
+        :param ordered: yield results in input order, otherwise as they complete.
+        :param retries: extra attempts of a failed request on top of the transport retries.
+        :param retry_backoff: delay before the first extra attempt, doubled after each one.
+        :return: async iterator of results, a failed request carries its error.
+        """
+        return map_concurrently(
+            self.request,
+            requests,
+            concurrency=concurrency,
+            ordered=ordered,
+            retries=retries,
+            retry_backoff=retry_backoff,
+        )
+
+    async def _post(self, payload: dict[str, typing.Any]) -> schemas.OpenAIResponse:
+        async with self._get_session().post(
+            url="/api/v1/openai/request",
+            json=payload,
+            ssl=self._settings.verify_ssl,
+        ) as response:
             response_json = await response.json()
             return schemas.OpenAIResponse.model_validate(response_json)
+
+
+def _is_retryable(ex: BaseException, retry_timeouts: bool) -> bool:
+    if isinstance(ex, aiohttp.ClientResponseError):
+        return ex.status in RETRYABLE_STATUSES
+    # соединение не установлено, значит запрос точно не отправлен
+    if isinstance(ex, aiohttp.ConnectionTimeoutError) or (
+        isinstance(ex, aiohttp.ClientConnectorError) and not isinstance(ex, aiohttp.ClientSSLError)
+    ):
+        return True
+    # после отправки провайдер мог уже выполнить платный запрос, повтор его продублирует
+    return retry_timeouts and isinstance(ex, asyncio.TimeoutError)
@@ -1,27 +1,98 @@
+import json
 from collections.abc import AsyncIterator
 
+import httpx
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
+from loguru import logger
+from openai import OpenAIError
 from openai.types.chat import ChatCompletion, CompletionCreateParams
 
 from openai_proxy import openai_compat, schemas, services
+from openai_proxy.metrics import get_proxy_metrics
+from openai_proxy.streaming import (
+    DisconnectAwareStreamingResponse,
+    StreamTimeoutError,
+    close_stream,
+    coalesce_frames,
+    get_streaming_settings,
+    record_aborted_stream,
+)
+
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+LEGACY_REQUEST_PATH = "/api/v1/openai/request"
+# ошибки провайдера посреди потока превращаются в событие с ошибкой, а не в обрыв соединения
+UPSTREAM_STREAM_ERRORS = (OpenAIError, httpx.HTTPError)
+LEGACY_STREAM_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
 
 openai_router = APIRouter()
+metrics_router = APIRouter()
 
 
-async def _stream_chat_completion(
+async def _chat_completion_frames(
     stream: openai_compat.ChatCompletionStreamResponse,
-) -> AsyncIterator[str]:
+) -> AsyncIterator[tuple[str, bool]]:
+    """Yields SSE frames of the stream, each with whether it carries generated tokens."""
+
     try:
         async for chunk in stream:
-            yield f"data: {chunk.model_dump_json(exclude_none=True)}\n\n"
-        yield "data: [DONE]\n\n"
+            is_token = any(
+                choice.delta.content or choice.delta.tool_calls for choice in chunk.choices
+            )
+            yield f"data: {chunk.model_dump_json(exclude_none=True)}\n\n", is_token
+        yield "data: [DONE]\n\n", False
+    except StreamTimeoutError as ex:
+        record_aborted_stream(get_proxy_metrics(), ex.reason, CHAT_COMPLETIONS_PATH)
+        error = {"error": {"message": str(ex), "type": "timeout_error", "code": ex.reason}}
+        yield f"data: {json.dumps(error)}\n\n", False
+    except UPSTREAM_STREAM_ERRORS as ex:
+        logger.error(f"Upstream stream failed: {ex!r}")
+        record_aborted_stream(get_proxy_metrics(), "upstream_error", CHAT_COMPLETIONS_PATH)
+        error = {"error": {"message": str(ex), "type": "upstream_error", "code": "upstream_error"}}
+        yield f"data: {json.dumps(error)}\n\n", False
     finally:
-        await stream.close()
+        await close_stream(stream)
+
+
+async def _legacy_event_frames(
+    events: services.LegacyStreamEvents,
+    stream_format: str,
+) -> AsyncIterator[tuple[str, bool]]:
+    try:
+        async for event in events:
+            yield _format_legacy_event(event, stream_format), True
+    except StreamTimeoutError as ex:
+        record_aborted_stream(get_proxy_metrics(), ex.reason, LEGACY_REQUEST_PATH)
+        error_event = schemas.OpenAIStreamEvent(error=str(ex))
+        yield _format_legacy_event(error_event, stream_format), False
+    except UPSTREAM_STREAM_ERRORS as ex:
+        logger.error(f"Upstream stream failed: {ex!r}")
+        record_aborted_stream(get_proxy_metrics(), "upstream_error", LEGACY_REQUEST_PATH)
+        error_event = schemas.OpenAIStreamEvent(error=str(ex))
+        yield _format_legacy_event(error_event, stream_format), False
+    finally:
+        await close_stream(events)
+
+
+def _stream_frames(frames: AsyncIterator[tuple[str, bool]]) -> AsyncIterator[str]:
+    settings = get_streaming_settings()
+    if settings.coalesce_max_delay is None:
+        return _frames_only(frames)
+    return coalesce_frames(frames, settings.coalesce_max_delay, settings.coalesce_max_bytes)
+
+
+async def _frames_only(frames: AsyncIterator[tuple[str, bool]]) -> AsyncIterator[str]:
+    async for frame, _ in frames:
+        yield frame
+
+
+def _format_legacy_event(event: schemas.OpenAIStreamEvent, stream_format: str) -> str:
+    data = event.model_dump_json(exclude_none=True)
+    return f"data: {data}\n\n" if stream_format == "sse" else f"{data}\n"
 
 
 @openai_router.post(
-    "/v1/chat/completions",
+    CHAT_COMPLETIONS_PATH,
     summary="OpenAI-compatible chat completions endpoint",
     description=(
         "Primary endpoint. Accepts the official OpenAI Chat Completions payload and "
@@ -34,23 +105,26 @@ async def chat_completions_handler(
     openai_service: services.OpenAIServiceDep,
     request: CompletionCreateParams,
 ) -> ChatCompletion | StreamingResponse:
-    normalized_request = openai_compat.normalize_chat_completion_request(request)
-    response = await openai_service.request(normalized_request)
+    # нормализует сам сервис
+    response = await openai_service.request(request)
     if openai_compat.is_streaming_chat_completion_response(response):
-        return StreamingResponse(
-            _stream_chat_completion(response),
+        return DisconnectAwareStreamingResponse(
+            _stream_frames(_chat_completion_frames(response)),
             media_type="text/event-stream",
+            upstream=response,
         )
 
     return response
 
 
 @openai_router.post(
-    "/api/v1/openai/request",
+    LEGACY_REQUEST_PATH,
     summary="Deprecated legacy endpoint with simplified schemas",
     description=(
         "Deprecated compatibility layer. It accepts the legacy simplified request schema "
-        "and internally adapts it to the OpenAI-compatible `/v1/chat/completions` endpoint."
+        "and internally adapts it to the OpenAI-compatible `/v1/chat/completions` endpoint. "
+        "With `stream` set, the answer is streamed as SSE or NDJSON `OpenAIStreamEvent`s: "
+        "content deltas followed by the assembled assistant message."
     ),
     tags=["openai"],
     response_model=schemas.OpenAIResponse,
@@ -59,5 +133,23 @@ async def chat_completions_handler(
 async def legacy_request_handler(
     openai_service: services.OpenAIServiceDep,
     request: schemas.OpenAIRequest,
-) -> schemas.OpenAIResponse:
+) -> schemas.OpenAIResponse | StreamingResponse:
+    if request.stream:
+        events = await openai_service.request_legacy_stream(request)
+        return DisconnectAwareStreamingResponse(
+            _stream_frames(_legacy_event_frames(events, request.stream_format)),
+            media_type=LEGACY_STREAM_MEDIA_TYPES[request.stream_format],
+            upstream=events,
+        )
+
     return await openai_service.request_legacy(request)
+
+
+@metrics_router.get(
+    "/metrics",
+    summary="Proxy metrics",
+    description="In-process counters of the proxy worker, e.g. rejected request bodies.",
+    tags=["metrics"],
+)
+async def metrics_handler() -> dict[str, list[dict[str, object]]]:
+    return get_proxy_metrics().snapshot()
@@ -2,12 +2,14 @@
 from __future__ import annotations
 
 from enum import StrEnum
+from functools import lru_cache
 from typing import TYPE_CHECKING, Annotated, Any, Literal, Optional, cast
 
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionMessage,
     ChatCompletionMessageToolCall,
+    ChatCompletionMessageToolCallParam,
     ChatCompletionToolParam,
 )
 from openai.types.chat.chat_completion_message_tool_call import Function
@@ -19,6 +21,11 @@ from openai_proxy import helpers
 if TYPE_CHECKING:
     from openai.types.chat.completion_create_params import CompletionCreateParamsNonStreaming
 
+TOOL_SCHEMA_CACHE_SIZE = 1024
+
+# имя, тип, формат, описание и обязательность аргумента
+ToolParameterKey = tuple[str, str, str, str, bool]
+
 
 class OpenAIModel(StrEnum):
     TURBO = "gpt-3.5-turbo"
@@ -64,6 +71,9 @@ class OpenAIToolParameter(BaseModel):
     def to_gpt(self) -> dict[str, object]:
         return self.model_dump(exclude={"name", "required"})
 
+    def cache_key(self) -> ToolParameterKey:
+        return (self.name, self.type, self.format, self.description, self.required)
+
     @classmethod
     def from_pydantic_field(
         cls,
@@ -101,21 +111,71 @@ class OpenAITool(BaseModel):
     ]
 
     def to_gpt(self) -> ChatCompletionToolParam:
-        properties = {p.name: p.to_gpt() for p in self.parameters}
-        required = [p.name for p in self.parameters if p.required]
+        """
+        Returns the tool schema. Schemas are cached by the tool definition, so
+        repeated tools cost one lookup; the returned dict is shared and must not be mutated.
+        """
+        return _compile_tool_schema(
+            self.name,
+            self.description,
+            tuple(p.cache_key() for p in self.parameters),
+        )
 
-        return ChatCompletionToolParam(
-            type="function",
-            function=FunctionDefinition(
-                name=self.name,
-                description=self.description,
-                parameters=dict(  # noqa
-                    type="object",
-                    properties=properties,
-                    required=required,
-                ),
+    @classmethod
+    def from_pydantic_model(
+        cls,
+        name: str,
+        description: str,
+        model: type[BaseModel],
+    ) -> OpenAITool:
+        """
+        Builds a tool whose arguments are the fields of model. Tools are built once
+        per model, name and description; the returned tool is shared and must not be mutated.
+        """
+        return _tool_from_pydantic_model(cls, name, description, model)
+
+
+@lru_cache(maxsize=TOOL_SCHEMA_CACHE_SIZE)
+def _compile_tool_schema(
+    name: str,
+    description: str,
+    parameters: tuple[ToolParameterKey, ...],
+) -> ChatCompletionToolParam:
+    properties = {
+        p_name: {"type": p_type, "format": p_format, "description": p_description}
+        for p_name, p_type, p_format, p_description, _ in parameters
+    }
+    required = [p_name for p_name, *_, p_required in parameters if p_required]
+
+    return ChatCompletionToolParam(
+        type="function",
+        function=FunctionDefinition(
+            name=name,
+            description=description,
+            parameters=dict(  # noqa
+                type="object",
+                properties=properties,
+                required=required,
             ),
-        )
+        ),
+    )
+
+
+@lru_cache(maxsize=TOOL_SCHEMA_CACHE_SIZE)
+def _tool_from_pydantic_model(
+    cls: type[OpenAITool],
+    name: str,
+    description: str,
+    model: type[BaseModel],
+) -> OpenAITool:
+    return cls(
+        name=name,
+        description=description,
+        parameters=[
+            OpenAIToolParameter.from_pydantic_field(field_name, field_info)
+            for field_name, field_info in model.model_fields.items()
+        ],
+    )
 
 
 class OpenAIMessage(BaseModel):
@@ -144,8 +204,9 @@ class OpenAIMessage(BaseModel):
 
     @classmethod
     def from_gpt(cls, gpt: ChatCompletionMessage) -> OpenAIMessage:
-        return cls(
-            role=gpt.role,
+        # ответ уже провалидирован sdk, поэтому собираем модель без повторной валидации
+        return cls.model_construct(
+            role=OpenAIRole(gpt.role),
             content=gpt.content,
             tool_calls=(
                 [OpenAIToolCall.from_gpt(c) for c in gpt.tool_calls] if gpt.tool_calls else None
@@ -178,12 +239,11 @@ class OpenAIMessage(BaseModel):
                 "tool_call_id": self.tool_call_id,
             }
 
-        message: dict[str, Any] = {
-            "role": self.role.value,
-            "content": self.content,
-        }
+        message: dict[str, Any] = {"role": self.role.value}
+        if self.content is not None:
+            message["content"] = self.content
         if self.tool_calls:
-            message["tool_calls"] = [tool_call.to_gpt() for tool_call in self.tool_calls]
+            message["tool_calls"] = [tool_call.to_gpt_param() for tool_call in self.tool_calls]
         return message
 
 
@@ -206,12 +266,19 @@ class OpenAIToolCall(BaseModel):
 
     @classmethod
     def from_gpt(cls, resp: ChatCompletionMessageToolCall) -> OpenAIToolCall:
-        return cls(
+        return cls.model_construct(
             id=resp.id,
             name=resp.function.name,
             arguments=resp.function.arguments,
         )
 
+    def to_gpt_param(self) -> ChatCompletionMessageToolCallParam:
+        return {
+            "id": self.id,
+            "type": "function",
+            "function": {"name": self.name, "arguments": self.arguments},
+        }
+
     def to_gpt(self) -> ChatCompletionMessageToolCall:
         return ChatCompletionMessageToolCall(
             id=self.id,
@@ -244,6 +311,22 @@ class OpenAIRequest(BaseModel):
         Literal["none", "auto", "required"],
         Field(description="Обязательно ли вызывать тул"),
     ] = "auto"
+    only_new_message: Annotated[
+        bool,
+        Field(
+            description=(
+                "Вернуть в ответе только новое сообщение ассистента, а не всю историю диалога"
+            ),
+        ),
+    ] = False
+    stream: Annotated[
+        bool,
+        Field(description="Отдавать ответ по частям по мере генерации"),
+    ] = False
+    stream_format: Annotated[
+        Literal["sse", "ndjson"],
+        Field(description="Формат потока: server-sent events или json по строке на событие"),
+    ] = "sse"
 
     def to_chat_completion_params(self) -> CompletionCreateParamsNonStreaming:
         model = self.model.value if isinstance(self.model, OpenAIModel) else str(self.model)
@@ -281,4 +364,22 @@ class OpenAIResponse(BaseModel):
         response: ChatCompletion,
     ) -> OpenAIResponse:
         message = OpenAIMessage.from_gpt(response.choices[0].message)
-        return cls(messages=[*request.messages, message])
+        if request.only_new_message:
+            return cls.model_construct(messages=[message])
+        # сообщения запроса уже провалидированы: переиспользуем их без копирования
+        return cls.model_construct(messages=[*request.messages, message])
+
+
+class OpenAIStreamEvent(BaseModel):
+    delta: Annotated[
+        Optional[OpenAIMessage],
+        Field(description="Очередной фрагмент содержимого ответа ассистента"),
+    ] = None
+    message: Annotated[
+        Optional[OpenAIMessage],
+        Field(description="Собранное сообщение ассистента, приходит последним событием"),
+    ] = None
+    error: Annotated[
+        Optional[str],
+        Field(description="Причина обрыва потока, приходит последним событием вместо message"),
+    ] = None
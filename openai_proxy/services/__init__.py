@@ -1,5 +1,6 @@
-from openai_proxy.services.openai_service import OpenAIServiceDep
+from openai_proxy.services.openai_service import LegacyStreamEvents, OpenAIServiceDep
 
 __all__ = [
+    "LegacyStreamEvents",
     "OpenAIServiceDep",
 ]
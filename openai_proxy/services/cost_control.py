@@ -0,0 +1,500 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Protocol, cast
+
+import httpx
+from loguru import logger
+
+from openai_proxy import openai_compat
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+from openai_proxy.services.cost_estimation import CostEstimator, get_cost_estimator
+from openai_proxy.services.model_routing import ProviderName, RequestRoute
+from openai_proxy.settings import CostControlSettings, CostLimitSettings, PolzaCostControlSettings
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionChunk
+
+# провайдер, чей usage.cost уже в рублях
+RUB_COST_PROVIDER: ProviderName = "polza"
+
+
+class CostLimitExceededError(Exception):
+    def __init__(
+        self,
+        total_cost_rub: float,
+        threshold_rub: float,
+        window_seconds: int,
+        estimated_cost_rub: float | None = None,
+        provider: ProviderName | None = None,
+    ) -> None:
+        message = (
+            f"Превышен жесткий лимит стоимости запросов {_format_scope(provider)}: "
+            f"за {_format_window(window_seconds)} накоплено {total_cost_rub:.6f} RUB "
+        )
+        if estimated_cost_rub is not None:
+            message += f"и запрос оценивается в {estimated_cost_rub:.6f} RUB "
+        message += f"при пороге {threshold_rub:.6f} RUB. Повторите запрос позже."
+        super().__init__(message)
+        self.total_cost_rub = total_cost_rub
+        self.threshold_rub = threshold_rub
+        # None - общий лимит всех провайдеров
+        self.provider = provider
+
+    @property
+    def threshold_reached(self) -> bool:
+        """The spend itself reached the threshold, not only together with the estimate."""
+        return self.total_cost_rub >= self.threshold_rub
+
+
+class CostThresholdNotifier(Protocol):
+    async def notify(
+        self,
+        notification_text: str,
+        log_content: str,
+    ) -> None: ...
+
+
+class LogsAPINotifier:
+    def __init__(self, settings: CostControlSettings) -> None:
+        self._settings = settings
+
+    async def notify(
+        self,
+        notification_text: str,
+        log_content: str,
+    ) -> None:
+        if self._settings.logs_api_base_url is None:
+            err = "logs_api_base_url is not configured"
+            raise RuntimeError(err)
+        if self._settings.logs_api_username is None:
+            err = "logs_api_username is not configured"
+            raise RuntimeError(err)
+        if self._settings.logs_api_password is None:
+            err = "logs_api_password is not configured"
+            raise RuntimeError(err)
+
+        payload = {
+            "application_name": self._settings.application_name,
+            "user": self._settings.notification_user,
+            "notification_text": notification_text,
+            "log_content": log_content,
+        }
+        auth = httpx.BasicAuth(
+            self._settings.logs_api_username,
+            self._settings.logs_api_password.get_secret_value(),
+        )
+
+        try:
+            async with httpx.AsyncClient(
+                base_url=str(self._settings.logs_api_base_url).rstrip("/"),
+                auth=auth,
+                timeout=self._settings.logs_api_timeout_seconds,
+            ) as client:
+                response = await client.post("/logs", json=payload)
+                response.raise_for_status()
+        except httpx.HTTPError as ex:
+            logger.exception(f"Unable to send cost notification to logs-api: {ex}")
+
+
+@dataclass(slots=True)
+class CostEntry:
+    created_at: float
+    cost_rub: float
+
+
+class CostWindow:
+    """
+    Costs of one scope (a provider, or all providers for None) over a sliding window.
+    The total is kept running, so adding a cost and reading the total take amortized O(1).
+    """
+
+    def __init__(self, provider: ProviderName | None, limits: CostLimitSettings) -> None:
+        self.provider = provider
+        self.limits = limits
+        self._entries: deque[CostEntry] = deque()
+        self._total_cost_rub = 0.0
+
+    def total(self, now: float) -> float:
+        self._prune_expired_entries(now)
+        return self._total_cost_rub
+
+    def add(self, now: float, cost_rub: float) -> tuple[float, float]:
+        """Adds a cost and returns the totals before and after it."""
+
+        previous_total_cost_rub = self.total(now)
+        self._entries.append(CostEntry(created_at=now, cost_rub=cost_rub))
+        self._total_cost_rub += cost_rub
+        return previous_total_cost_rub, self._total_cost_rub
+
+    def _prune_expired_entries(self, now: float) -> None:
+        cutoff = now - self.limits.window_seconds
+        while self._entries and self._entries[0].created_at <= cutoff:
+            entry = self._entries.popleft()
+            self._total_cost_rub -= entry.cost_rub
+
+        self._total_cost_rub = max(self._total_cost_rub, 0.0)
+
+
+class CostTrackingAsyncStream:
+    def __init__(
+        self,
+        stream: openai_compat.ChatCompletionStreamResponse,
+        cost_control: CostControl,
+        provider: ProviderName,
+        request: Mapping[str, object] | None = None,
+        estimated_cost_rub: float | None = None,
+    ) -> None:
+        self._stream = stream
+        self._iterator: AsyncIterator[ChatCompletionChunk] = stream.__aiter__()
+        self._cost_control = cost_control
+        self._provider = provider
+        self._request = request
+        self._estimated_cost_rub = estimated_cost_rub
+        self._cost_recorded = False
+        self._closed = False
+
+    def __aiter__(self) -> CostTrackingAsyncStream:
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        chunk = await self._iterator.__anext__()
+        # usage приходит одним чанком в конце потока, остальные чанки не разбираем
+        if not self._cost_recorded and _get_usage(chunk) is not None:
+            self._cost_recorded = True
+            await self._cost_control.record_response_cost(
+                provider=self._provider,
+                response=chunk,
+                request=self._request,
+                estimated_cost_rub=self._estimated_cost_rub,
+            )
+        return chunk
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        await self._stream.close()
+
+
+class CostControl:
+    """
+    Tracks the spend of every provider from response usage: the reported cost_rub, or the
+    usage tokens priced by the cost estimator. Spend is limited per provider and in total.
+    """
+
+    def __init__(
+        self,
+        settings: CostControlSettings | None = None,
+        notifier: CostThresholdNotifier | None = None,
+        now_provider: Callable[[], float] | None = None,
+        metrics: ProxyMetrics | None = None,
+        cost_estimator: CostEstimator | None = None,
+    ) -> None:
+        self._settings = settings or CostControlSettings()
+        self._notifier = notifier
+        self._now = now_provider or time.monotonic
+        self._metrics = metrics or get_proxy_metrics()
+        self._cost_estimator = cost_estimator
+        self._total_window = (
+            CostWindow(provider=None, limits=self._settings.total)
+            if self._settings.total.any_limit_enabled
+            else None
+        )
+        self._provider_windows = {
+            provider: CostWindow(provider=provider, limits=limits)
+            for provider, limits in self._settings.providers.items()
+            if limits.any_limit_enabled
+        }
+        self._lock = asyncio.Lock()
+
+    def wrap_stream(
+        self,
+        provider: ProviderName,
+        response: openai_compat.ChatCompletionStreamResponse,
+        request: Mapping[str, object] | None = None,
+        estimated_cost_rub: float | None = None,
+    ) -> openai_compat.ChatCompletionStreamResponse:
+        if not self._windows(provider):
+            return response
+        if isinstance(response, CostTrackingAsyncStream):
+            return response
+
+        return CostTrackingAsyncStream(
+            stream=response,
+            cost_control=self,
+            provider=provider,
+            request=request,
+            estimated_cost_rub=estimated_cost_rub,
+        )
+
+    async def check_hard_limit(
+        self,
+        provider: ProviderName,
+        estimated_cost_rub: float | None = None,
+    ) -> None:
+        """
+        Rejects the request if the spend of the provider or of all providers already reached
+        a hard threshold or would exceed it together with the estimated cost of the request.
+        """
+        for window in self._windows(provider):
+            hard_threshold_rub = window.limits.hard_threshold_rub
+            if hard_threshold_rub is None:
+                continue
+
+            async with self._lock:
+                total_cost_rub = window.total(self._now())
+
+            if total_cost_rub >= hard_threshold_rub or (
+                estimated_cost_rub is not None
+                and total_cost_rub + estimated_cost_rub > hard_threshold_rub
+            ):
+                raise CostLimitExceededError(
+                    total_cost_rub=total_cost_rub,
+                    threshold_rub=hard_threshold_rub,
+                    window_seconds=window.limits.window_seconds,
+                    estimated_cost_rub=estimated_cost_rub,
+                    provider=window.provider,
+                )
+
+    async def record_response_cost(
+        self,
+        provider: ProviderName,
+        response: object,
+        request: Mapping[str, object] | None = None,
+        estimated_cost_rub: float | None = None,
+    ) -> None:
+        windows = self._windows(provider)
+        if not windows:
+            return
+
+        cost_rub = self._get_cost_rub(provider, response, request)
+        if cost_rub is None:
+            logger.debug(f"Unable to get the cost of {provider} response, skipping cost tracking")
+            return
+        if cost_rub <= 0:
+            logger.debug(f"{provider} response cost is non-positive ({cost_rub}), skipping")
+            return
+        if estimated_cost_rub is not None:
+            self._reconcile_estimate(provider, estimated_cost_rub, cost_rub)
+
+        soft_notifications: list[tuple[str, str]] = []
+        async with self._lock:
+            now = self._now()
+            for window in windows:
+                totals = window.add(now, cost_rub)
+                if _crossed(window.limits.soft_threshold_rub, *totals):
+                    soft_notifications.append(
+                        self._build_soft_limit_notification(
+                            window=window,
+                            request=request,
+                            response=response,
+                            request_cost_rub=cost_rub,
+                            current_total_cost_rub=totals[1],
+                        ),
+                    )
+                if _crossed(window.limits.hard_threshold_rub, *totals):
+                    logger.warning(
+                        f"Hard cost limit {_format_scope(window.provider)} crossed: "
+                        f"{totals[1]:.6f} RUB in {_format_window(window.limits.window_seconds)}",
+                    )
+
+        if self._notifier is not None:
+            for notification_text, log_content in soft_notifications:
+                await self._notifier.notify(notification_text, log_content)
+
+    def _windows(self, provider: ProviderName) -> tuple[CostWindow, ...]:
+        provider_window = self._provider_windows.get(provider)
+        return tuple(
+            window for window in (provider_window, self._total_window) if window is not None
+        )
+
+    def _get_cost_rub(
+        self,
+        provider: ProviderName,
+        response: object,
+        request: Mapping[str, object] | None,
+    ) -> float | None:
+        usage = _get_usage(response)
+        if usage is None:
+            return None
+
+        raw_cost = usage.get("cost_rub")
+        if raw_cost is None and provider == RUB_COST_PROVIDER:
+            # только polza отдает в usage.cost рубли, другие провайдеры (OpenRouter) - доллары
+            raw_cost = usage.get("cost")
+        if raw_cost is not None:
+            cost_rub = _parse_cost(raw_cost)
+            if cost_rub is None:
+                logger.warning(f"Unable to parse {provider} response cost: {raw_cost!r}")
+            return cost_rub
+
+        # провайдер не сообщил стоимость - считаем ее по токенам и таблице цен
+        model = request.get("model") if request is not None else None
+        if self._cost_estimator is None or not isinstance(model, str):
+            return None
+        return self._cost_estimator.usage_cost_rub(RequestRoute(provider, model), usage)
+
+    def _reconcile_estimate(
+        self,
+        provider: ProviderName,
+        estimated_cost_rub: float,
+        cost_rub: float,
+    ) -> None:
+        # по отношению сумм видно, насколько таблица цен и оценка токенов расходятся с usage
+        self._metrics.increment("cost_estimated_rub_total", estimated_cost_rub, provider=provider)
+        self._metrics.increment("cost_reconciled_rub_total", cost_rub, provider=provider)
+        logger.debug(
+            f"Request to {provider} was estimated at {estimated_cost_rub:.6f} RUB, "
+            f"actual cost is {cost_rub:.6f} RUB",
+        )
+
+    def _build_soft_limit_notification(
+        self,
+        window: CostWindow,
+        request: Mapping[str, object] | None,
+        response: object,
+        request_cost_rub: float,
+        current_total_cost_rub: float,
+    ) -> tuple[str, str]:
+        soft_threshold_rub = window.limits.soft_threshold_rub
+        if soft_threshold_rub is None:
+            err = "soft_threshold_rub is not configured"
+            raise RuntimeError(err)
+
+        notification_text = (
+            f"Пробит мягкий лимит стоимости запросов {_format_scope(window.provider)}: "
+            f"за {_format_window(window.limits.window_seconds)} накоплено "
+            f"{current_total_cost_rub:.6f} RUB при пороге {soft_threshold_rub:.6f} RUB."
+        )
+        log_content = json.dumps(
+            {
+                "event": "soft_cost_threshold_exceeded",
+                "provider": window.provider,
+                "model": request.get("model") if request is not None else None,
+                "response_id": self._extract_field(response, "id"),
+                "request_cost_rub": request_cost_rub,
+                "current_total_cost_rub": current_total_cost_rub,
+                "soft_threshold_rub": soft_threshold_rub,
+                "hard_threshold_rub": window.limits.hard_threshold_rub,
+                "window_seconds": window.limits.window_seconds,
+                "usage": _get_usage(response),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return notification_text, log_content
+
+    @staticmethod
+    def _extract_field(response: object, field_name: str) -> object | None:
+        if isinstance(response, Mapping):
+            return response.get(field_name)
+        return getattr(response, field_name, None)
+
+
+def _parse_cost(raw_cost: object) -> float | None:
+    if not isinstance(raw_cost, (int, float, str)):
+        return None
+    try:
+        return float(raw_cost)
+    except ValueError:
+        return None
+
+
+def _get_usage(response: object) -> Mapping[str, object] | None:
+    # берем только usage: выгрузка всего ответа стоила бы O(размера ответа) на каждый запрос
+    if isinstance(response, Mapping):
+        return _to_mapping(response.get("usage"))
+    return _to_mapping(getattr(response, "usage", None))
+
+
+def _to_mapping(value: object) -> Mapping[str, object] | None:
+    if value is None:
+        return None
+    if isinstance(value, Mapping):
+        return cast("Mapping[str, object]", value)
+
+    model_dump = getattr(value, "model_dump", None)
+    if callable(model_dump):
+        try:
+            dumped_value = model_dump(exclude_none=True)
+        except TypeError:
+            dumped_value = model_dump()
+
+        if isinstance(dumped_value, Mapping):
+            return cast("Mapping[str, object]", dumped_value)
+
+    model_extra = getattr(value, "model_extra", None)
+    if isinstance(model_extra, Mapping):
+        return cast("Mapping[str, object]", model_extra)
+
+    return None
+
+
+def _crossed(threshold_rub: float | None, previous_total_rub: float, total_rub: float) -> bool:
+    return threshold_rub is not None and previous_total_rub < threshold_rub <= total_rub
+
+
+def _format_scope(provider: ProviderName | None) -> str:
+    if provider is None:
+        return "ко всем провайдерам"
+    return f"к {provider}"
+
+
+def _format_window(window_seconds: int) -> str:
+    if window_seconds % 3600 == 0:
+        hours = window_seconds // 3600
+        if hours == 1:
+            return "последний час"
+        return f"последние {hours} ч."
+
+    if window_seconds % 60 == 0:
+        minutes = window_seconds // 60
+        if minutes == 1:
+            return "последнюю минуту"
+        return f"последние {minutes} мин."
+
+    return f"последние {window_seconds} сек."
+
+
+@lru_cache
+def get_cost_control() -> CostControl:
+    settings = _with_polza_settings(CostControlSettings(), PolzaCostControlSettings())
+    notifier: CostThresholdNotifier | None = None
+    if settings.soft_limit_enabled:
+        notifier = LogsAPINotifier(settings)
+    return CostControl(settings=settings, notifier=notifier, cost_estimator=get_cost_estimator())
+
+
+def _with_polza_settings(
+    settings: CostControlSettings,
+    polza_settings: PolzaCostControlSettings,
+) -> CostControlSettings:
+    if not polza_settings.any_limit_enabled or "polza" in settings.providers:
+        return settings
+
+    logger.warning("POLZA_COST_CONTROL__* settings are deprecated, use COST_CONTROL__PROVIDERS")
+    polza_limits = CostLimitSettings(
+        soft_threshold_rub=polza_settings.soft_threshold_rub,
+        hard_threshold_rub=polza_settings.hard_threshold_rub,
+        window_seconds=polza_settings.window_seconds,
+    )
+    update: dict[str, object] = {"providers": {**settings.providers, "polza": polza_limits}}
+    if settings.logs_api_base_url is None:
+        update |= {
+            "logs_api_base_url": polza_settings.logs_api_base_url,
+            "logs_api_username": polza_settings.logs_api_username,
+            "logs_api_password": polza_settings.logs_api_password,
+            "logs_api_timeout_seconds": polza_settings.logs_api_timeout_seconds,
+            "application_name": polza_settings.application_name,
+            "notification_user": polza_settings.notification_user,
+        }
+    return settings.model_copy(update=update)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from openai_proxy.settings import ModelPrice, PricingSettings
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from openai_proxy import openai_compat
+    from openai_proxy.services.model_routing import RequestRoute
+
+TOKEN_COUNT_CACHE_SIZE = 16 * 1024
+TOKEN_COUNT_DIGEST_SIZE = 16
+# служебные токены разметки чата: на каждое сообщение и на начало ответа
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+# нетекстовые части сообщений (картинки, аудио) оцениваем фиксированно
+NON_TEXT_PART_TOKENS = 765
+
+# приближение BPE-токенизатора: куски слов до 7 букв, числа по 3 цифры, знаки по одному
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]{1,7}|\d{1,3}|[^\w\s]")
+
+
+@dataclass(frozen=True, slots=True)
+class TokenEstimate:
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class TokenCountCache:
+    """
+    LRU cache of token counts keyed by a blake2b digest of the text,
+    so the cache holds 16 bytes per entry instead of the texts themselves.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_COUNT_CACHE_SIZE) -> None:
+        self._max_entries = max_entries
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def count(self, text: str) -> int:
+        key = hashlib.blake2b(
+            text.encode("utf-8", "surrogatepass"),
+            digest_size=TOKEN_COUNT_DIGEST_SIZE,
+        ).digest()
+        count = self._counts.get(key)
+        if count is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return count
+
+        count = self._counts[key] = len(_TOKEN_PATTERN.findall(text))
+        if len(self._counts) > self._max_entries:
+            self._counts.popitem(last=False)
+        return count
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self.hits = 0
+
+
+_token_counts = TokenCountCache()
+
+
+def count_text_tokens(text: str) -> int:
+    """
+    Offline approximation of the number of tokens in text.
+    Counts are cached by a digest of the text, so repeated history messages are counted once.
+    """
+    return _token_counts.count(text)
+
+
+def estimate_prompt_tokens(
+    messages: Iterable[Mapping[str, object]],
+    tools: Iterable[Mapping[str, object]] | None = None,
+) -> int:
+    tokens = REPLY_OVERHEAD_TOKENS + sum(map(_message_tokens, messages))
+    if tools:
+        tokens += count_text_tokens(json.dumps(list(tools), sort_keys=True, ensure_ascii=False))
+    return tokens
+
+
+def _message_tokens(message: Mapping[str, object]) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + _content_tokens(message.get("content"))
+    tool_calls = message.get("tool_calls")
+    if not isinstance(tool_calls, Iterable):
+        return tokens
+
+    for tool_call in tool_calls:
+        function = tool_call.get("function") if isinstance(tool_call, Mapping) else None
+        if isinstance(function, Mapping):
+            tokens += _text_tokens(function.get("name")) + _text_tokens(function.get("arguments"))
+    return tokens
+
+
+def _content_tokens(content: object) -> int:
+    if isinstance(content, str):
+        return count_text_tokens(content)
+    if not isinstance(content, Iterable):
+        return 0
+
+    tokens = 0
+    for part in content:
+        text = part.get("text") if isinstance(part, Mapping) else None
+        tokens += count_text_tokens(text) if isinstance(text, str) else NON_TEXT_PART_TOKENS
+    return tokens
+
+
+def _text_tokens(value: object) -> int:
+    return count_text_tokens(value) if isinstance(value, str) else 0
+
+
+class CostEstimator:
+    """
+    Predicts the cost of a request before it is sent, from estimated prompt tokens,
+    the requested completion limit and the per-model price table.
+    """
+
+    def __init__(self, settings: PricingSettings | None = None) -> None:
+        self._settings = settings or PricingSettings()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._settings.prices)
+
+    def estimate_tokens(self, request: openai_compat.OpenAICompatibleRequest) -> TokenEstimate:
+        completion_tokens = (
+            request.get("max_completion_tokens")
+            or request.get("max_tokens")
+            or self._settings.default_completion_tokens
+        )
+        return TokenEstimate(
+            prompt_tokens=estimate_prompt_tokens(request["messages"], request.get("tools")),
+            completion_tokens=completion_tokens,
+        )
+
+    def get_price(self, route: RequestRoute) -> ModelPrice | None:
+        prices = self._settings.prices
+        return prices.get(f"{route.provider}:{route.model}") or prices.get(route.model)
+
+    def estimate_cost_rub(self, route: RequestRoute, tokens: TokenEstimate) -> float | None:
+        price = self.get_price(route)
+        if price is None:
+            return None
+
+        return (
+            tokens.prompt_tokens * price.input_rub_per_million
+            + tokens.completion_tokens * price.output_rub_per_million
+        ) / 1_000_000
+
+    def usage_cost_rub(self, route: RequestRoute, usage: Mapping[str, object]) -> float | None:
+        """Prices the prompt and completion tokens reported in response usage."""
+
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        if not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+            return None
+
+        tokens = TokenEstimate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return self.estimate_cost_rub(route, tokens)
+
+    def order_routes(
+        self,
+        routes: Sequence[RequestRoute],
+        tokens: TokenEstimate,
+    ) -> Sequence[RequestRoute]:
+        """Orders routes from the cheapest to the most expensive for large prompts."""
+
+        threshold = self._settings.cheap_routing_prompt_tokens
+        if threshold is None or tokens.prompt_tokens < threshold or len(routes) <= 1:
+            return routes
+
+        def route_cost(route: RequestRoute) -> float:
+            cost = self.estimate_cost_rub(route, tokens)
+            # маршруты без цены оставляем в конце, в исходном порядке
+            return float("inf") if cost is None else cost
+
+        return sorted(routes, key=route_cost)
+
+
+@lru_cache
+def get_cost_estimator() -> CostEstimator:
+    return CostEstimator(settings=PricingSettings())
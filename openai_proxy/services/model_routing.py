@@ -1,16 +1,43 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal, cast
+from functools import lru_cache
+from typing import TYPE_CHECKING, TypeAlias, cast
+
+from loguru import logger
 
 from openai_proxy import openai_compat, schemas
+from openai_proxy.services.provider_registry import get_provider_registry
+from openai_proxy.settings import ProviderRegistrySettings, RouteSettings
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Sequence
 
-ProviderName = Literal["official", "deepseek", "polza"]
+ProviderName: TypeAlias = str
 
 DEFAULT_ROUTE_ATTEMPTS = 3
 AUTO_OFFICIAL_MODEL = "gpt-4o"
 AUTO_POLZA_MODEL = "deepseek/deepseek-chat"
 
+BUILTIN_PROVIDERS: tuple[ProviderName, ...] = ("official", "deepseek", "polza")
+DEFAULT_AUTO_ROUTES: tuple[RouteSettings, ...] = (
+    RouteSettings(
+        provider="deepseek",
+        model=schemas.OpenAIModel.DEEPSEEK.value,
+        attempts=DEFAULT_ROUTE_ATTEMPTS,
+    ),
+    RouteSettings(
+        provider="official",
+        model=AUTO_OFFICIAL_MODEL,
+        attempts=DEFAULT_ROUTE_ATTEMPTS,
+    ),
+    RouteSettings(
+        provider="polza",
+        model=AUTO_POLZA_MODEL,
+        attempts=DEFAULT_ROUTE_ATTEMPTS,
+    ),
+)
+
 
 @dataclass(frozen=True)
 class RequestRoute:
@@ -26,59 +53,54 @@ class RequestRoute:
 
 
 class ModelRouter:
+    """
+    Resolves a requested model into provider routes.
+    ``<provider>:<model>`` targets any known provider, ``auto`` follows the auto chain.
+    """
+
+    def __init__(
+        self,
+        providers: Collection[ProviderName] = BUILTIN_PROVIDERS,
+        auto_routes: Sequence[RouteSettings] | None = None,
+        default_provider: ProviderName = "official",
+    ) -> None:
+        self._providers = frozenset(providers)
+        self._default_provider = default_provider
+        if auto_routes is None:
+            auto_routes = DEFAULT_AUTO_ROUTES
+        self._auto_routes = [
+            RequestRoute(provider=route.provider, model=route.model, attempts=route.attempts)
+            for route in auto_routes
+            if route.provider in self._providers
+        ]
+        skipped_providers = sorted(
+            {route.provider for route in auto_routes} - self._providers,
+        )
+        if skipped_providers:
+            logger.warning(f"Auto routes skip unknown providers: {skipped_providers}")
+
     def build_routes(self, model: str | schemas.OpenAIModel | None) -> list[RequestRoute]:
         model_str = self._normalize_model(model)
 
         if model_str in {None, "", "auto"}:
-            return [
-                RequestRoute(
-                    provider="deepseek",
-                    model=schemas.OpenAIModel.DEEPSEEK.value,
-                    attempts=DEFAULT_ROUTE_ATTEMPTS,
-                ),
-                RequestRoute(
-                    provider="official",
-                    model=AUTO_OFFICIAL_MODEL,
-                    attempts=DEFAULT_ROUTE_ATTEMPTS,
-                ),
-                RequestRoute(
-                    provider="polza",
-                    model=AUTO_POLZA_MODEL,
-                    attempts=DEFAULT_ROUTE_ATTEMPTS,
-                ),
-            ]
+            return list(self._auto_routes)
 
-        if model_str.startswith("deepseek:"):
+        provider, separator, pure_model = model_str.partition(":")
+        if separator and provider in self._providers:
             return [
                 RequestRoute(
-                    provider="deepseek",
-                    model=self._strip_prefix(model_str, "deepseek:"),
-                ),
-            ]
-
-        if model_str.startswith("official:"):
-            return [
-                RequestRoute(
-                    provider="official",
-                    model=self._strip_prefix(model_str, "official:"),
-                ),
-            ]
-
-        if model_str.startswith("polza:"):
-            return [
-                RequestRoute(
-                    provider="polza",
-                    model=self._strip_prefix(model_str, "polza:"),
+                    provider=provider,
+                    model=self._strip_prefix(pure_model, f"{provider}:"),
                 ),
             ]
 
         if model_str in {
             schemas.OpenAIModel.DEEPSEEK.value,
             schemas.OpenAIModel.DEEPSEEK_FAST.value,
-        }:
+        } and "deepseek" in self._providers:
             return [RequestRoute(provider="deepseek", model=model_str)]
 
-        return [RequestRoute(provider="official", model=model_str)]
+        return [RequestRoute(provider=self._default_provider, model=model_str)]
 
     @staticmethod
     def _normalize_model(model: str | schemas.OpenAIModel | None) -> str | None:
@@ -89,10 +111,19 @@ class ModelRouter:
         return str(model)
 
     @staticmethod
-    def _strip_prefix(model: str, prefix: str) -> str:
-        pure_model = model.removeprefix(prefix)
+    def _strip_prefix(pure_model: str, prefix: str) -> str:
         if pure_model:
             return pure_model
 
         err = f"Model name must follow the '{prefix}' prefix"
         raise ValueError(err)
+
+
+@lru_cache
+def get_model_router() -> ModelRouter:
+    settings = ProviderRegistrySettings()
+    return ModelRouter(
+        providers=get_provider_registry().names,
+        auto_routes=settings.auto_routes,
+        default_provider=settings.default_provider,
+    )
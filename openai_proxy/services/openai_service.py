@@ -1,40 +1,52 @@
+from __future__ import annotations
+
 from functools import lru_cache
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, cast
 
 from fastapi import Depends
 from loguru import logger
 from openai import OpenAIError
 
 from openai_proxy import openai_compat, schemas
-from openai_proxy.client import (
-    DeepseekOpenAIClient,
-    OfficialOpenAIClient,
-    PolzaOpenAIClient,
-    get_deepseek_openai_client,
-    get_official_openai_client,
-    get_polza_openai_client,
+from openai_proxy.services.cost_control import (
+    CostControl,
+    CostLimitExceededError,
+    get_cost_control,
+)
+from openai_proxy.services.cost_estimation import (
+    CostEstimator,
+    TokenEstimate,
+    get_cost_estimator,
 )
-from openai_proxy.services.model_routing import ModelRouter, ProviderName
-from openai_proxy.services.polza_cost_control import (
-    PolzaCostControl,
-    get_polza_cost_control,
+from openai_proxy.services.model_routing import ModelRouter, RequestRoute, get_model_router
+from openai_proxy.services.provider_registry import ProviderRegistry, get_provider_registry
+from openai_proxy.services.stream_failover import FailoverAsyncStream
+from openai_proxy.settings import StreamingSettings
+from openai_proxy.streaming import (
+    TimeLimitedAsyncStream,
+    ToolCallsAssembler,
+    close_stream,
+    get_streaming_settings,
 )
 
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
 
 class OpenAIService:
     def __init__(
         self,
-        official_client: OfficialOpenAIClient,
-        deepseek_client: DeepseekOpenAIClient,
-        polza_client: PolzaOpenAIClient,
+        providers: ProviderRegistry,
         model_router: ModelRouter | None = None,
-        polza_cost_control: PolzaCostControl | None = None,
+        cost_control: CostControl | None = None,
+        streaming_settings: StreamingSettings | None = None,
+        cost_estimator: CostEstimator | None = None,
     ) -> None:
-        self._official = official_client
-        self._deepseek = deepseek_client
-        self._polza = polza_client
-        self._model_router = model_router or ModelRouter()
-        self._polza_cost_control = polza_cost_control
+        self._providers = providers
+        self._model_router = model_router or ModelRouter(providers=providers.names)
+        self._cost_control = cost_control
+        self._streaming_settings = streaming_settings
+        self._cost_estimator = cost_estimator
 
     async def request(
         self,
@@ -42,32 +54,93 @@ class OpenAIService:
     ) -> openai_compat.OpenAICompatibleResponse:
         """Routes an OpenAI-compatible chat completion request to the right provider."""
 
-        req = openai_compat.normalize_chat_completion_request(req)
-        last_error: OpenAIError | None = None
+        return await self._request_normalized(openai_compat.normalize_chat_completion_request(req))
+
+    async def request_legacy(self, req: schemas.OpenAIRequest) -> schemas.OpenAIResponse:
+        # параметры собраны из уже провалидированных схем, нормализация не нужна ни здесь,
+        # ни в клиенте провайдера
+        response = await self._request_normalized(req.to_chat_completion_params())
+        if openai_compat.is_streaming_chat_completion_response(response):
+            err = "Legacy endpoint does not support streaming responses"
+            raise TypeError(err)
 
-        for route in self._model_router.build_routes(req.get("model")):
+        return schemas.OpenAIResponse.from_gpt(req, response)
+
+    async def request_legacy_stream(
+        self,
+        req: schemas.OpenAIRequest,
+    ) -> LegacyStreamEvents:
+        """
+        Requests a streamed legacy answer. Routing errors are raised here, before
+        anything is streamed; the returned events must be closed if not read to the end.
+        """
+        params = cast(
+            "openai_compat.OpenAICompatibleRequest",
+            {**req.to_chat_completion_params(), "stream": True},
+        )
+        response = await self._request_normalized(params)
+        if not openai_compat.is_streaming_chat_completion_response(response):
+            err = "Provider returned a non-streaming response to a streaming request"
+            raise TypeError(err)
+
+        return LegacyStreamEvents(cast("openai_compat.ChatCompletionStreamResponse", response))
+
+    async def _request_normalized(
+        self,
+        req: openai_compat.OpenAICompatibleRequest,
+    ) -> openai_compat.OpenAICompatibleResponse:
+        routes = self._model_router.build_routes(req.get("model"))
+        response, next_routes = await self._request_routes(req, routes)
+        if not openai_compat.is_streaming_chat_completion_response(response):
+            return response
+
+        return self._guard_stream(
+            cast("openai_compat.ChatCompletionStreamResponse", response),
+            req,
+            next_routes,
+        )
+
+    async def _request_routes(
+        self,
+        req: openai_compat.OpenAICompatibleRequest,
+        routes: Sequence[RequestRoute],
+    ) -> tuple[openai_compat.OpenAICompatibleResponse, Sequence[RequestRoute]]:
+        """
+        Requests the routes in order; returns the first response and the routes after it.
+        A route whose provider is over its hard cost limit is skipped; the limit error is
+        raised when no route is left or the spend of all providers reached its threshold.
+        """
+
+        last_error: OpenAIError | CostLimitExceededError | None = None
+        tokens = self._estimate_tokens(req)
+        if tokens is not None and self._cost_estimator is not None:
+            routes = self._cost_estimator.order_routes(routes, tokens)
+
+        for index, route in enumerate(routes):
             routed_request = route.apply_to(req)
-            client = self._get_client(route.provider)
+            client = self._providers.get(route.provider)
+            estimated_cost_rub = self._estimate_cost_rub(route, tokens)
 
             for attempt in range(1, route.attempts + 1):
+                limit_error = await self._check_cost_limit(route, estimated_cost_rub)
+                if limit_error is not None:
+                    last_error = limit_error
+                    logger.warning(
+                        f"Skipping {route.provider} model {route.model} over the cost limit, "
+                        f"trying next route if available: {limit_error}",
+                    )
+                    break
+
                 try:
-                    if self._polza_cost_control is not None:
-                        await self._polza_cost_control.check_hard_limit(route.provider)
-
-                    response = await client.request(routed_request)
-                    if self._polza_cost_control is not None:
-                        if openai_compat.is_streaming_chat_completion_response(response):
-                            response = self._polza_cost_control.wrap_stream(
-                                provider=route.provider,
-                                response=response,
-                                request=routed_request,
-                            )
-                        else:
-                            await self._polza_cost_control.record_response_cost(
-                                provider=route.provider,
-                                response=response,
-                                request=routed_request,
-                            )
+                    response = await client.request(routed_request, normalized=True)
+                    if self._cost_control is not None:
+                        response = await self._track_cost(
+                            self._cost_control,
+                            route,
+                            routed_request,
+                            response,
+                            estimated_cost_rub,
+                        )
                 except OpenAIError as ex:
                     last_error = ex
                     if attempt < route.attempts:
@@ -83,7 +156,7 @@ class OpenAIService:
                     )
                     break
                 else:
-                    return response
+                    return response, routes[index + 1 :]
 
         if last_error is not None:
             raise last_error
@@ -91,32 +164,188 @@ class OpenAIService:
         err = "Unable to build a model route"
         raise RuntimeError(err)
 
-    async def request_legacy(self, req: schemas.OpenAIRequest) -> schemas.OpenAIResponse:
-        response = await self.request(req.to_chat_completion_params())
+    async def _check_cost_limit(
+        self,
+        route: RequestRoute,
+        estimated_cost_rub: float | None,
+    ) -> CostLimitExceededError | None:
+        """Returns the limit error of a route to skip; raises it if all providers are capped."""
+
+        if self._cost_control is None:
+            return None
+
+        try:
+            await self._cost_control.check_hard_limit(
+                route.provider,
+                estimated_cost_rub=estimated_cost_rub,
+            )
+        except CostLimitExceededError as ex:
+            if ex.provider is None and ex.threshold_reached:
+                raise
+            return ex
+        return None
+
+    def _estimate_tokens(self, req: openai_compat.OpenAICompatibleRequest) -> TokenEstimate | None:
+        if self._cost_estimator is None or not self._cost_estimator.enabled:
+            return None
+        return self._cost_estimator.estimate_tokens(req)
+
+    def _estimate_cost_rub(
+        self,
+        route: RequestRoute,
+        tokens: TokenEstimate | None,
+    ) -> float | None:
+        if tokens is None or self._cost_estimator is None:
+            return None
+        return self._cost_estimator.estimate_cost_rub(route, tokens)
+
+    @staticmethod
+    async def _track_cost(
+        cost_control: CostControl,
+        route: RequestRoute,
+        routed_request: openai_compat.OpenAICompatibleRequest,
+        response: openai_compat.OpenAICompatibleResponse,
+        estimated_cost_rub: float | None,
+    ) -> openai_compat.OpenAICompatibleResponse:
         if openai_compat.is_streaming_chat_completion_response(response):
-            err = "Legacy endpoint does not support streaming responses"
+            return cost_control.wrap_stream(
+                provider=route.provider,
+                response=response,
+                request=routed_request,
+                estimated_cost_rub=estimated_cost_rub,
+            )
+
+        await cost_control.record_response_cost(
+            provider=route.provider,
+            response=response,
+            request=routed_request,
+            estimated_cost_rub=estimated_cost_rub,
+        )
+        return response
+
+    def _guard_stream(
+        self,
+        stream: openai_compat.ChatCompletionStreamResponse,
+        req: openai_compat.OpenAICompatibleRequest,
+        next_routes: Sequence[RequestRoute],
+    ) -> openai_compat.ChatCompletionStreamResponse:
+        settings = self._streaming_settings
+        if settings is None:
+            return stream
+
+        # таймаут простоя действует на каждый поток провайдера, длительность - на весь ответ
+        stream = self._limit_idle_time(stream)
+        if settings.failover != "none":
+            stream = FailoverAsyncStream(
+                stream=stream,
+                request=req,
+                routes=next_routes,
+                open_routes=self._open_failover_stream,
+                mode=settings.failover,
+            )
+        if settings.max_duration is not None:
+            stream = TimeLimitedAsyncStream(
+                stream=stream,
+                idle_timeout=None,
+                max_duration=settings.max_duration,
+            )
+        return stream
+
+    async def _open_failover_stream(
+        self,
+        req: openai_compat.OpenAICompatibleRequest,
+        routes: Sequence[RequestRoute],
+    ) -> tuple[openai_compat.ChatCompletionStreamResponse, Sequence[RequestRoute]]:
+        response, next_routes = await self._request_routes(req, routes)
+        if not openai_compat.is_streaming_chat_completion_response(response):
+            err = "Provider returned a non-streaming response to a streaming request"
             raise TypeError(err)
 
-        return schemas.OpenAIResponse.from_gpt(req, response)
+        stream = cast("openai_compat.ChatCompletionStreamResponse", response)
+        return self._limit_idle_time(stream), next_routes
 
-    def _get_client(
+    def _limit_idle_time(
         self,
-        provider: ProviderName,
-    ) -> OfficialOpenAIClient | DeepseekOpenAIClient | PolzaOpenAIClient:
-        if provider == "deepseek":
-            return self._deepseek
-        if provider == "polza":
-            return self._polza
-        return self._official
+        stream: openai_compat.ChatCompletionStreamResponse,
+    ) -> openai_compat.ChatCompletionStreamResponse:
+        settings = self._streaming_settings
+        if settings is None or settings.idle_timeout is None:
+            return stream
+
+        return TimeLimitedAsyncStream(
+            stream=stream,
+            idle_timeout=settings.idle_timeout,
+            max_duration=None,
+        )
+
+
+class LegacyStreamEvents:
+    """
+    Legacy stream events read from an upstream stream: a delta per content chunk,
+    then the assembled assistant message. The upstream is closed once it ends.
+    """
+
+    def __init__(self, stream: openai_compat.ChatCompletionStreamResponse) -> None:
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._content_parts: list[str] = []
+        self._assembler = ToolCallsAssembler()
+        self._finished = False
+
+    def __aiter__(self) -> LegacyStreamEvents:
+        return self
+
+    async def __anext__(self) -> schemas.OpenAIStreamEvent:
+        if self._finished:
+            raise StopAsyncIteration
+
+        while True:
+            try:
+                chunk = await self._iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            if not chunk.choices:
+                continue
+
+            delta = chunk.choices[0].delta
+            for tool_call in delta.tool_calls or ():
+                self._assembler.add(tool_call)
+            if delta.content:
+                self._content_parts.append(delta.content)
+                return schemas.OpenAIStreamEvent.model_construct(
+                    delta=schemas.OpenAIMessage.model_construct(
+                        role=schemas.OpenAIRole.ASSIST,
+                        content=delta.content,
+                    ),
+                )
+
+        self._finished = True
+        await close_stream(self._stream)
+        return schemas.OpenAIStreamEvent.model_construct(message=self._assemble_message())
+
+    async def close(self) -> None:
+        self._finished = True
+        await self._stream.close()
+
+    def _assemble_message(self) -> schemas.OpenAIMessage:
+        tool_calls = [
+            schemas.OpenAIToolCall.from_gpt(call) for call in self._assembler.tool_calls
+        ]
+        return schemas.OpenAIMessage.model_construct(
+            role=schemas.OpenAIRole.ASSIST,
+            content="".join(self._content_parts) or None,
+            tool_calls=tool_calls or None,
+        )
 
 
 @lru_cache
 def get_openai_service() -> OpenAIService:
     return OpenAIService(
-        official_client=get_official_openai_client(),
-        deepseek_client=get_deepseek_openai_client(),
-        polza_client=get_polza_openai_client(),
-        polza_cost_control=get_polza_cost_control(),
+        providers=get_provider_registry(),
+        model_router=get_model_router(),
+        cost_control=get_cost_control(),
+        streaming_settings=get_streaming_settings(),
+        cost_estimator=get_cost_estimator(),
     )
 
 
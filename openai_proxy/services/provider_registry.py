@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Protocol
+
+from loguru import logger
+from pydantic import ValidationError
+
+from openai_proxy import openai_compat
+from openai_proxy.client import OpenAIClient
+from openai_proxy.client_pool import OpenAIClientPool
+from openai_proxy.settings import (
+    DeepseekOpenAISettings,
+    OfficialOpenAISettings,
+    OpenAIProviderOptions,
+    OpenAISettings,
+    PolzaOpenAISettings,
+    ProviderRegistrySettings,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping
+
+BUILTIN_PROVIDER_SETTINGS: dict[str, Callable[[], OpenAISettings]] = {
+    "official": OfficialOpenAISettings,
+    "deepseek": DeepseekOpenAISettings,
+    "polza": PolzaOpenAISettings,
+}
+
+
+class ProviderClient(Protocol):
+    async def request(
+        self,
+        request: openai_compat.OpenAICompatibleRequest,
+        *,
+        normalized: bool = False,
+    ) -> openai_compat.OpenAICompatibleResponse: ...
+
+
+class UnknownProviderError(ValueError):
+    def __init__(self, name: str) -> None:
+        super().__init__(f"Provider {name} is not configured")
+
+
+class ProviderRegistry:
+    """
+    Named provider clients the proxy can route requests to.
+    """
+
+    def __init__(self, clients: Mapping[str, ProviderClient]) -> None:
+        self._clients = dict(clients)
+
+    def get(self, name: str) -> ProviderClient:
+        client = self._clients.get(name)
+        if client is None:
+            raise UnknownProviderError(name)
+        return client
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(self._clients)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._clients
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._clients)
+
+    @classmethod
+    def from_settings(cls, settings: ProviderRegistrySettings) -> ProviderRegistry:
+        provider_options: dict[str, OpenAIProviderOptions] = {}
+
+        for name, settings_factory in BUILTIN_PROVIDER_SETTINGS.items():
+            try:
+                provider_options[name] = settings_factory()
+            except ValidationError as ex:
+                logger.warning(f"Built-in provider {name} is not configured, skipping: {ex}")
+
+        for provider_settings in settings.providers:
+            provider_options[provider_settings.name] = provider_settings
+
+        return cls(
+            {
+                name: build_provider_client(name, options)
+                for name, options in provider_options.items()
+            },
+        )
+
+
+def build_provider_client(name: str, options: OpenAIProviderOptions) -> ProviderClient:
+    if options.keys:
+        return OpenAIClientPool.from_options(name, options)
+    return OpenAIClient(options)
+
+
+@lru_cache
+def get_provider_registry() -> ProviderRegistry:
+    return ProviderRegistry.from_settings(ProviderRegistrySettings())
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Literal, cast
+
+import httpx
+from loguru import logger
+from openai import OpenAIError
+
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+from openai_proxy.streaming import StreamTimeoutError, close_stream
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Sequence
+
+    from openai.types.chat import ChatCompletionChunk
+
+    from openai_proxy import openai_compat
+    from openai_proxy.services.model_routing import RequestRoute
+
+StreamFailoverMode = Literal["none", "before_first_token", "continue"]
+
+# ошибки, которыми обрывается поток провайдера: ошибки api, сети и таймауты чанков
+STREAM_FAILURES: tuple[type[Exception], ...] = (OpenAIError, httpx.HTTPError, StreamTimeoutError)
+
+OpenRoutes = Callable[
+    ["openai_compat.OpenAICompatibleRequest", "Sequence[RequestRoute]"],
+    "Awaitable[tuple[openai_compat.ChatCompletionStreamResponse, Sequence[RequestRoute]]]",
+]
+
+
+class FailoverAsyncStream:
+    """
+    Upstream stream that survives the failure of its provider.
+    Before the first content chunk the request is transparently sent to the next routes.
+    After content was emitted, mode "continue" asks the next routes to go on from the
+    emitted content as an assistant prefix; otherwise, or once tool calls were streamed,
+    the failure is raised for the caller to report.
+    Most OpenAI-compatible providers treat a trailing assistant message as a finished turn,
+    not as a prefix to extend, so in mode "continue" the next route may repeat or restart
+    the answer.
+    """
+
+    def __init__(
+        self,
+        stream: openai_compat.ChatCompletionStreamResponse,
+        request: openai_compat.OpenAICompatibleRequest,
+        routes: Sequence[RequestRoute],
+        *,
+        open_routes: OpenRoutes,
+        mode: StreamFailoverMode,
+        metrics: ProxyMetrics | None = None,
+    ) -> None:
+        self._stream = stream
+        self._iterator: AsyncIterator[ChatCompletionChunk] = stream.__aiter__()
+        self._request = request
+        self._routes = routes
+        self._open_routes = open_routes
+        self._mode = mode
+        self._metrics = metrics or get_proxy_metrics()
+        self._content_parts: list[str] = []
+        self._tool_calls_emitted = False
+        self._closed = False
+
+    def __aiter__(self) -> FailoverAsyncStream:
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        while True:
+            try:
+                chunk = await self._iterator.__anext__()
+            except STREAM_FAILURES as ex:
+                await self._fail_over(ex)
+                continue
+
+            self._track(chunk)
+            return chunk
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        await self._stream.close()
+
+    def _track(self, chunk: ChatCompletionChunk) -> None:
+        for choice in chunk.choices:
+            if choice.delta.content:
+                self._content_parts.append(choice.delta.content)
+            if choice.delta.tool_calls:
+                self._tool_calls_emitted = True
+
+    async def _fail_over(self, error: Exception) -> None:
+        outcome = self._failover_outcome()
+        if outcome is None or not self._routes or self._closed:
+            self._metrics.increment("stream_failover_total", outcome="failed")
+            raise error
+
+        logger.warning(f"Upstream stream failed, failing over ({outcome}): {error!r}")
+        await close_stream(self._stream)
+        request = self._request
+        if outcome == "continue":
+            request = _with_assistant_prefix(request, "".join(self._content_parts))
+
+        try:
+            self._stream, self._routes = await self._open_routes(request, self._routes)
+        except OpenAIError:
+            self._metrics.increment("stream_failover_total", outcome="failed")
+            raise
+
+        self._iterator = self._stream.__aiter__()
+        self._metrics.increment("stream_failover_total", outcome=outcome)
+
+    def _failover_outcome(self) -> Literal["retry", "continue"] | None:
+        if self._mode == "none" or self._tool_calls_emitted:
+            return None
+        if not self._content_parts:
+            return "retry"
+        if self._mode == "continue":
+            return "continue"
+        return None
+
+
+def _with_assistant_prefix(
+    request: openai_compat.OpenAICompatibleRequest,
+    prefix: str,
+) -> openai_compat.OpenAICompatibleRequest:
+    # это лишь подсказка: большинство провайдеров не продолжают последнее сообщение ассистента
+    # как префикс, а отвечают заново, поэтому ответ может повториться или начаться сначала
+    messages = [*request["messages"], {"role": "assistant", "content": prefix}]
+    return cast("openai_compat.OpenAICompatibleRequest", {**request, "messages": messages})
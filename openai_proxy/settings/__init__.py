@@ -1,19 +1,44 @@
-from openai_proxy.settings.cost_control_settings import PolzaCostControlSettings
+from openai_proxy.settings.compression_settings import CompressionSettings
+from openai_proxy.settings.cost_control_settings import (
+    CostControlSettings,
+    CostLimitSettings,
+    PolzaCostControlSettings,
+)
 from openai_proxy.settings.openai_settings import (
     DeepseekOpenAISettings,
     OfficialOpenAISettings,
+    OpenAIProviderOptions,
     OpenAISettings,
     PolzaOpenAISettings,
 )
+from openai_proxy.settings.pricing_settings import ModelPrice, PricingSettings
+from openai_proxy.settings.provider_registry_settings import (
+    ProviderRegistrySettings,
+    ProviderSettings,
+    RouteSettings,
+)
 from openai_proxy.settings.proxy_client_settings import (
     OpenAIProxyClientSettings,
 )
+from openai_proxy.settings.request_limits_settings import RequestLimitsSettings
+from openai_proxy.settings.streaming_settings import StreamingSettings
 
 __all__ = [
+    "CompressionSettings",
+    "CostControlSettings",
+    "CostLimitSettings",
     "DeepseekOpenAISettings",
+    "ModelPrice",
     "OfficialOpenAISettings",
+    "OpenAIProviderOptions",
     "OpenAIProxyClientSettings",
     "OpenAISettings",
     "PolzaCostControlSettings",
     "PolzaOpenAISettings",
+    "PricingSettings",
+    "ProviderRegistrySettings",
+    "ProviderSettings",
+    "RequestLimitsSettings",
+    "RouteSettings",
+    "StreamingSettings",
 ]
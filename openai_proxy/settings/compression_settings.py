@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from pydantic import model_validator
+from pydantic_settings import SettingsConfigDict
+
+from openai_proxy.settings.env_settings import EnvSettings
+
+MAX_GZIP_LEVEL = 9
+MAX_BROTLI_QUALITY = 11
+MAX_ZSTD_LEVEL = 22
+
+
+class CompressionSettings(EnvSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="COMPRESSION__",
+    )
+
+    responses_enabled: bool = True
+    minimum_size: int = 1024
+    gzip_level: int = 5
+    brotli_quality: int = 4
+    zstd_level: int = 3
+    decompress_request_paths: tuple[str, ...] = (
+        "/v1/chat/completions",
+        "/api/v1/openai/request",
+    )
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "CompressionSettings":
+        if self.minimum_size < 0:
+            err = "COMPRESSION__MINIMUM_SIZE must not be negative"
+            raise ValueError(err)
+
+        for field_name, value, max_value in (
+            ("COMPRESSION__GZIP_LEVEL", self.gzip_level, MAX_GZIP_LEVEL),
+            ("COMPRESSION__BROTLI_QUALITY", self.brotli_quality, MAX_BROTLI_QUALITY),
+            ("COMPRESSION__ZSTD_LEVEL", self.zstd_level, MAX_ZSTD_LEVEL),
+        ):
+            if not 1 <= value <= max_value:
+                err = f"{field_name} must be between 1 and {max_value}"
+                raise ValueError(err)
+
+        return self
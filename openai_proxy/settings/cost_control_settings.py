@@ -1,12 +1,114 @@
 from __future__ import annotations
 
-from pydantic import HttpUrl, SecretStr, model_validator
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl, SecretStr, model_validator
 from pydantic_settings import SettingsConfigDict
 
 from openai_proxy.settings.env_settings import EnvSettings
 
 
+class CostLimitSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    soft_threshold_rub: float | None = None
+    hard_threshold_rub: float | None = None
+    window_seconds: int = 3600
+
+    @property
+    def soft_limit_enabled(self) -> bool:
+        return self.soft_threshold_rub is not None
+
+    @property
+    def hard_limit_enabled(self) -> bool:
+        return self.hard_threshold_rub is not None
+
+    @property
+    def any_limit_enabled(self) -> bool:
+        return self.soft_limit_enabled or self.hard_limit_enabled
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "CostLimitSettings":
+        if self.window_seconds <= 0:
+            err = "Cost limit window_seconds must be greater than zero"
+            raise ValueError(err)
+
+        for field_name, value in (
+            ("soft_threshold_rub", self.soft_threshold_rub),
+            ("hard_threshold_rub", self.hard_threshold_rub),
+        ):
+            if value is not None and value <= 0:
+                err = f"Cost limit {field_name} must be greater than zero"
+                raise ValueError(err)
+
+        if (
+            self.soft_threshold_rub is not None
+            and self.hard_threshold_rub is not None
+            and self.hard_threshold_rub < self.soft_threshold_rub
+        ):
+            err = (
+                "Cost limit hard_threshold_rub must be greater than or equal "
+                "to soft_threshold_rub"
+            )
+            raise ValueError(err)
+
+        return self
+
+
+class CostControlSettings(EnvSettings):
+    """
+    Spend limits over sliding windows: one for all providers together and one per provider.
+    Soft limits send a notification to logs API, hard limits reject new requests.
+    """
+
+    model_config = SettingsConfigDict(
+        env_prefix="COST_CONTROL__",
+    )
+
+    total: CostLimitSettings = Field(default_factory=CostLimitSettings)
+    providers: dict[str, CostLimitSettings] = Field(default_factory=dict)
+    logs_api_base_url: HttpUrl | None = None
+    logs_api_username: str | None = None
+    logs_api_password: SecretStr | None = None
+    logs_api_timeout_seconds: float = 5.0
+    application_name: str = "openai-proxy"
+    notification_user: str = "anonymous"
+
+    @property
+    def soft_limit_enabled(self) -> bool:
+        return self.total.soft_limit_enabled or any(
+            limit.soft_limit_enabled for limit in self.providers.values()
+        )
+
+    @property
+    def any_limit_enabled(self) -> bool:
+        return self.total.any_limit_enabled or any(
+            limit.any_limit_enabled for limit in self.providers.values()
+        )
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "CostControlSettings":
+        if self.soft_limit_enabled:
+            missing_fields = [
+                field_name
+                for field_name, value in (
+                    ("COST_CONTROL__LOGS_API_BASE_URL", self.logs_api_base_url),
+                    ("COST_CONTROL__LOGS_API_USERNAME", self.logs_api_username),
+                    ("COST_CONTROL__LOGS_API_PASSWORD", self.logs_api_password),
+                )
+                if value is None
+            ]
+            if missing_fields:
+                err = "Soft cost limits require logs API settings: " + ", ".join(missing_fields)
+                raise ValueError(err)
+
+        return self
+
+
 class PolzaCostControlSettings(EnvSettings):
+    """
+    Deprecated limits of polza, kept for existing deployments.
+    They are used as COST_CONTROL__PROVIDERS limits of polza when those are not set.
+    """
+
     model_config = SettingsConfigDict(
         env_prefix="POLZA_COST_CONTROL__",
     )
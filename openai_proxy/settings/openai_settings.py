@@ -1,14 +1,63 @@
-from pydantic import HttpUrl
+from typing import Literal
+
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 from pydantic_settings import SettingsConfigDict
 
 from openai_proxy.settings.env_settings import EnvSettings
 
 
-class OpenAISettings(EnvSettings):
+class ProviderKeySettings(BaseModel):
     token: str
+    # другой endpoint того же провайдера, по умолчанию base_url провайдера
+    base_url: HttpUrl | None = None
+    weight: float = Field(default=1.0, gt=0)
+
+
+class OpenAIProviderOptions(BaseModel):
+    token: str | None = None
     base_url: HttpUrl
     default_model: str | None = None
     max_message_size: int = 100000
+    # сжимать тела запросов к провайдеру (только если провайдер принимает Content-Encoding)
+    compress_requests: bool = False
+    compress_requests_min_size: int = 1024
+    # пул соединений к провайдеру, по умолчанию как в openai SDK
+    max_connections: int = 1000
+    max_keepalive_connections: int = 100
+    keepalive_expiry: float = 5.0
+    # пул ключей: у каждого свой пул соединений и свой учет 429
+    keys: list[ProviderKeySettings] = Field(default_factory=list)
+    key_selection: Literal["round_robin", "least_loaded"] = "round_robin"
+    key_ejection_seconds: float = 30.0
+
+    @model_validator(mode="after")
+    def validate_keys(self) -> "OpenAIProviderOptions":
+        if self.token is None and not self.keys:
+            err = "Either token or keys must be configured for a provider"
+            raise ValueError(err)
+
+        return self
+
+    def key_options(self) -> list["OpenAIProviderOptions"]:
+        """Options of every single key, a provider without keys is a pool of its token."""
+
+        if not self.keys:
+            return [self]
+
+        return [
+            OpenAIProviderOptions.model_validate(
+                {
+                    **self.model_dump(exclude={"keys"}),
+                    "token": key.token,
+                    "base_url": key.base_url or self.base_url,
+                },
+            )
+            for key in self.keys
+        ]
+
+
+class OpenAISettings(EnvSettings, OpenAIProviderOptions):
+    pass
 
 
 class OfficialOpenAISettings(OpenAISettings):
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic_settings import SettingsConfigDict
+
+from openai_proxy.settings.env_settings import EnvSettings
+
+
+class ModelPrice(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    input_rub_per_million: float
+    output_rub_per_million: float
+
+
+class PricingSettings(EnvSettings):
+    """
+    Per-model prices used to estimate the cost of a request before it is sent.
+    Prices are keyed by "<provider>:<model>" or by the bare model name.
+    """
+
+    model_config = SettingsConfigDict(
+        env_prefix="PRICING__",
+    )
+
+    prices: dict[str, ModelPrice] = Field(default_factory=dict)
+    # сколько токенов ответа закладывать в оценку, если в запросе нет max_tokens
+    default_completion_tokens: int = 1024
+    # начиная с такой длины промпта auto-маршруты перебираются от дешевых к дорогим
+    cheap_routing_prompt_tokens: int | None = None
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "PricingSettings":
+        if any(
+            price.input_rub_per_million < 0 or price.output_rub_per_million < 0
+            for price in self.prices.values()
+        ):
+            err = "PRICING__PRICES must not contain negative prices"
+            raise ValueError(err)
+
+        for field_name, value in (
+            ("PRICING__DEFAULT_COMPLETION_TOKENS", self.default_completion_tokens),
+            ("PRICING__CHEAP_ROUTING_PROMPT_TOKENS", self.cheap_routing_prompt_tokens),
+        ):
+            if value is not None and value <= 0:
+                err = f"{field_name} must be greater than zero"
+                raise ValueError(err)
+
+        return self
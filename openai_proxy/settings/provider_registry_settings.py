@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from pydantic_settings import SettingsConfigDict
+
+from openai_proxy.settings.env_settings import EnvSettings
+from openai_proxy.settings.openai_settings import OpenAIProviderOptions
+
+
+class ProviderSettings(OpenAIProviderOptions):
+    name: str
+
+
+class RouteSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    provider: str
+    model: str
+    attempts: int = 1
+
+
+class ProviderRegistrySettings(EnvSettings):
+    """
+    Providers served by the proxy in addition to the built-in official, deepseek and polza.
+    A provider with a built-in name replaces the built-in one.
+    """
+
+    model_config = SettingsConfigDict(
+        env_prefix="PROVIDER_REGISTRY__",
+    )
+
+    providers: list[ProviderSettings] = Field(default_factory=list)
+    # None - встроенная цепочка deepseek -> official -> polza
+    auto_routes: list[RouteSettings] | None = None
+    default_provider: str = "official"
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "ProviderRegistrySettings":
+        names = [provider.name for provider in self.providers]
+        duplicated_names = sorted({name for name in names if names.count(name) > 1})
+        if duplicated_names:
+            err = f"PROVIDER_REGISTRY__PROVIDERS contains duplicated names: {duplicated_names}"
+            raise ValueError(err)
+
+        if any(":" in name or not name for name in names):
+            err = "PROVIDER_REGISTRY__PROVIDERS names must be non-empty and must not contain ':'"
+            raise ValueError(err)
+
+        if any(route.attempts < 1 for route in self.auto_routes or ()):
+            err = "PROVIDER_REGISTRY__AUTO_ROUTES attempts must be greater than zero"
+            raise ValueError(err)
+
+        return self
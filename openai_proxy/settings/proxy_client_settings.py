@@ -1,4 +1,6 @@
-from pydantic import HttpUrl
+from typing import Optional
+
+from pydantic import Field, HttpUrl
 from pydantic_settings import BaseSettings
 
 
@@ -11,6 +13,20 @@ class OpenAIProxyClientSettings(BaseSettings):
     api_key: str = "proxy"
     verify_ssl: bool = True
 
+    # пул соединений OpenAIProxyClient
+    max_connections: int = Field(default=100, ge=0)
+    max_connections_per_host: int = Field(default=0, ge=0)
+    # None отключает keep-alive
+    keepalive_timeout: Optional[float] = Field(default=15.0, gt=0)
+    request_timeout: Optional[float] = Field(default=300.0, gt=0)
+    connect_timeout: Optional[float] = Field(default=10.0, gt=0)
+    # потоки не ограничены request_timeout: вместо него действует наибольшая пауза между чанками
+    stream_idle_timeout: Optional[float] = Field(default=300.0, gt=0)
+    max_retries: int = Field(default=2, ge=0)
+    retry_backoff: float = Field(default=0.5, ge=0)
+    # таймаут после отправки запроса может повторить уже оплаченный вызов модели
+    retry_timeouts: bool = False
+
     @property
     def openai_base_url(self) -> str:
         return f"{str(self.base_url).rstrip('/')}/v1"
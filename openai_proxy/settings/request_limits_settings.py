@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from pydantic import model_validator
+from pydantic_settings import SettingsConfigDict
+
+from openai_proxy.settings.env_settings import EnvSettings
+
+DEFAULT_MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class RequestLimitsSettings(EnvSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="REQUEST_LIMITS__",
+    )
+
+    chat_completions_max_body_bytes: int = DEFAULT_MAX_BODY_BYTES
+    legacy_request_max_body_bytes: int = DEFAULT_MAX_BODY_BYTES
+    default_max_body_bytes: int | None = None
+
+    @property
+    def max_body_bytes_by_path(self) -> dict[str, int]:
+        return {
+            "/v1/chat/completions": self.chat_completions_max_body_bytes,
+            "/api/v1/openai/request": self.legacy_request_max_body_bytes,
+        }
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "RequestLimitsSettings":
+        for field_name, value in (
+            (
+                "REQUEST_LIMITS__CHAT_COMPLETIONS_MAX_BODY_BYTES",
+                self.chat_completions_max_body_bytes,
+            ),
+            (
+                "REQUEST_LIMITS__LEGACY_REQUEST_MAX_BODY_BYTES",
+                self.legacy_request_max_body_bytes,
+            ),
+            ("REQUEST_LIMITS__DEFAULT_MAX_BODY_BYTES", self.default_max_body_bytes),
+        ):
+            if value is not None and value <= 0:
+                err = f"{field_name} must be greater than zero"
+                raise ValueError(err)
+
+        return self
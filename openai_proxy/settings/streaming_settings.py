@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Literal
+
+from pydantic import model_validator
+from pydantic_settings import SettingsConfigDict
+
+from openai_proxy.settings.env_settings import EnvSettings
+
+
+class StreamingSettings(EnvSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="STREAMING__",
+    )
+
+    # секунды без чанков от провайдера, после которых поток обрывается; None - не ограничено
+    idle_timeout: float | None = 60.0
+    max_duration: float | None = 900.0
+    # что делать, если поток провайдера оборвался: ничего, повторить на следующем маршруте
+    # до первого токена, или еще и продолжить на следующем маршруте с уже отданным префиксом
+    failover: Literal["none", "before_first_token", "continue"] = "none"
+    # склейка кадров в одну запись: задержка в секундах (None - без склейки) и размер буфера
+    coalesce_max_delay: float | None = None
+    coalesce_max_bytes: int = 16 * 1024
+
+    @model_validator(mode="after")
+    def validate_settings(self) -> "StreamingSettings":
+        for field_name, value in (
+            ("STREAMING__IDLE_TIMEOUT", self.idle_timeout),
+            ("STREAMING__MAX_DURATION", self.max_duration),
+            ("STREAMING__COALESCE_MAX_DELAY", self.coalesce_max_delay),
+            ("STREAMING__COALESCE_MAX_BYTES", self.coalesce_max_bytes),
+        ):
+            if value is not None and value <= 0:
+                err = f"{field_name} must be greater than zero"
+                raise ValueError(err)
+
+        return self
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Literal, Protocol
+
+import anyio
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from starlette.responses import StreamingResponse
+
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+from openai_proxy.settings import StreamingSettings
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from openai.types.chat import ChatCompletionChunk
+    from openai.types.chat.chat_completion_chunk import ChoiceDeltaToolCall
+    from starlette.types import Receive, Scope, Send
+
+    from openai_proxy import openai_compat
+
+StreamAbortReason = Literal["client_disconnect", "idle_timeout", "max_duration", "upstream_error"]
+
+
+class StreamTimeoutError(TimeoutError):
+    def __init__(self, reason: StreamAbortReason, timeout: float) -> None:
+        if reason == "idle_timeout":
+            message = f"Upstream sent no data for {timeout:g} seconds"
+        else:
+            message = f"Stream exceeded the maximum duration of {timeout:g} seconds"
+        super().__init__(message)
+        self.reason = reason
+
+
+class TimeLimitedAsyncStream:
+    """
+    Upstream chat completion stream that fails with StreamTimeoutError when the next chunk
+    does not arrive within idle_timeout or the stream outlives max_duration.
+    """
+
+    def __init__(
+        self,
+        stream: openai_compat.ChatCompletionStreamResponse,
+        idle_timeout: float | None,
+        max_duration: float | None,
+        now_provider: Callable[[], float] | None = None,
+    ) -> None:
+        self._stream = stream
+        self._iterator: AsyncIterator[ChatCompletionChunk] = stream.__aiter__()
+        self._idle_timeout = idle_timeout
+        self._max_duration = max_duration
+        self._now = now_provider or time.monotonic
+        self._deadline = None if max_duration is None else self._now() + max_duration
+
+    def __aiter__(self) -> TimeLimitedAsyncStream:
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        timeout, reason = self._next_timeout()
+        deadline = asyncio.timeout(timeout)
+        try:
+            async with deadline:
+                return await self._iterator.__anext__()
+        except TimeoutError as ex:
+            # TimeoutError самого провайдера пробрасываем как есть
+            if not deadline.expired():
+                raise
+            limit = self._idle_timeout if reason == "idle_timeout" else self._max_duration
+            raise StreamTimeoutError(reason, limit or 0) from ex
+
+    async def close(self) -> None:
+        await self._stream.close()
+
+    def _next_timeout(self) -> tuple[float | None, StreamAbortReason]:
+        if self._deadline is None:
+            return self._idle_timeout, "idle_timeout"
+
+        remaining = max(self._deadline - self._now(), 0)
+        if self._idle_timeout is not None and self._idle_timeout < remaining:
+            return self._idle_timeout, "idle_timeout"
+        return remaining, "max_duration"
+
+
+class ClosableStream(Protocol):
+    async def close(self) -> None: ...
+
+
+async def close_stream(stream: ClosableStream) -> None:
+    """Closes a stream even if the task closing it is being cancelled."""
+
+    with anyio.CancelScope(shield=True):
+        await stream.close()
+
+
+class DisconnectAwareStreamingResponse(StreamingResponse):
+    """
+    Streaming response that listens for the client disconnect on every ASGI version.
+    On disconnect the body is cancelled and the upstream stream is closed at once,
+    instead of on the next failed write. The upstream is closed explicitly because
+    closing a body generator that has not started yet does not run its finally blocks.
+    """
+
+    def __init__(
+        self,
+        content: AsyncIterator[str],
+        media_type: str,
+        upstream: ClosableStream | None = None,
+        metrics: ProxyMetrics | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(content, media_type=media_type, **kwargs)
+        self._upstream = upstream
+        self._metrics = metrics or get_proxy_metrics()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        disconnected = False
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def stream() -> None:
+                    nonlocal disconnected
+                    try:
+                        await self.stream_response(send)
+                    except OSError:
+                        # серверы с ASGI 2.4 сообщают об отключении ошибкой записи
+                        disconnected = True
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(stream)
+                await self.listen_for_disconnect(receive)
+                disconnected = True
+                task_group.cancel_scope.cancel()
+        finally:
+            with anyio.CancelScope(shield=True):
+                aclose = getattr(self.body_iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                if self._upstream is not None:
+                    await self._upstream.close()
+
+        if disconnected:
+            record_aborted_stream(self._metrics, "client_disconnect", scope["path"])
+            return
+
+        if self.background is not None:
+            await self.background()
+
+
+def record_aborted_stream(metrics: ProxyMetrics, reason: StreamAbortReason, path: str) -> None:
+    metrics.increment("stream_aborted_total", reason=reason, path=path)
+
+
+class _FrameBatcher:
+    """Frames read from upstream by coalesce_frames and not yet taken by its writer."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._frames: list[str] = []
+        self._buffered_bytes = 0
+        self._first_token_seen = False
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self.has_frames = asyncio.Event()
+        self.must_flush = asyncio.Event()
+        self.done = False
+        self.error: BaseException | None = None
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._frames)
+
+    async def read(self, frames: AsyncIterator[tuple[str, bool]]) -> None:
+        try:
+            async for frame, is_token in frames:
+                await self._add(frame, is_token)
+        except Exception as ex:  # noqa: BLE001
+            self.error = ex
+        finally:
+            self.done = True
+            self.has_frames.set()
+            self.must_flush.set()
+
+    async def _add(self, frame: str, is_token: bool) -> None:
+        self._frames.append(frame)
+        self._buffered_bytes += len(frame)
+        self.has_frames.set()
+        full = self._buffered_bytes >= self._max_bytes
+        if not self._first_token_seen or full:
+            self.must_flush.set()
+        self._first_token_seen = self._first_token_seen or is_token
+        if full:
+            # буфер полон: ждем, пока писатель заберет пачку
+            self._has_room.clear()
+            await self._has_room.wait()
+
+    def take(self) -> str:
+        batch = "".join(self._frames)
+        self._frames.clear()
+        self._buffered_bytes = 0
+        self.has_frames.clear()
+        self.must_flush.clear()
+        return batch
+
+    def release(self) -> None:
+        """Lets the reader go on after the taken batch was passed on."""
+        self._has_room.set()
+
+
+async def coalesce_frames(
+    frames: AsyncIterator[tuple[str, bool]],
+    max_delay: float,
+    max_bytes: int,
+) -> AsyncIterator[str]:
+    """
+    Joins stream frames into fewer writes: frames are buffered for up to max_delay seconds
+    or max_bytes and passed on together. Frames are (frame, is_token) pairs; everything up to
+    and including the first token frame is passed on at once, so time to first token is kept.
+    Once max_bytes are buffered, upstream is not read until the consumer takes the batch,
+    so a slow client does not make the whole response pile up in memory.
+    """
+    batcher = _FrameBatcher(max_bytes)
+    # кадры читаются отдельной задачей: ожидание таймера не должно отменять чтение потока
+    reader = asyncio.create_task(batcher.read(frames))
+    try:
+        while True:
+            await batcher.has_frames.wait()
+            if not batcher.must_flush.is_set():
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(max_delay):
+                        await batcher.must_flush.wait()
+
+            batch = batcher.take()
+            if batch:
+                yield batch
+            batcher.release()
+            if batcher.done and not batcher.has_pending:
+                break
+    finally:
+        reader.cancel()
+        with anyio.CancelScope(shield=True):
+            await asyncio.gather(reader, return_exceptions=True)
+
+    if batcher.error is not None:
+        raise batcher.error
+
+
+@dataclass
+class StreamedToolCall:
+    id: str = ""
+    name: str = ""
+    argument_parts: list[str] = field(default_factory=list)
+
+    def to_tool_call(self) -> ChatCompletionMessageToolCall:
+        return ChatCompletionMessageToolCall(
+            id=self.id,
+            type="function",
+            function=Function(name=self.name, arguments="".join(self.argument_parts)),
+        )
+
+
+class ToolCallsAssembler:
+    """
+    Assembles streamed tool_calls deltas into complete tool calls.
+    Deltas of one tool call arrive in a row, so a call is complete as soon as a delta
+    with a greater index shows up or the stream ends.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[int, StreamedToolCall] = {}
+        self._completed_count = 0
+
+    def add(self, delta: ChoiceDeltaToolCall) -> list[ChatCompletionMessageToolCall]:
+        """Adds a delta and returns tool calls completed by it."""
+
+        completed = self._complete(below_index=delta.index)
+        call = self._calls.setdefault(delta.index, StreamedToolCall())
+        if delta.id:
+            call.id = delta.id
+        if delta.function is not None:
+            if delta.function.name:
+                call.name += delta.function.name
+            if delta.function.arguments:
+                call.argument_parts.append(delta.function.arguments)
+        return completed
+
+    def finish(self) -> list[ChatCompletionMessageToolCall]:
+        """Returns tool calls that were still open when the stream ended."""
+
+        return self._complete(below_index=None)
+
+    @property
+    def tool_calls(self) -> list[ChatCompletionMessageToolCall]:
+        return [self._calls[index].to_tool_call() for index in sorted(self._calls)]
+
+    def _complete(self, below_index: int | None) -> list[ChatCompletionMessageToolCall]:
+        indexes = sorted(self._calls)[self._completed_count :]
+        if below_index is not None:
+            indexes = [index for index in indexes if index < below_index]
+
+        self._completed_count += len(indexes)
+        return [self._calls[index].to_tool_call() for index in indexes]
+
+
+@lru_cache
+def get_streaming_settings() -> StreamingSettings:
+    return StreamingSettings()
@@ -1,5 +1,27 @@
+from openai_proxy.tool_call_client.budget import ToolCallBudget, ToolCallResult, ToolCallUsage
 from openai_proxy.tool_call_client.client import OpenAIProxyToolCallClient
+from openai_proxy.tool_call_client.history import (
+    HistoryPolicy,
+    KeepLastTurnsPolicy,
+    RequestStats,
+    SummarizeOlderTurnsPolicy,
+    TokenBudgetPolicy,
+    TruncateToolOutputsPolicy,
+)
+from openai_proxy.tool_call_client.session import ToolCallSession
+from openai_proxy.tool_call_client.tool_cache import ToolCachePolicy
 
 __all__ = [
+    "HistoryPolicy",
+    "KeepLastTurnsPolicy",
     "OpenAIProxyToolCallClient",
+    "RequestStats",
+    "SummarizeOlderTurnsPolicy",
+    "TokenBudgetPolicy",
+    "ToolCachePolicy",
+    "ToolCallBudget",
+    "ToolCallResult",
+    "ToolCallSession",
+    "ToolCallUsage",
+    "TruncateToolOutputsPolicy",
 ]
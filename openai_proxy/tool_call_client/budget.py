@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal, Optional
+
+if TYPE_CHECKING:
+    from openai.types import CompletionUsage
+
+StopReason = Literal[
+    "completed",
+    "max_round_trips",
+    "deadline",
+    "max_total_tokens",
+    "max_cost",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class ToolCallBudget:
+    """
+    Limits of one request of the tool-call loop. None means unlimited.
+    cost is read from usage.cost_rub (polza) or usage.cost of model responses.
+    """
+
+    max_round_trips: Optional[int] = None
+    deadline_seconds: Optional[float] = None
+    max_total_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.max_round_trips is not None and self.max_round_trips < 1:
+            err = "max_round_trips must be greater than zero"
+            raise ValueError(err)
+
+
+@dataclass(slots=True)
+class ToolCallUsage:
+    round_trips: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0
+
+    def add(self, usage: Optional[CompletionUsage]) -> None:
+        self.round_trips += 1
+        if usage is None:
+            return
+
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.total_tokens += usage.total_tokens
+        self.cost += _extract_cost(usage)
+
+
+@dataclass(slots=True)
+class ToolCallResult:
+    content: str
+    stop_reason: StopReason = "completed"
+    usage: ToolCallUsage = field(default_factory=ToolCallUsage)
+
+    @property
+    def completed(self) -> bool:
+        return self.stop_reason == "completed"
+
+
+class BudgetTracker:
+    """Accounts usage of one request against its budget."""
+
+    def __init__(self, budget: ToolCallBudget) -> None:
+        self._budget = budget
+        self.usage = ToolCallUsage()
+        self._deadline = (
+            None
+            if budget.deadline_seconds is None
+            else time.monotonic() + budget.deadline_seconds
+        )
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    def is_last_round_trip(self) -> bool:
+        """Whether the next model request is the last one the budget allows."""
+
+        max_round_trips = self._budget.max_round_trips
+        return max_round_trips is not None and self.usage.round_trips + 1 >= max_round_trips
+
+    def exceeded(self) -> Optional[StopReason]:
+        budget = self._budget
+        usage = self.usage
+        if budget.max_round_trips is not None and usage.round_trips >= budget.max_round_trips:
+            return "max_round_trips"
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return "deadline"
+        if budget.max_total_tokens is not None and usage.total_tokens >= budget.max_total_tokens:
+            return "max_total_tokens"
+        if budget.max_cost is not None and usage.cost >= budget.max_cost:
+            return "max_cost"
+        return None
+
+
+def _extract_cost(usage: CompletionUsage) -> float:
+    extra = usage.model_extra or {}
+    raw_cost = extra.get("cost_rub", extra.get("cost"))
+    try:
+        return float(raw_cost or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
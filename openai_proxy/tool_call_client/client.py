@@ -1,29 +1,76 @@
 from __future__ import annotations
 
+import asyncio
 import inspect
-from functools import wraps
+import json
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import aclosing
+from contextvars import ContextVar
+from functools import partial, wraps
 from typing import TYPE_CHECKING, Any, Callable, Optional, get_type_hints
 
 from loguru import logger
 from openai import AsyncOpenAI, DefaultAsyncHttpxClient, pydantic_function_tool
 from pydantic import BaseModel
 
+from openai_proxy.batch import DEFAULT_CONCURRENCY, BatchResult, map_concurrently
 from openai_proxy.helpers import ensure_prompts
 from openai_proxy.settings import OpenAIProxyClientSettings
+from openai_proxy.tool_call_client.budget import BudgetTracker, ToolCallBudget, ToolCallResult
+from openai_proxy.tool_call_client.history import RequestStats
 from openai_proxy.tool_call_client.models import ClientTool, ClientToolInfo
+from openai_proxy.tool_call_client.offload import (
+    ToolOffload,
+    dump_tool_result,
+    run_tool_in_process,
+)
+from openai_proxy.tool_call_client.session import ToolCallSession
+from openai_proxy.tool_call_client.streaming import StreamedTurn
+from openai_proxy.tool_call_client.tool_cache import ToolCachePolicy, ToolResultCache
 
 if TYPE_CHECKING:
+    from collections.abc import (
+        AsyncGenerator,
+        AsyncIterable,
+        AsyncIterator,
+        Iterable,
+        Sequence,
+    )
     from pathlib import Path
+    from types import TracebackType
 
-    from openai.types.chat import ChatCompletionMessage
-
-INFO_ATTR = "_tool_info"
+    import httpx
+    from openai.types.chat import (
+        ChatCompletion,
+        ChatCompletionChunk,
+        ChatCompletionMessageToolCall,
+    )
 
+    from openai_proxy.tool_call_client.budget import StopReason
+    from openai_proxy.tool_call_client.history import HistoryPolicy
 
-def client_tool_decorator(func: Callable, description: str):
-    if not inspect.iscoroutinefunction(func):
-        err = f"Decorated method {func.__name__} must be async"
-        raise TypeError(err)
+INFO_ATTR = "_tool_info"
+DEFAULT_MAX_PARALLEL_TOOLS = 8
+
+# имя атрибута -> информация о туле, один раз на класс
+_class_tools_cache: weakref.WeakKeyDictionary[type, dict[str, ClientToolInfo]] = (
+    weakref.WeakKeyDictionary()
+)
+# сессия, от имени которой сейчас отправляется запрос, для статистики по сессиям
+_current_session: ContextVar[Optional[ToolCallSession]] = ContextVar(
+    "tool_call_session",
+    default=None,
+)
+
+
+def client_tool_decorator(
+    func: Callable[..., Any],
+    description: str,
+    cache: Optional[ToolCachePolicy] = None,
+    offload: Optional[ToolOffload] = None,
+) -> Callable[..., Any]:
+    offload = _resolve_offload(func, offload)
 
     sig = inspect.signature(func)
     # отфильтровываем self/cls
@@ -65,24 +112,61 @@ def client_tool_decorator(func: Callable, description: str):
             description=description,
         ),
         param_type=param_type,
+        cache_policy=cache,
+        offload=offload,
     )
 
     # сохраняем информацию о туле прямо в метод
     setattr(func, INFO_ATTR, tool_info)
 
+    if offload is not None:
+
+        @wraps(func)
+        def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+            return func(*args, **kwargs)
+
+        return sync_wrapper
+
     @wraps(func)
-    async def wrapper(self, *args, **kwargs):
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
         return await func(self, *args, **kwargs)
 
     return wrapper
 
 
+def _resolve_offload(
+    func: Callable[..., Any],
+    offload: Optional[ToolOffload],
+) -> Optional[ToolOffload]:
+    if inspect.iscoroutinefunction(func):
+        if offload is not None:
+            err = f"Decorated method {func.__name__} is async and runs on the event loop"
+            raise TypeError(err)
+        return None
+
+    if offload == "process" and "self" in inspect.signature(func).parameters:
+        # в процесс передается только функция, объект клиента не сериализуется
+        err = f"Process tool {func.__name__} must not use self, make it a staticmethod"
+        raise TypeError(err)
+    return offload or "thread"
+
+
 class OpenAIProxyToolCallClient:
     """
     Client for OpenAI proxy tool calls.
     Use OpenAIProxyToolCallClient.tool decorator to mark methods as tools.
     Or mark them explicitly with OpenAIProxyToolCallClient.mark_tool_methods.
-    Note that only async methods with type annotated arguments are supported.
+    Note that only methods with type annotated arguments are supported.
+    Sync tools run in thread_pool (the loop default executor if it is not set)
+    or, with offload="process", in process_pool (created on first use).
+    Tool calls run concurrently, at most max_parallel_tools at a time per client,
+    and each of them is limited by tool_timeout seconds if it is set.
+    history_policies are applied in order before every model request to bound the history
+    kept in memory and sent upstream; request body sizes are collected in stats.
+    budget bounds round-trips, time, tokens and cost of every request unless
+    a request passes its own.
+    The client itself is one conversation. Use create_session to serve many concurrent
+    conversations with isolated histories over the same connection pool.
     """
 
     def __init__(
@@ -91,120 +175,510 @@ class OpenAIProxyToolCallClient:
         system_prompt_paths: Optional[list[Path]] = None,
         openai_proxy_client_settings: Optional[OpenAIProxyClientSettings] = None,
         tools: Optional[list[ClientTool]] = None,
+        *,
+        max_parallel_tools: int = DEFAULT_MAX_PARALLEL_TOOLS,
+        tool_timeout: Optional[float] = None,
+        history_policies: Optional[Sequence[HistoryPolicy]] = None,
+        budget: Optional[ToolCallBudget] = None,
+        thread_pool: Optional[Executor] = None,
+        process_pool: Optional[Executor] = None,
     ) -> None:
+        if max_parallel_tools < 1:
+            err = "max_parallel_tools must be greater than zero"
+            raise ValueError(err)
+
         system_prompts = ensure_prompts(system_prompts, system_prompt_paths)
         settings = openai_proxy_client_settings or OpenAIProxyClientSettings()
 
         self._client = AsyncOpenAI(
             api_key=settings.api_key,
             base_url=settings.openai_base_url,
-            http_client=DefaultAsyncHttpxClient(verify=settings.verify_ssl),
+            http_client=DefaultAsyncHttpxClient(
+                verify=settings.verify_ssl,
+                event_hooks={"request": [self._record_request]},
+            ),
+        )
+        self._system_prompts = system_prompts
+        self._session = self.create_session()
+        self._set_tools(self.collect_tools(self) if tools is None else tools)
+        self._tools_semaphore = asyncio.Semaphore(max_parallel_tools)
+        self._tool_timeout = tool_timeout
+        self._history_policies = list(history_policies or ())
+        self.stats = RequestStats()
+        self._budget = budget or ToolCallBudget()
+        self._thread_pool = thread_pool
+        self._process_pool = process_pool
+        self._owns_process_pool = False
+
+    @property
+    def session(self) -> ToolCallSession:
+        """Default session used by request methods called without a session."""
+        return self._session
+
+    @property
+    def _messages(self) -> list[dict[str, Any]]:
+        return self._session.messages
+
+    def create_session(self, system_prompts: Optional[list[str]] = None) -> ToolCallSession:
+        """
+        Creates a conversation with its own history, sharing this client's connections and tools.
+        :param system_prompts: system prompts of the session, client prompts by default.
+        :return: new session.
+        """
+        prompts = self._system_prompts if system_prompts is None else system_prompts
+        return ToolCallSession(
+            client=self,
+            messages=[{"role": "system", "content": prompt} for prompt in prompts],
         )
-        self._messages = [
-            {"role": "system", "content": prompt}
-            for prompt in system_prompts
-        ]
-        self._tools: list[ClientTool] = self.collect_tools(self) if tools is None else tools
 
     async def close(self) -> None:
         await self._client.close()
+        if self._owns_process_pool and self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
 
     async def __aenter__(self) -> OpenAIProxyToolCallClient:
         return self
 
-    async def __aexit__(self, _exc_type, _exc, _tb) -> None:  # type: ignore[override]
+    async def __aexit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc: BaseException | None,
+        _tb: TracebackType | None,
+    ) -> None:
         await self.close()
 
-    async def request(self, user_prompt: str) -> str:
+    async def request(
+        self,
+        user_prompt: str,
+        budget: Optional[ToolCallBudget] = None,
+        *,
+        session: Optional[ToolCallSession] = None,
+    ) -> str:
         """
         Start requesting OpenAI proxy with a given user_prompt.
         :param user_prompt: any prompt from user.
+        :param budget: limits of this request, client budget by default.
+        :param session: conversation to continue, the default session by default.
         :return: gpt answer.
         """
-        self._messages.append({"role": "user", "content": user_prompt})
+        result = await self.request_with_usage(user_prompt, budget, session=session)
+        return result.content
 
+    async def request_with_usage(
+        self,
+        user_prompt: str,
+        budget: Optional[ToolCallBudget] = None,
+        *,
+        session: Optional[ToolCallSession] = None,
+    ) -> ToolCallResult:
+        """
+        Same as request, but returns the answer with usage accounting and the reason
+        the tool-call loop stopped. When a budget is exceeded the loop ends after
+        the current model answer; tool calls it asked for are answered with an error.
+        :param user_prompt: any prompt from user.
+        :param budget: limits of this request, client budget by default.
+        :param session: conversation to continue, the default session by default.
+        :return: gpt answer, stop reason and usage.
+        """
+        session = session or self._session
+        session.messages.append({"role": "user", "content": user_prompt})
+
+        tracker = BudgetTracker(budget or self._budget)
         answer_parts: list[str] = []
+        stop_reason: StopReason = "completed"
 
         while True:
-            answer = await self._request_openai()
+            try:
+                resp = await asyncio.wait_for(
+                    self._request_openai(session),
+                    timeout=tracker.remaining_seconds(),
+                )
+            except TimeoutError:
+                stop_reason = "deadline"
+                break
+
+            tracker.usage.add(resp.usage)
+            answer = resp.choices[0].message
             logger.debug(f"OpenAI answer: {answer.model_dump_json()}")
 
             if answer.content:
                 answer_parts.append(answer.content)
 
-            if answer.tool_calls:
-                for tool_call in answer.tool_calls:
-                    await self._call_tool(tool_call)
-            else:
+            if not answer.tool_calls:
+                break
+
+            if (exceeded := tracker.exceeded()) is not None:
+                logger.warning(f"Tool-call loop stopped, {exceeded} budget exceeded")
+                self._skip_tools(session, answer.tool_calls, exceeded)
+                stop_reason = exceeded
+                break
+
+            await self._call_tools(
+                answer.tool_calls,
+                session,
+                timeout=tracker.remaining_seconds(),
+            )
+
+        return ToolCallResult(
+            content="\n".join(answer_parts),
+            stop_reason=stop_reason,
+            usage=tracker.usage,
+        )
+
+    def request_many(
+        self,
+        user_prompts: Iterable[str] | AsyncIterable[str],
+        budget: Optional[ToolCallBudget] = None,
+        *,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+        retries: int = 0,
+        retry_backoff: float = 0.0,
+    ) -> AsyncIterator[BatchResult[str, str]]:
+        """
+        Answers independent prompts concurrently, each in a new session of this client.
+        :param user_prompts: iterable or async iterable of prompts, consumed lazily.
+        :param budget: limits of every request, client budget by default.
+        :param concurrency: max prompts in flight.
+        :param ordered: yield results in input order, otherwise as they complete.
+        :param retries: extra attempts of a failed prompt, each in a fresh session.
+        :param retry_backoff: delay before the first extra attempt, doubled after each one.
+        :return: async iterator of results, a failed prompt carries its error.
+        """
+
+        async def request_in_new_session(user_prompt: str) -> str:
+            return await self.create_session().request(user_prompt, budget)
+
+        return map_concurrently(
+            request_in_new_session,
+            user_prompts,
+            concurrency=concurrency,
+            ordered=ordered,
+            retries=retries,
+            retry_backoff=retry_backoff,
+        )
+
+    async def request_stream(
+        self,
+        user_prompt: str,
+        budget: Optional[ToolCallBudget] = None,
+        *,
+        session: Optional[ToolCallSession] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Same as request, but yields answer content deltas as soon as they arrive.
+        Each tool starts as soon as its arguments are streamed completely, while the rest
+        of the answer is still arriving. Joined deltas are equal to the request result.
+        The budget is enforced as in request_with_usage: when it is exceeded the loop ends
+        after the current model answer and its tool calls are answered with an error.
+        :param user_prompt: any prompt from user.
+        :param budget: limits of this request, client budget by default.
+        :param session: conversation to continue, the default session by default.
+        :return: async iterator of gpt answer deltas.
+        """
+        session = session or self._session
+        session.messages.append({"role": "user", "content": user_prompt})
+
+        tracker = BudgetTracker(budget or self._budget)
+        has_content = False
+        while True:
+            turn = StreamedTurn()
+            separator = "\n" if has_content else ""
+            try:
+                deltas = self._stream_turn(session, turn, separator, tracker)
+                async with aclosing(deltas):
+                    async for delta in deltas:
+                        yield delta
+            except TimeoutError:
+                logger.warning("Tool-call loop stopped, deadline budget exceeded")
+                if turn.content is not None:
+                    self._append_assistant_message(session, turn.content, None)
+                break
+
+            tracker.usage.add(turn.usage)
+            has_content = has_content or turn.content is not None
+            tool_calls = turn.assembler.tool_calls
+            self._append_assistant_message(session, turn.content, tool_calls)
+            if not tool_calls:
+                break
+
+            if (exceeded := tracker.exceeded()) is not None:
+                logger.warning(f"Tool-call loop stopped, {exceeded} budget exceeded")
+                turn.cancel_tools()
+                await asyncio.gather(*turn.tool_tasks, return_exceptions=True)
+                self._skip_tools(session, tool_calls, exceeded)
                 break
 
-        return "\n".join(answer_parts)
+            session.messages.extend(await asyncio.gather(*turn.tool_tasks))
 
-    async def _request_openai(self) -> ChatCompletionMessage:
-        request_payload: dict[str, object] = {
+    async def _stream_turn(
+        self,
+        session: ToolCallSession,
+        turn: StreamedTurn,
+        separator: str,
+        tracker: BudgetTracker,
+    ) -> AsyncGenerator[str, None]:
+        # на последнем разрешенном круге тулы не запускаются: их ответы уже не понадобятся
+        start_tools = not tracker.is_last_round_trip()
+        await self._apply_history_policies(session)
+        async with asyncio.timeout(tracker.remaining_seconds()):
+            stream = await self._create_completion(
+                session,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        try:
+            async for chunk in _iter_before_deadline(stream, tracker):
+                if chunk.usage is not None:
+                    turn.usage = chunk.usage
+                if not chunk.choices:
+                    continue
+
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    if separator and not turn.content_parts:
+                        yield separator
+                    turn.content_parts.append(delta.content)
+                    yield delta.content
+
+                for tool_call_delta in delta.tool_calls or ():
+                    completed = turn.assembler.add(tool_call_delta)
+                    if start_tools:
+                        self._start_tools(session, turn, completed, tracker)
+
+            completed = turn.assembler.finish()
+            if start_tools:
+                self._start_tools(session, turn, completed, tracker)
+        except BaseException:
+            turn.cancel_tools()
+            raise
+        finally:
+            await stream.close()
+
+    def _start_tools(
+        self,
+        session: ToolCallSession,
+        turn: StreamedTurn,
+        tool_calls: list[ChatCompletionMessageToolCall],
+        tracker: BudgetTracker,
+    ) -> None:
+        timeout = tracker.remaining_seconds()
+        turn.tool_tasks.extend(
+            asyncio.create_task(self._run_tool(c, timeout, session)) for c in tool_calls
+        )
+
+    def _build_request_payload(self, session: Optional[ToolCallSession] = None) -> dict[str, Any]:
+        request_payload: dict[str, Any] = {
             "model": "auto",
-            "messages": self._messages,
+            "messages": (session or self._session).messages,
         }
-        if self._tools:
-            request_payload["tools"] = [tool.tool_schema for tool in self._tools]
+        if self._tools_payload:
+            request_payload["tools"] = self._tools_payload
             request_payload["tool_choice"] = "auto"
-
-        resp = await self._client.chat.completions.create(**request_payload)
+        return request_payload
+
+    async def _apply_history_policies(self, session: ToolCallSession) -> None:
+        for policy in self._history_policies:
+            session.messages = await policy.apply(session.messages)
+
+    async def _record_request(self, request: httpx.Request) -> None:
+        request_bytes = len(request.content)
+        self.stats.record(request_bytes)
+        if (session := _current_session.get()) is not None:
+            session.stats.record(request_bytes)
+
+    async def _create_completion(self, session: ToolCallSession, **kwargs: Any) -> Any:
+        token = _current_session.set(session)
+        try:
+            return await self._client.chat.completions.create(
+                **self._build_request_payload(session),
+                **kwargs,
+            )
+        finally:
+            _current_session.reset(token)
+
+    async def _request_openai(self, session: ToolCallSession) -> ChatCompletion:
+        await self._apply_history_policies(session)
+        resp = await self._create_completion(session)
         message = resp.choices[0].message
+        self._append_assistant_message(session, message.content, message.tool_calls)
+        return resp
+
+    def _append_assistant_message(
+        self,
+        session: ToolCallSession,
+        content: Optional[str],
+        tool_calls: Optional[list[ChatCompletionMessageToolCall]],
+    ) -> None:
         assistant_message: dict[str, object | None] = {
             "role": "assistant",
-            "content": message.content,
+            "content": content,
         }
-        if message.tool_calls:
+        if tool_calls:
             assistant_message["tool_calls"] = [
                 tool_call.model_dump(mode="json")
-                for tool_call in message.tool_calls
+                for tool_call in tool_calls
             ]
-        self._messages.append(assistant_message)
-        return message
+        session.messages.append(assistant_message)
+
+    async def _call_tools(
+        self,
+        tool_calls: list[Any],
+        session: Optional[ToolCallSession] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Runs tool calls of one turn concurrently.
+        Results are appended in the order of tool_calls, whatever order they finish in.
+        """
+        session = session or self._session
+        tool_messages = await asyncio.gather(
+            *(self._run_tool(c, timeout, session) for c in tool_calls),
+        )
+        session.messages.extend(tool_messages)
+
+    def _skip_tools(
+        self,
+        session: ToolCallSession,
+        tool_calls: list[Any],
+        reason: StopReason,
+    ) -> None:
+        # история должна остаться валидной: на каждый tool_call нужен ответ
+        content = json.dumps({"error": f"Tool call skipped: {reason} budget exceeded"})
+        session.messages.extend(self._tool_message(c, content) for c in tool_calls)
 
     async def _call_tool(
         self,
         tool_call: Any,
+        session: Optional[ToolCallSession] = None,
     ) -> None:
+        session = session or self._session
+        session.messages.append(await self._run_tool(tool_call, session=session))
+
+    async def _run_tool(
+        self,
+        tool_call: Any,
+        timeout: Optional[float] = None,
+        session: Optional[ToolCallSession] = None,
+    ) -> dict[str, str]:
+        try:
+            async with self._tools_semaphore:
+                content = await self._execute_tool(tool_call, timeout, session)
+        except Exception as ex:  # noqa: BLE001
+            # ошибка одного тула не прерывает диалог: модель получит ее текст как результат
+            logger.exception(f"Tool call {tool_call.function.name} failed: {ex}")
+            content = json.dumps({"error": f"{type(ex).__name__}: {ex}"}, ensure_ascii=False)
+
+        return self._tool_message(tool_call, content)
+
+    @staticmethod
+    def _tool_message(tool_call: Any, content: str) -> dict[str, str]:
+        return {
+            "role": "tool",
+            "content": content,
+            "tool_call_id": tool_call.id,
+        }
+
+    async def _execute_tool(
+        self,
+        tool_call: Any,
+        timeout: Optional[float] = None,
+        session: Optional[ToolCallSession] = None,
+    ) -> str:
         logger.debug("OpenAI wants tool call")
         tool = self._find_tool_by_name(tool_call.function.name)
         logger.debug(f"Tool found: {tool.name}")
         req = tool.param_type.model_validate_json(tool_call.function.arguments)
         logger.debug(f"Input: {req.model_dump_json()}")
-        resp = await tool.python_method(req)
-        if not isinstance(resp, BaseModel):
-            err = f"Tool {tool.name} returned {type(resp).__name__}, expected BaseModel"
-            raise TypeError(err)
-        logger.debug(f"Output: {resp.model_dump_json()}")
-        self._messages.append(
-            {
-                "role": "tool",
-                "content": resp.model_dump_json(),
-                "tool_call_id": tool_call.id,
-            },
+        if tool.cache_policy is None:
+            return await self._invoke_tool(tool, req, timeout)
+
+        cache = self._get_tool_cache(tool, session or self._session)
+        return await cache.get_or_call(
+            req.model_dump_json(),
+            lambda: self._invoke_tool(tool, req, timeout),
         )
 
-    def _find_tool_by_name(self, name: str) -> ClientTool:
-        for tool in self._tools:
-            if tool.name == name:
-                return tool
+    @staticmethod
+    def _get_tool_cache(tool: ClientTool, session: ToolCallSession) -> ToolResultCache:
+        if tool.global_cache is not None:
+            return tool.global_cache
+
+        if tool.cache_policy is None:
+            err = f"Tool {tool.name} has no cache policy"
+            raise ValueError(err)
+
+        cache = session.tool_caches.get(tool.name)
+        if cache is None:
+            cache = session.tool_caches[tool.name] = ToolResultCache(tool.cache_policy)
+        return cache
 
-        err = f"Tool {name} is not implemented"
-        raise NotImplementedError(err)
+    async def _invoke_tool(
+        self,
+        tool: ClientTool,
+        req: BaseModel,
+        timeout: Optional[float],
+    ) -> str:
+        if self._tool_timeout is not None:
+            timeout = self._tool_timeout if timeout is None else min(timeout, self._tool_timeout)
+        # по таймауту sync тул перестает ожидаться, но поток или процесс доработает вызов
+        content = await asyncio.wait_for(self._call_tool_method(tool, req), timeout=timeout)
+        logger.debug(f"Output: {content}")
+        return content
+
+    async def _call_tool_method(self, tool: ClientTool, req: BaseModel) -> str:
+        if tool.offload is None:
+            return dump_tool_result(tool.name, await tool.async_method(req))
+
+        loop = asyncio.get_running_loop()
+        if tool.offload == "thread":
+            resp = await loop.run_in_executor(self._thread_pool, tool.sync_method, req)
+            return dump_tool_result(tool.name, resp)
+
+        arguments_json = req.model_dump_json()
+        return await loop.run_in_executor(
+            self._get_process_pool(),
+            partial(run_tool_in_process, tool.sync_method, tool.param_type, arguments_json),
+        )
+
+    def _get_process_pool(self) -> Executor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor()
+            self._owns_process_pool = True
+        return self._process_pool
+
+    def _set_tools(self, tools: list[ClientTool]) -> None:
+        self._tools = tools
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        # схемы не меняются между запросами, список собирается один раз
+        self._tools_payload = [tool.tool_schema for tool in tools]
+
+    def _find_tool_by_name(self, name: str) -> ClientTool:
+        tool = self._tools_by_name.get(name)
+        if tool is None:
+            err = f"Tool {name} is not implemented"
+            raise NotImplementedError(err)
+        return tool
 
     @staticmethod
-    def tool(description: str):
+    def tool(
+        description: str,
+        cache: Optional[ToolCachePolicy] = None,
+        offload: Optional[ToolOffload] = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
         """
         Декоратор, который:
         1) проверяет, что метод принимает не более одного аргумента (кроме self/cls),
         2) достаёт у него аннотацию параметра (если есть),
         3) сохраняет информацию о туле прямо в метод (func),
         4) возвращает обёртку, прокси для самого метода.
+        С cache результаты повторных вызовов с теми же аргументами берутся из кэша.
+        Sync методы выполняются в пуле потоков, с offload="process" - в пуле процессов.
         """
 
-        def decorator(func: Callable):
-            return client_tool_decorator(func, description)
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            return client_tool_decorator(func, description, cache, offload)
 
         return decorator
 
@@ -216,20 +690,28 @@ class OpenAIProxyToolCallClient:
         :param obj: Объект, с которого собрать тулы.
         :return:
         """
-        tools: list[ClientTool] = []
-        for attr_name in dir(obj):
-            method = getattr(obj, attr_name)
-            tool_info: Optional[ClientToolInfo] = getattr(method, INFO_ATTR, None)
+        tool_infos = dict(_collect_class_tool_infos(type(obj)))
+        for attr_name, value in getattr(obj, "__dict__", {}).items():
+            tool_info: Optional[ClientToolInfo] = getattr(value, INFO_ATTR, None)
             if tool_info is not None:
-                tool = ClientTool(
-                    name=tool_info.name,
-                    description=tool_info.description,
-                    tool_schema=tool_info.tool_schema,
-                    python_method=method,
-                    param_type=tool_info.param_type,
-                )
-                tools.append(tool)
-                logger.debug(f"Tool registered: {tool.name}")
+                tool_infos[attr_name] = tool_info
+
+        tools: list[ClientTool] = []
+        for attr_name in sorted(tool_infos):
+            tool_info = tool_infos[attr_name]
+            tool = ClientTool(
+                name=tool_info.name,
+                description=tool_info.description,
+                tool_schema=tool_info.tool_schema,
+                python_method=getattr(obj, attr_name),
+                param_type=tool_info.param_type,
+                cache_policy=tool_info.cache_policy,
+                # кэш создается на объект: метод может зависеть от его состояния
+                global_cache=_make_global_cache(tool_info.cache_policy),
+                offload=tool_info.offload,
+            )
+            tools.append(tool)
+            logger.debug(f"Tool registered: {tool.name}")
 
         return tools
 
@@ -247,6 +729,45 @@ class OpenAIProxyToolCallClient:
                 method = getattr(cls, method_name)
                 client_tool_decorator(method, method_description)
 
+        # метод мог быть унаследован, поэтому сбрасываем кэш всех классов
+        _class_tools_cache.clear()
+
         # если тулы в классе клиента, нужно обновить список
         if isinstance(obj, OpenAIProxyToolCallClient):
-            obj._tools = obj.collect_tools(obj)
+            obj._set_tools(obj.collect_tools(obj))
+
+
+async def _iter_before_deadline(
+    chunks: AsyncIterable[ChatCompletionChunk],
+    tracker: BudgetTracker,
+) -> AsyncIterator[ChatCompletionChunk]:
+    iterator = aiter(chunks)
+    while True:
+        # дедлайн ограничивает ожидание чанка, но не время его обработки вызывающим
+        async with asyncio.timeout(tracker.remaining_seconds()):
+            chunk = await anext(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _make_global_cache(policy: Optional[ToolCachePolicy]) -> Optional[ToolResultCache]:
+    if policy is None or policy.scope != "global":
+        return None
+    return ToolResultCache(policy)
+
+
+def _collect_class_tool_infos(cls: type) -> dict[str, ClientToolInfo]:
+    tool_infos = _class_tools_cache.get(cls)
+    if tool_infos is None:
+        tool_infos = {}
+        for attr_name in dir(cls):
+            # getattr_static не вызывает свойства и дескрипторы
+            value = inspect.getattr_static(cls, attr_name)
+            if isinstance(value, (staticmethod, classmethod)):
+                value = value.__func__
+            tool_info: Optional[ClientToolInfo] = getattr(value, INFO_ATTR, None)
+            if tool_info is not None:
+                tool_infos[attr_name] = tool_info
+        _class_tools_cache[cls] = tool_infos
+    return tool_infos
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+Message = dict[str, Any]
+Summarizer = Callable[[list[Message]], Awaitable[str]]
+
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKENS_OVERHEAD = 4
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+class HistoryPolicy(Protocol):
+    """
+    Bounds conversation history before it is sent to the model.
+    Policies work with whole turns (a user message and everything after it), so a tool
+    result is never separated from the assistant message that requested it. The current
+    turn is always kept.
+    """
+
+    async def apply(self, messages: list[Message]) -> list[Message]: ...
+
+
+@dataclass(slots=True)
+class RequestStats:
+    requests: int = 0
+    bytes_sent: int = 0
+    last_request_bytes: int = 0
+
+    def record(self, request_bytes: int) -> None:
+        self.requests += 1
+        self.bytes_sent += request_bytes
+        self.last_request_bytes = request_bytes
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local estimate: about four characters per token."""
+
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(message: Message) -> int:
+    tokens = MESSAGE_TOKENS_OVERHEAD
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += estimate_tokens(content)
+    for tool_call in message.get("tool_calls") or ():
+        tokens += estimate_tokens(json.dumps(tool_call, ensure_ascii=False))
+    return tokens
+
+
+def split_turns(messages: list[Message]) -> tuple[list[Message], list[list[Message]]]:
+    """Splits history into leading system messages and turns started by user messages."""
+
+    system_messages: list[Message] = []
+    turns: list[list[Message]] = []
+    for message in messages:
+        if message.get("role") == "user":
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+        else:
+            system_messages.append(message)
+    return system_messages, turns
+
+
+def join_turns(system_messages: list[Message], turns: list[list[Message]]) -> list[Message]:
+    return [*system_messages, *(message for turn in turns for message in turn)]
+
+
+class KeepLastTurnsPolicy:
+    """Keeps system prompts and the last max_turns turns."""
+
+    def __init__(self, max_turns: int) -> None:
+        if max_turns < 1:
+            err = "max_turns must be greater than zero"
+            raise ValueError(err)
+        self._max_turns = max_turns
+
+    async def apply(self, messages: list[Message]) -> list[Message]:
+        system_messages, turns = split_turns(messages)
+        if len(turns) <= self._max_turns:
+            return messages
+        return join_turns(system_messages, turns[-self._max_turns :])
+
+
+class TokenBudgetPolicy:
+    """Keeps system prompts and as many recent turns as fit into max_tokens."""
+
+    def __init__(
+        self,
+        max_tokens: int,
+        token_counter: Callable[[Message], int] = estimate_message_tokens,
+    ) -> None:
+        if max_tokens < 1:
+            err = "max_tokens must be greater than zero"
+            raise ValueError(err)
+        self._max_tokens = max_tokens
+        self._token_counter = token_counter
+
+    async def apply(self, messages: list[Message]) -> list[Message]:
+        system_messages, turns = split_turns(messages)
+        budget = self._max_tokens - sum(self._token_counter(m) for m in system_messages)
+
+        kept_turns: list[list[Message]] = []
+        for index, turn in enumerate(reversed(turns)):
+            budget -= sum(self._token_counter(m) for m in turn)
+            if budget < 0 and index > 0:
+                break
+            kept_turns.append(turn)
+
+        if len(kept_turns) == len(turns):
+            return messages
+        return join_turns(system_messages, kept_turns[::-1])
+
+
+class TruncateToolOutputsPolicy:
+    """Truncates tool results longer than max_chars."""
+
+    def __init__(self, max_chars: int) -> None:
+        if max_chars < 1:
+            err = "max_chars must be greater than zero"
+            raise ValueError(err)
+        self._max_chars = max_chars
+
+    async def apply(self, messages: list[Message]) -> list[Message]:
+        return [self._truncate(message) for message in messages]
+
+    def _truncate(self, message: Message) -> Message:
+        content = message.get("content")
+        if (
+            message.get("role") != "tool"
+            or not isinstance(content, str)
+            or len(content) <= self._max_chars
+        ):
+            return message
+
+        dropped_chars = len(content) - self._max_chars
+        return {
+            **message,
+            "content": f"{content[: self._max_chars]}... [truncated {dropped_chars} chars]",
+        }
+
+
+class SummarizeOlderTurnsPolicy:
+    """
+    Replaces turns older than the last keep_turns with a summary produced by summarizer,
+    e.g. a cheap model call. A summary left by an earlier call is passed to the summarizer
+    with the older turns and replaced, so a long session keeps a single summary message.
+    """
+
+    def __init__(self, summarizer: Summarizer, keep_turns: int) -> None:
+        # последний ход - текущий запрос пользователя, его нельзя пересказывать
+        if keep_turns < 1:
+            err = "keep_turns must be greater than zero"
+            raise ValueError(err)
+        self._summarizer = summarizer
+        self._keep_turns = keep_turns
+
+    async def apply(self, messages: list[Message]) -> list[Message]:
+        system_messages, turns = split_turns(messages)
+        if len(turns) <= self._keep_turns:
+            return messages
+
+        previous_summaries = [m for m in system_messages if _is_summary_message(m)]
+        system_messages = [m for m in system_messages if not _is_summary_message(m)]
+        older_turns = turns[: len(turns) - self._keep_turns]
+        summary = await self._summarizer(join_turns(previous_summaries, older_turns))
+        summary_message: Message = {
+            "role": "system",
+            "content": f"{SUMMARY_PREFIX}{summary}",
+        }
+        return join_turns(
+            [*system_messages, summary_message],
+            turns[len(turns) - self._keep_turns :],
+        )
+
+
+def _is_summary_message(message: Message) -> bool:
+    content = message.get("content")
+    return (
+        message.get("role") == "system"
+        and isinstance(content, str)
+        and content.startswith(SUMMARY_PREFIX)
+    )
@@ -1,7 +1,11 @@
-from typing import Any, Awaitable, Callable, Type
+import inspect
+from typing import Any, Awaitable, Callable, Optional, Type, Union, cast
 
 from pydantic import BaseModel, ConfigDict
 
+from openai_proxy.tool_call_client.offload import ToolOffload
+from openai_proxy.tool_call_client.tool_cache import ToolCachePolicy, ToolResultCache
+
 
 class ClientToolInfo(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -10,7 +14,28 @@ class ClientToolInfo(BaseModel):
     description: str
     tool_schema: dict[str, Any]
     param_type: Type[BaseModel]
+    cache_policy: Optional[ToolCachePolicy] = None
+    # None - async тул, выполняется в event loop
+    offload: Optional[ToolOffload] = None
 
 
 class ClientTool(ClientToolInfo):
-    python_method: Callable[[BaseModel], Awaitable[BaseModel]]
+    python_method: Callable[[BaseModel], Union[Awaitable[BaseModel], BaseModel]]
+    # общий для сессий кэш scope="global" объекта, чей это метод; scope="session" - в сессии
+    global_cache: Optional[ToolResultCache] = None
+
+    def model_post_init(self, _context: Any) -> None:
+        # offload задается только sync тулам, поэтому вид метода известен при регистрации
+        if self.offload is not None and inspect.iscoroutinefunction(self.python_method):
+            err = f"Tool {self.name} is async and can not be offloaded"
+            raise TypeError(err)
+
+    @property
+    def async_method(self) -> Callable[[BaseModel], Awaitable[BaseModel]]:
+        """python_method of a tool running on the event loop (offload is None)."""
+        return cast("Callable[[BaseModel], Awaitable[BaseModel]]", self.python_method)
+
+    @property
+    def sync_method(self) -> Callable[[BaseModel], BaseModel]:
+        """python_method of a tool offloaded to a thread or a process."""
+        return cast("Callable[[BaseModel], BaseModel]", self.python_method)
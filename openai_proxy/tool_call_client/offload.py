@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Literal
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+ToolOffload = Literal["thread", "process"]
+
+
+def dump_tool_result(name: str, resp: object) -> str:
+    if not isinstance(resp, BaseModel):
+        err = f"Tool {name} returned {type(resp).__name__}, expected BaseModel"
+        raise TypeError(err)
+    return resp.model_dump_json()
+
+
+def run_tool_in_process(
+    func: Callable[[BaseModel], BaseModel],
+    param_type: type[BaseModel],
+    arguments_json: str,
+) -> str:
+    """
+    Runs a sync tool in a worker process.
+    Arguments and result cross the process boundary as JSON, so only the function and
+    the argument model class are pickled, by reference.
+    """
+    resp = func(param_type.model_validate_json(arguments_json))
+    return dump_tool_result(func.__name__, resp)
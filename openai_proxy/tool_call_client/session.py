@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+from openai_proxy.tool_call_client.history import RequestStats
+from openai_proxy.tool_call_client.tool_cache import ToolResultCache
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from openai_proxy.tool_call_client.budget import ToolCallBudget, ToolCallResult
+    from openai_proxy.tool_call_client.client import OpenAIProxyToolCallClient
+
+
+@dataclass(eq=False)
+class ToolCallSession:
+    """
+    One conversation served by a shared OpenAIProxyToolCallClient.
+    Sessions of one client share its HTTP connection pool and tools,
+    but each of them keeps its own history, stats and session-scoped tool caches.
+    """
+
+    client: OpenAIProxyToolCallClient
+    messages: list[dict[str, Any]] = field(default_factory=list)
+    stats: RequestStats = field(default_factory=RequestStats)
+    tool_caches: dict[str, ToolResultCache] = field(default_factory=dict)
+
+    async def request(self, user_prompt: str, budget: Optional[ToolCallBudget] = None) -> str:
+        return await self.client.request(user_prompt, budget, session=self)
+
+    async def request_with_usage(
+        self,
+        user_prompt: str,
+        budget: Optional[ToolCallBudget] = None,
+    ) -> ToolCallResult:
+        return await self.client.request_with_usage(user_prompt, budget, session=self)
+
+    def request_stream(
+        self,
+        user_prompt: str,
+        budget: Optional[ToolCallBudget] = None,
+    ) -> AsyncIterator[str]:
+        return self.client.request_stream(user_prompt, budget, session=self)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from openai_proxy.streaming import ToolCallsAssembler
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from openai.types import CompletionUsage
+
+
+@dataclass
+class StreamedTurn:
+    """State of one streamed model turn: its content and tools started during it."""
+
+    content_parts: list[str] = field(default_factory=list)
+    assembler: ToolCallsAssembler = field(default_factory=ToolCallsAssembler)
+    tool_tasks: list[asyncio.Task[dict[str, str]]] = field(default_factory=list)
+    usage: CompletionUsage | None = None
+
+    @property
+    def content(self) -> str | None:
+        return "".join(self.content_parts) or None
+
+    def cancel_tools(self) -> None:
+        for task in self.tool_tasks:
+            task.cancel()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, Optional
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+ToolCacheScope = Literal["session", "global"]
+
+
+@dataclass(frozen=True, slots=True)
+class ToolCachePolicy:
+    """
+    How results of a tool are cached.
+    Results are keyed by the validated argument model; ttl_seconds=None keeps them until
+    they are evicted as least recently used. Session scope caches results per conversation,
+    global scope shares them between all sessions of one client. Clients never share results,
+    since a tool may read the state of the object it belongs to.
+    """
+
+    ttl_seconds: Optional[float] = None
+    max_entries: int = 1024
+    scope: ToolCacheScope = "session"
+
+    def __post_init__(self) -> None:
+        if self.max_entries < 1:
+            err = "max_entries must be greater than zero"
+            raise ValueError(err)
+
+
+class ToolResultCache:
+    """
+    LRU cache of serialized tool results with optional TTL.
+    Concurrent calls with the same key are coalesced into one tool run.
+    """
+
+    def __init__(
+        self,
+        policy: ToolCachePolicy,
+        now_provider: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._policy = policy
+        self._now = now_provider or time.monotonic
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[str]]) -> str:
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+
+        # shield: отмена одного ожидающего не отменяет вызов для остальных
+        return await asyncio.shield(task)
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, result = entry
+        if expires_at <= self._now():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def _on_done(self, key: str, task: asyncio.Task[str]) -> None:
+        self._in_flight.pop(key, None)
+        # ошибки и отмены не кэшируются
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        ttl_seconds = self._policy.ttl_seconds
+        expires_at = float("inf") if ttl_seconds is None else self._now() + ttl_seconds
+        self._entries[key] = (expires_at, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._policy.max_entries:
+            self._entries.popitem(last=False)
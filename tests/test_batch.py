@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from openai_proxy.batch import BatchResult, map_concurrently
+
+ITEMS_COUNT = 10
+CONCURRENCY = 3
+RETRIES = 2
+
+
+async def _collect(results) -> list[BatchResult]:
+    return [result async for result in results]
+
+
+@pytest.mark.asyncio
+async def test_map_concurrently_bounds_concurrency_and_keeps_order() -> None:
+    running = 0
+    max_running = 0
+
+    async def square(item: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # первые элементы завершаются последними
+        await asyncio.sleep(0.001 * (ITEMS_COUNT - item))
+        running -= 1
+        return item * item
+
+    results = await _collect(
+        map_concurrently(square, range(ITEMS_COUNT), concurrency=CONCURRENCY),
+    )
+
+    assert [result.index for result in results] == list(range(ITEMS_COUNT))
+    assert [result.unwrap() for result in results] == [item * item for item in range(ITEMS_COUNT)]
+    assert max_running == CONCURRENCY
+
+
+@pytest.mark.asyncio
+async def test_map_concurrently_yields_as_completed_from_async_iterable() -> None:
+    async def items():
+        for item in (3, 1, 2):
+            yield item
+
+    async def sleep(item: int) -> int:
+        await asyncio.sleep(0.01 * item)
+        return item
+
+    results = await _collect(map_concurrently(sleep, items(), ordered=False))
+
+    assert [result.result for result in results] == [1, 2, 3]
+    assert [result.index for result in results] == [1, 2, 0]
+
+
+@pytest.mark.asyncio
+async def test_map_concurrently_retries_and_captures_errors() -> None:
+    attempts: dict[str, int] = {}
+
+    async def flaky(item: str) -> str:
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == "broken" or attempts[item] < RETRIES:
+            err = f"{item} failed"
+            raise RuntimeError(err)
+        return item
+
+    results = await _collect(map_concurrently(flaky, ["ok", "broken"], retries=RETRIES))
+
+    assert results[0].ok
+    assert results[0].result == "ok"
+    assert results[0].attempts == RETRIES
+    assert not results[1].ok
+    assert results[1].attempts == RETRIES + 1
+    with pytest.raises(RuntimeError, match="broken failed"):
+        results[1].unwrap()
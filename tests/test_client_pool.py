@@ -0,0 +1,214 @@
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from openai import DEFAULT_MAX_RETRIES, AsyncOpenAI, RateLimitError
+
+from openai_proxy import openai_compat
+from openai_proxy.client import (
+    NoRateLimitRetryTransport,
+    OpenAIClient,
+    RateLimitState,
+    parse_duration,
+)
+from openai_proxy.client_pool import NoAvailableKeysError, OpenAIClientPool, PooledKey
+from openai_proxy.metrics import ProxyMetrics
+from openai_proxy.openai_compat import MessageTooLargeError
+from openai_proxy.settings import OpenAIProviderOptions
+
+RETRY_AFTER_SECONDS = 5.0
+EXPECTED_LIMITED_KEY_CALLS = 2
+REMAINING_TOKENS = 1500
+REQUESTS_RESET_AT = 100.0
+SIX_MINUTES = 360.0
+SDK_RETRIES = 2
+MAX_MESSAGE_SIZE = 10
+COMPLETION = {
+    "id": "chatcmpl_1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "m",
+    "choices": [
+        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}},
+    ],
+}
+
+
+def _make_key(index: int, weight: float = 1.0, result: object = "ok") -> PooledKey:
+    client = SimpleNamespace(
+        request=AsyncMock(return_value=result),
+        rate_limit=RateLimitState(),
+    )
+    return PooledKey(index=index, client=client, weight=weight)
+
+
+def _make_rate_limit_error() -> RateLimitError:
+    response = httpx.Response(
+        429,
+        headers={"retry-after": str(int(RETRY_AFTER_SECONDS))},
+        request=httpx.Request("POST", "https://provider.example/v1/chat/completions"),
+    )
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_round_robin_respects_key_weights() -> None:
+    keys = [_make_key(0, weight=1.0, result="a"), _make_key(1, weight=3.0, result="b")]
+    pool = OpenAIClientPool("local", keys, metrics=ProxyMetrics())
+
+    results = Counter([await pool.request({"model": "m", "messages": []}) for _ in range(8)])
+
+    assert results == {"a": 2, "b": 6}
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_key_is_ejected_and_request_moves_to_next_key() -> None:
+    clock = {"now": 100.0}
+    metrics = ProxyMetrics()
+    limited_key, healthy_key = _make_key(0), _make_key(1, result="healthy")
+    limited_key.client.request.side_effect = _make_rate_limit_error()
+    pool = OpenAIClientPool(
+        "local",
+        [limited_key, healthy_key],
+        metrics=metrics,
+        now_provider=lambda: clock["now"],
+    )
+
+    assert await pool.request({"model": "m", "messages": []}) == "healthy"
+    assert limited_key.ejected_until == clock["now"] + RETRY_AFTER_SECONDS
+    assert metrics.get("provider_key_rate_limited_total", provider="local", key="0") == 1
+
+    await pool.request({"model": "m", "messages": []})
+    assert limited_key.client.request.await_count == 1
+
+    clock["now"] += RETRY_AFTER_SECONDS
+    limited_key.client.request.side_effect = None
+    await pool.request({"model": "m", "messages": []})
+    await pool.request({"model": "m", "messages": []})
+    assert limited_key.client.request.await_count == EXPECTED_LIMITED_KEY_CALLS
+
+
+@pytest.mark.asyncio
+async def test_pool_fails_when_every_key_is_exhausted() -> None:
+    key = _make_key(0)
+    key.client.rate_limit = RateLimitState(remaining_requests=0, requests_reset_at=200.0)
+    pool = OpenAIClientPool("local", [key], metrics=ProxyMetrics(), now_provider=lambda: 100.0)
+
+    with pytest.raises(NoAvailableKeysError, match="local"):
+        await pool.request({"model": "m", "messages": []})
+
+    key.client.request.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_least_loaded_prefers_idle_key() -> None:
+    busy_key, idle_key = _make_key(0, result="busy"), _make_key(1, result="idle")
+    busy_key.in_flight = 3
+    pool = OpenAIClientPool("local", [busy_key, idle_key], "least_loaded", metrics=ProxyMetrics())
+
+    assert await pool.request({"model": "m", "messages": []}) == "idle"
+
+
+def test_rate_limit_state_is_parsed_from_headers() -> None:
+    state = RateLimitState.from_headers(
+        httpx.Headers(
+            {
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-remaining-tokens": "1500",
+                "x-ratelimit-reset-requests": "1m30s",
+                "x-ratelimit-reset-tokens": "20ms",
+            },
+        ),
+        now=10.0,
+    )
+
+    assert state.remaining_tokens == REMAINING_TOKENS
+    assert state.exhausted_until() == REQUESTS_RESET_AT
+    assert parse_duration("6m0s") == SIX_MINUTES
+    assert parse_duration("soon") is None
+
+
+@pytest.mark.asyncio
+async def test_sdk_still_retries_transient_errors_but_not_rate_limits() -> None:
+    responses: list[httpx.Response | Exception] = []
+    calls: list[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client = AsyncOpenAI(
+        api_key="sk-test",
+        base_url="https://provider.example/v1",
+        http_client=httpx.AsyncClient(
+            transport=NoRateLimitRetryTransport(httpx.MockTransport(handle)),
+        ),
+        max_retries=SDK_RETRIES,
+    )
+
+    responses.append(httpx.Response(429, headers={"retry-after-ms": "1"}))
+    with pytest.raises(RateLimitError):
+        await client.chat.completions.create(model="m", messages=[])
+    assert len(calls) == 1
+
+    calls.clear()
+    responses.extend(
+        [
+            httpx.ConnectError("connection reset"),
+            httpx.Response(503, headers={"retry-after-ms": "1"}),
+            httpx.Response(200, json=COMPLETION),
+        ],
+    )
+    completion = await client.chat.completions.create(model="m", messages=[])
+    assert completion.choices[0].message.content == "ok"
+    assert len(calls) == SDK_RETRIES + 1
+
+
+@pytest.mark.asyncio
+async def test_pooled_clients_keep_sdk_retries() -> None:
+    pool = OpenAIClientPool.from_options(
+        "local",
+        OpenAIProviderOptions(
+            token="sk-test",  # noqa: S106
+            base_url="https://provider.example/v1",
+        ),
+    )
+
+    client = pool._keys[0].client._client
+    assert client.max_retries == DEFAULT_MAX_RETRIES
+    assert isinstance(client._client._transport, NoRateLimitRetryTransport)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_normalized_requests_skip_normalization_but_keep_size_limit(mocker) -> None:
+    client = OpenAIClient(
+        OpenAIProviderOptions(
+            token="sk-test",  # noqa: S106
+            base_url="https://provider.example/v1",
+            max_message_size=MAX_MESSAGE_SIZE,
+        ),
+    )
+    create = AsyncMock(
+        return_value=SimpleNamespace(headers=httpx.Headers(), parse=lambda: "completion"),
+    )
+    mocker.patch.object(client._client.chat.completions.with_raw_response, "create", create)
+    normalize = mocker.spy(openai_compat, "normalize_chat_completion_request")
+    request = {"model": "m", "messages": [{"role": "user", "content": "ping"}]}
+
+    assert await client.request(request, normalized=True) == "completion"
+    assert normalize.call_count == 0
+    create.assert_awaited_once_with(**request)
+
+    assert await client.request(request) == "completion"
+    assert normalize.call_count == 1
+
+    too_large_message = {"role": "user", "content": "x" * (MAX_MESSAGE_SIZE + 1)}
+    too_large = {"model": "m", "messages": [too_large_message]}
+    with pytest.raises(MessageTooLargeError):
+        await client.request(too_large, normalized=True)
@@ -0,0 +1,105 @@
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from openai_proxy import CodeBlocksParser
+from openai_proxy.code_blocks_parser import (
+    StreamingCodeBlocksParser,
+    iter_code_blocks,
+    parse_partial_json,
+)
+
+DOCS = [
+    'Here is the answer:\n```json\n{"value": 1}\n```\nDone',
+    '```json\n{\n  "a": [1,\n 2]\n}\n```\ntext\n```python\nprint(1)\n```\n```json\n[3]\n```',
+    'intro ```json\n{"open": true,\n',
+    '```json\n```\n```json\n{"b": 2} ```\n{"ignored": 1}',
+]
+CHUNK_SIZES = [1, 3, 7, 1000]
+
+
+def _stream(doc: str, chunk_size: int) -> list[str]:
+    return [doc[start : start + chunk_size] for start in range(0, len(doc), chunk_size)]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_streaming_parser_matches_code_blocks_parser(doc: str, chunk_size: int) -> None:
+    parser = StreamingCodeBlocksParser()
+
+    blocks = [block for delta in _stream(doc, chunk_size) for block in parser.feed(delta)]
+    blocks.extend(parser.finish())
+
+    assert blocks == CodeBlocksParser(doc)._extract_code_blocks("json")
+
+
+def test_block_is_emitted_on_closing_fence() -> None:
+    parser = StreamingCodeBlocksParser()
+
+    assert parser.feed('```json\n{"value": ') == []
+    assert parser.current_json() == {}
+    assert parser.feed('"par') == []
+    assert parser.current_json() == {"value": "par"}
+    assert parser.feed('tial"}\n``') == []
+    assert parser.feed("`") == ['{"value": "partial"}']
+    assert parser.current_json() is None
+    # хвост закрывающей строки игнорируется, как и в CodeBlocksParser
+    assert parser.feed(' trailing {"x": 1}\n') == []
+    assert parser.finish() == []
+
+
+@pytest.mark.asyncio
+async def test_iter_code_blocks_consumes_async_deltas() -> None:
+    async def deltas():
+        for delta in _stream(DOCS[1], 5):
+            yield delta
+
+    assert [block async for block in iter_code_blocks(deltas())] == ['{"a": [1,2]}', "[3]"]
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("", None),
+        ('{"a": 1, "b": [1, 2', {"a": 1, "b": [1, 2]}),
+        ('{"a": 1, "b', {"a": 1}),
+        ('{"a": {"b": "c\\', {"a": {"b": "c"}}),
+        ('[{"a": 1}, {"a":', [{"a": 1}, {}]),
+    ],
+)
+def test_parse_partial_json(text: str, expected: object) -> None:
+    assert parse_partial_json(text) == expected
+
+
+class Value(BaseModel):
+    value: int
+
+
+def test_find_and_validate_json_blocks_validates_all_blocks_at_once() -> None:
+    doc = 'First:\n```json\n{\n  "value": 1\n}\n```\nSecond:\n```json\n{"value": 2}\n```\n'
+
+    assert CodeBlocksParser(doc).find_and_validate_json_blocks(Value) == [
+        Value(value=1),
+        Value(value=2),
+    ]
+    assert CodeBlocksParser('{"value": 3}').find_and_validate_json_blocks(Value) == [
+        Value(value=3),
+    ]
+    assert CodeBlocksParser("no blocks").find_and_validate_json_blocks(Value) == []
+
+
+def test_find_and_validate_json_blocks_rejects_block_with_several_values() -> None:
+    doc = '```json\n{"value": 1},{"value": 2}\n```\n```json\n{"value": 3}\n```'
+
+    with pytest.raises(ValidationError):
+        CodeBlocksParser(doc).find_and_validate_json_blocks(Value)
+
+
+def test_find_and_validate_json_block_uses_whole_doc_or_first_block() -> None:
+    doc = 'Answer\n```json\n{"value": 1}\n```\n```json\n{"value": 2}\n```'
+
+    assert CodeBlocksParser(doc).find_and_validate_json_block(Value) == Value(value=1)
+    assert CodeBlocksParser(' {"value": 4} ').find_and_validate_json_block(Value) == Value(value=4)
+    with pytest.raises(ValidationError):
+        CodeBlocksParser('{"other": 1}').find_and_validate_json_block(Value)
+    with pytest.raises(RuntimeError):
+        CodeBlocksParser(doc).find_and_validate_json_block(Value, error_if_multiple_found=True)
@@ -0,0 +1,229 @@
+import gzip
+import json
+import tracemalloc
+import zlib
+
+import brotli
+import httpx
+import pytest
+import zstandard
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from openai_proxy.client import GzipRequestTransport
+from openai_proxy.compression import negotiate_encoding
+from openai_proxy.metrics import ProxyMetrics
+from openai_proxy.middlewares import (
+    BodySizeLimitMiddleware,
+    CompressionMiddleware,
+    RequestDecompressionMiddleware,
+)
+
+MINIMUM_SIZE = 64
+SSE_FRAMES = 3
+BAD_REQUEST = 400
+UNSUPPORTED_MEDIA_TYPE = 415
+REQUEST_ENTITY_TOO_LARGE = 413
+BOMB_SIZE = 64 * 1024 * 1024
+BODY_LIMIT = 1024 * 1024
+MAX_PEAK_MEMORY = 8 * 1024 * 1024
+
+
+def _make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request) -> dict[str, object]:
+        return await request.json()
+
+    app.add_middleware(RequestDecompressionMiddleware, paths=["/echo"])
+    app.add_middleware(CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+    return TestClient(app)
+
+
+def test_gzip_request_body_is_decompressed() -> None:
+    payload = {"messages": ["x" * 1000]}
+
+    response = _make_client().post(
+        "/echo",
+        content=gzip.compress(json.dumps(payload).encode()),
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/json"},
+    )
+
+    assert response.json() == payload
+
+
+def test_invalid_and_unsupported_request_encodings_are_rejected() -> None:
+    client = _make_client()
+
+    invalid = client.post("/echo", content=b"not gzip", headers={"Content-Encoding": "gzip"})
+    unsupported = client.post("/echo", content=b"{}", headers={"Content-Encoding": "compress"})
+
+    assert invalid.status_code == BAD_REQUEST
+    assert unsupported.status_code == UNSUPPORTED_MEDIA_TYPE
+
+
+@pytest.mark.parametrize(
+    ("encoding", "compress"),
+    [
+        ("br", lambda data: brotli.compress(data, quality=11)),
+        ("zstd", lambda data: zstandard.ZstdCompressor(level=19).compress(data)),
+    ],
+)
+def test_decompression_bomb_is_rejected_without_inflating_it(encoding: str, compress) -> None:
+    body = compress(b"a" * BOMB_SIZE)
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request) -> dict[str, int]:
+        return {"size": len(await request.body())}
+
+    app.add_middleware(
+        BodySizeLimitMiddleware,
+        limits={"/echo": BODY_LIMIT},
+        metrics=ProxyMetrics(),
+    )
+    app.add_middleware(RequestDecompressionMiddleware, paths=["/echo"])
+
+    tracemalloc.start()
+    try:
+        response = TestClient(app).post(
+            "/echo",
+            content=body,
+            headers={"Content-Encoding": encoding},
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert response.status_code == REQUEST_ENTITY_TOO_LARGE
+    assert peak < MAX_PEAK_MEMORY
+
+
+@pytest.mark.parametrize(
+    ("encoding", "compress"),
+    [
+        ("br", brotli.compress),
+        ("zstd", lambda data: zstandard.ZstdCompressor().compress(data)),
+    ],
+)
+def test_truncated_request_bodies_are_rejected(encoding: str, compress) -> None:
+    body = compress(json.dumps({"messages": ["x" * 1000]}).encode())
+
+    response = _make_client().post(
+        "/echo",
+        content=body[: len(body) // 2],
+        headers={"Content-Encoding": encoding},
+    )
+
+    assert response.status_code == BAD_REQUEST
+
+
+def test_small_responses_skip_compression() -> None:
+    response = _make_client().post(
+        "/echo",
+        json={"a": 1},
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"a": 1}
+
+
+def test_large_responses_are_compressed() -> None:
+    payload = {"messages": ["x" * 1000]}
+
+    response = _make_client().post("/echo", json=payload, headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(json.dumps(payload))
+    assert response.json() == payload
+
+
+@pytest.mark.asyncio
+async def test_event_stream_frames_are_flushed_individually() -> None:
+    async def app(_scope, _receive, send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            },
+        )
+        for index in range(SSE_FRAMES):
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": f"data: {index}\n\n".encode(),
+                    "more_body": True,
+                },
+            )
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent: list[dict[str, object]] = []
+
+    async def send(message: dict[str, object]) -> None:
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app, minimum_size=MINIMUM_SIZE)(scope, None, send)
+
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    frames = [decompressor.decompress(message["body"]) for message in sent[1:]]
+    # каждый кадр декодируется сразу, не дожидаясь конца потока
+    assert frames == [f"data: {index}\n\n".encode() for index in range(SSE_FRAMES)] + [b""]
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("gzip, br", "br"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("*", "zstd"),
+        ("gzip;q=0", None),
+        ("", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: str | None) -> None:
+    assert negotiate_encoding(accept_encoding, ("zstd", "br", "gzip")) == expected
+
+
+@pytest.mark.asyncio
+async def test_upstream_request_body_is_gzipped() -> None:
+    captured: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(request)
+        return httpx.Response(200, json={})
+
+    transport = GzipRequestTransport(httpx.MockTransport(handler), minimum_size=MINIMUM_SIZE)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.post("https://provider.example/v1/chat/completions", json={"a": "x" * 100})
+        await client.post("https://provider.example/v1/chat/completions", json={"a": 1})
+
+    assert captured[0].headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(captured[0].content)) == {"a": "x" * 100}
+    assert "content-encoding" not in captured[1].headers
+
+
+@pytest.mark.asyncio
+async def test_decompressing_receive_passes_disconnect_after_body() -> None:
+    messages = [
+        {"type": "http.request", "body": gzip.compress(b"payload"), "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+    received: list[dict] = []
+
+    async def app(_scope, receive, _send) -> None:
+        received.extend([await receive(), await receive(), await receive()])
+
+    async def receive() -> dict:
+        return messages.pop(0)
+
+    middleware = RequestDecompressionMiddleware(app, paths=["/echo"])
+    scope = {"type": "http", "path": "/echo", "headers": [(b"content-encoding", b"gzip")]}
+    await middleware(scope, receive, None)
+
+    assert b"".join(message.get("body", b"") for message in received[:2]) == b"payload"
+    assert received[-1] == {"type": "http.disconnect"}
@@ -0,0 +1,231 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from openai_proxy.metrics import ProxyMetrics
+from openai_proxy.services.cost_control import (
+    CostControl,
+    CostLimitExceededError,
+    _with_polza_settings,
+)
+from openai_proxy.services.cost_estimation import CostEstimator
+from openai_proxy.settings import (
+    CostControlSettings,
+    CostLimitSettings,
+    ModelPrice,
+    PolzaCostControlSettings,
+    PricingSettings,
+)
+
+
+class FakeStream:
+    def __init__(self, chunks: list[object]) -> None:
+        self._chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self) -> "FakeStream":
+        return self
+
+    async def __anext__(self) -> object:
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _make_soft_limit_settings() -> CostControlSettings:
+    return CostControlSettings(
+        providers={"polza": CostLimitSettings(soft_threshold_rub=1.0, hard_threshold_rub=5.0)},
+        logs_api_base_url="https://logs.example.com",
+        logs_api_username="logger",
+        logs_api_password="secret",  # noqa: S106
+    )
+
+
+def _make_polza_hard_limit_settings(hard_threshold_rub: float) -> CostControlSettings:
+    return CostControlSettings(
+        providers={"polza": CostLimitSettings(hard_threshold_rub=hard_threshold_rub)},
+    )
+
+
+@pytest.mark.asyncio
+async def test_soft_threshold_sends_notification_only_on_crossing() -> None:
+    notifier = SimpleNamespace(notify=AsyncMock())
+    monitor = CostControl(
+        settings=_make_soft_limit_settings(),
+        notifier=notifier,
+        now_provider=lambda: 1_000.0,
+    )
+
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"id": "gen_1", "usage": {"cost_rub": 0.6}},
+        request={"model": "chat-1"},
+    )
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"id": "gen_2", "usage": {"cost_rub": 0.5}},
+        request={"model": "chat-1"},
+    )
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"id": "gen_3", "usage": {"cost_rub": 0.1}},
+        request={"model": "chat-1"},
+    )
+
+    notifier.notify.assert_awaited_once()
+    notification_text, log_content = notifier.notify.await_args.args
+    assert "Пробит мягкий лимит стоимости запросов к polza" in notification_text
+    assert '"response_id": "gen_2"' in log_content
+    assert '"current_total_cost_rub": 1.1' in log_content
+
+
+@pytest.mark.asyncio
+async def test_hard_threshold_blocks_requests_until_window_expires() -> None:
+    clock = {"now": 2_000.0}
+    monitor = CostControl(
+        settings=_make_polza_hard_limit_settings(1.0),
+        now_provider=lambda: clock["now"],
+    )
+
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"usage": {"cost_rub": 1.1}},
+    )
+
+    with pytest.raises(CostLimitExceededError, match="Превышен жесткий лимит"):
+        await monitor.check_hard_limit("polza")
+
+    clock["now"] += 3_601.0
+
+    await monitor.check_hard_limit("polza")
+
+
+@pytest.mark.asyncio
+async def test_wrapped_stream_tracks_cost_from_usage_chunk() -> None:
+    monitor = CostControl(
+        settings=_make_polza_hard_limit_settings(0.5),
+        now_provider=lambda: 3_000.0,
+    )
+    stream = FakeStream(
+        [
+            {"choices": [{"delta": {"content": "hi"}}]},
+            {"usage": {"cost_rub": 0.7}},
+        ],
+    )
+
+    wrapped_stream = monitor.wrap_stream(
+        provider="polza",
+        response=stream,
+        request={"model": "chat-1"},
+    )
+    chunks = [chunk async for chunk in wrapped_stream]
+
+    await wrapped_stream.close()
+
+    assert chunks[-1] == {"usage": {"cost_rub": 0.7}}
+    assert stream.closed is True
+    with pytest.raises(CostLimitExceededError, match="Превышен жесткий лимит"):
+        await monitor.check_hard_limit("polza")
+
+
+@pytest.mark.asyncio
+async def test_hard_threshold_rejects_request_whose_estimate_exceeds_it() -> None:
+    metrics = ProxyMetrics()
+    monitor = CostControl(
+        settings=_make_polza_hard_limit_settings(1.0),
+        now_provider=lambda: 4_000.0,
+        metrics=metrics,
+    )
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"usage": {"cost_rub": 0.5}},
+        estimated_cost_rub=0.4,
+    )
+
+    await monitor.check_hard_limit("polza", estimated_cost_rub=0.5)
+    with pytest.raises(CostLimitExceededError, match=r"запрос оценивается в 0\.600000 RUB"):
+        await monitor.check_hard_limit("polza", estimated_cost_rub=0.6)
+
+    assert metrics.get("cost_estimated_rub_total", provider="polza") == pytest.approx(0.4)
+    assert metrics.get("cost_reconciled_rub_total", provider="polza") == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_every_provider_is_priced_from_usage_tokens_and_capped_in_total() -> None:
+    monitor = CostControl(
+        settings=CostControlSettings(
+            total=CostLimitSettings(hard_threshold_rub=1.0),
+            providers={"official": CostLimitSettings(hard_threshold_rub=0.5)},
+        ),
+        now_provider=lambda: 5_000.0,
+        cost_estimator=CostEstimator(
+            PricingSettings(
+                prices={
+                    "gpt-4o": ModelPrice(input_rub_per_million=100, output_rub_per_million=400),
+                },
+            ),
+        ),
+    )
+    usage = {"prompt_tokens": 1_000, "completion_tokens": 1_000}
+
+    await monitor.record_response_cost(
+        provider="official",
+        response={"usage": usage},
+        request={"model": "gpt-4o"},
+    )
+    await monitor.check_hard_limit("deepseek")
+    await monitor.record_response_cost(
+        provider="deepseek",
+        response={"usage": {"cost_rub": 0.6}},
+        request={"model": "deepseek-chat"},
+    )
+
+    with pytest.raises(CostLimitExceededError, match="лимит стоимости запросов к official"):
+        await monitor.check_hard_limit("official", estimated_cost_rub=0.1)
+    with pytest.raises(CostLimitExceededError, match="ко всем провайдерам"):
+        await monitor.check_hard_limit("deepseek")
+
+
+@pytest.mark.asyncio
+async def test_usage_cost_is_rubles_only_for_polza() -> None:
+    monitor = CostControl(
+        settings=CostControlSettings(total=CostLimitSettings(hard_threshold_rub=1.0)),
+        now_provider=lambda: 6_000.0,
+        cost_estimator=CostEstimator(
+            PricingSettings(
+                prices={
+                    "gpt-4o": ModelPrice(input_rub_per_million=100, output_rub_per_million=400),
+                },
+            ),
+        ),
+    )
+
+    # OpenRouter-совместимый usage.cost в долларах не считается рублями: цена по токенам
+    await monitor.record_response_cost(
+        provider="official",
+        response={"usage": {"prompt_tokens": 1_000, "completion_tokens": 1_000, "cost": 0.9}},
+        request={"model": "gpt-4o"},
+    )
+    await monitor.check_hard_limit("official", estimated_cost_rub=0.4)
+
+    await monitor.record_response_cost(
+        provider="polza",
+        response={"usage": {"cost": 0.3}},
+        request={"model": "chat-1"},
+    )
+    with pytest.raises(CostLimitExceededError):
+        await monitor.check_hard_limit("official", estimated_cost_rub=0.4)
+
+
+def test_deprecated_polza_settings_become_polza_provider_limits() -> None:
+    polza_settings = PolzaCostControlSettings(hard_threshold_rub=2.0, window_seconds=60)
+
+    settings = _with_polza_settings(CostControlSettings(), polza_settings)
+
+    assert settings.providers == {
+        "polza": CostLimitSettings(hard_threshold_rub=2.0, window_seconds=60),
+    }
@@ -0,0 +1,119 @@
+import pytest
+
+from openai_proxy.services.cost_estimation import (
+    MESSAGE_OVERHEAD_TOKENS,
+    NON_TEXT_PART_TOKENS,
+    REPLY_OVERHEAD_TOKENS,
+    TOKEN_COUNT_DIGEST_SIZE,
+    CostEstimator,
+    TokenCountCache,
+    TokenEstimate,
+    count_text_tokens,
+)
+from openai_proxy.services.model_routing import RequestRoute
+from openai_proxy.settings import ModelPrice, PricingSettings
+
+MAX_TOKENS = 100
+CHEAP_ROUTING_PROMPT_TOKENS = 1000
+
+DEEPSEEK = RequestRoute(provider="deepseek", model="deepseek-chat")
+OFFICIAL = RequestRoute(provider="official", model="gpt-4o")
+POLZA = RequestRoute(provider="polza", model="deepseek/deepseek-chat")
+
+
+def _make_estimator(**settings) -> CostEstimator:
+    return CostEstimator(
+        PricingSettings(
+            prices={
+                "gpt-4o": ModelPrice(input_rub_per_million=200, output_rub_per_million=800),
+                "deepseek-chat": ModelPrice(input_rub_per_million=20, output_rub_per_million=80),
+                "polza:deepseek-chat": ModelPrice(
+                    input_rub_per_million=30,
+                    output_rub_per_million=120,
+                ),
+            },
+            **settings,
+        ),
+    )
+
+
+def test_count_text_tokens_approximates_bpe() -> None:
+    # Hello , world ! Price is 123 45 RUB .
+    assert count_text_tokens("Hello, world! Price is 12345 RUB.") == 10  # noqa: PLR2004
+
+
+def test_token_count_cache_is_keyed_by_digest_and_bounded() -> None:
+    cache = TokenCountCache(max_entries=2)
+    text = "Hello, world! " * 1000
+
+    tokens = cache.count(text)
+    assert cache.count(text) == tokens
+    assert cache.hits == 1
+
+    cache.count("a")
+    cache.count("b")
+    # самый давно использованный текст вытеснен, в кэше только дайджесты
+    assert len(cache) == 2  # noqa: PLR2004
+    assert all(len(key) == TOKEN_COUNT_DIGEST_SIZE for key in cache._counts)
+    cache.count(text)
+    assert cache.hits == 1
+
+
+def test_estimate_tokens_counts_messages_tools_and_completion_limit() -> None:
+    estimator = _make_estimator()
+    request = {
+        "model": "gpt-4o",
+        "max_tokens": MAX_TOKENS,
+        "messages": [
+            {"role": "system", "content": "Be brief"},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "What is here"},
+                    {"type": "image_url", "image_url": {"url": "https://example.com/a.png"}},
+                ],
+            },
+        ],
+    }
+
+    tokens = estimator.estimate_tokens(request)
+    with_tools = estimator.estimate_tokens(
+        {**request, "tools": [{"type": "function", "function": {"name": "lookup"}}]},
+    )
+
+    # "Be brief" - 2 токена, "What is here" - 3
+    text_tokens = 2 + 3
+    assert tokens == TokenEstimate(
+        prompt_tokens=REPLY_OVERHEAD_TOKENS
+        + 2 * MESSAGE_OVERHEAD_TOKENS
+        + text_tokens
+        + NON_TEXT_PART_TOKENS,
+        completion_tokens=MAX_TOKENS,
+    )
+    assert with_tools.prompt_tokens > tokens.prompt_tokens
+
+
+def test_estimate_cost_prefers_provider_specific_price() -> None:
+    estimator = _make_estimator()
+    tokens = TokenEstimate(prompt_tokens=1_000_000, completion_tokens=500_000)
+
+    assert estimator.estimate_cost_rub(DEEPSEEK, tokens) == pytest.approx(60)
+    assert estimator.estimate_cost_rub(
+        RequestRoute(provider="polza", model="deepseek-chat"),
+        tokens,
+    ) == pytest.approx(90)
+    assert estimator.estimate_cost_rub(POLZA, tokens) is None
+
+
+def test_large_prompts_are_routed_to_cheaper_models_first() -> None:
+    estimator = _make_estimator(cheap_routing_prompt_tokens=CHEAP_ROUTING_PROMPT_TOKENS)
+    routes = [POLZA, OFFICIAL, DEEPSEEK]
+
+    small = estimator.order_routes(routes, TokenEstimate(prompt_tokens=10, completion_tokens=10))
+    large = estimator.order_routes(
+        routes,
+        TokenEstimate(prompt_tokens=CHEAP_ROUTING_PROMPT_TOKENS, completion_tokens=10),
+    )
+
+    assert small == routes
+    assert large == [DEEPSEEK, OFFICIAL, POLZA]
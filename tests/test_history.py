@@ -0,0 +1,155 @@
+from typing import Any
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from pytest_mock import MockerFixture
+
+from openai_proxy import OpenAIProxyToolCallClient
+from openai_proxy.tool_call_client import (
+    KeepLastTurnsPolicy,
+    SummarizeOlderTurnsPolicy,
+    TokenBudgetPolicy,
+    TruncateToolOutputsPolicy,
+)
+from tests.tool_call_stubs import make_answer, patch_openai
+
+SYSTEM = {"role": "system", "content": "be brief"}
+TOOL_CALL = {
+    "id": "call_1",
+    "type": "function",
+    "function": {"name": "echo", "arguments": "{}"},
+}
+TOKEN_BUDGET = 20
+MAX_TOOL_CHARS = 5
+REQUEST_BODY = b'{"model":"auto"}'
+
+
+def _turn(index: int, *, with_tool: bool = False) -> list[dict[str, Any]]:
+    messages: list[dict[str, Any]] = [{"role": "user", "content": f"question {index}"}]
+    if with_tool:
+        messages.append({"role": "assistant", "content": None, "tool_calls": [TOOL_CALL]})
+        messages.append({"role": "tool", "content": "x" * 100, "tool_call_id": "call_1"})
+    messages.append({"role": "assistant", "content": f"answer {index}"})
+    return messages
+
+
+def _history(turns: int) -> list[dict[str, Any]]:
+    return [SYSTEM, *(m for index in range(turns) for m in _turn(index, with_tool=True))]
+
+
+@pytest.mark.asyncio
+async def test_keep_last_turns_keeps_system_and_whole_turns() -> None:
+    result = await KeepLastTurnsPolicy(max_turns=2).apply(_history(5))
+
+    assert result == [SYSTEM, *_turn(3, with_tool=True), *_turn(4, with_tool=True)]
+
+
+@pytest.mark.asyncio
+async def test_token_budget_always_keeps_current_turn() -> None:
+    messages = _history(3)
+
+    result = await TokenBudgetPolicy(max_tokens=TOKEN_BUDGET).apply(messages)
+
+    assert result == [SYSTEM, *_turn(2, with_tool=True)]
+    assert await TokenBudgetPolicy(max_tokens=10_000).apply(messages) is messages
+
+
+@pytest.mark.asyncio
+async def test_truncate_tool_outputs_only_touches_tool_messages() -> None:
+    result = await TruncateToolOutputsPolicy(max_chars=MAX_TOOL_CHARS).apply(_history(1))
+
+    assert result[0] == SYSTEM
+    assert result[3]["content"] == "xxxxx... [truncated 95 chars]"
+    assert result[3]["tool_call_id"] == "call_1"
+    assert result[4] == {"role": "assistant", "content": "answer 0"}
+
+
+@pytest.mark.asyncio
+async def test_summarize_older_turns_replaces_them_with_summary() -> None:
+    summarizer = AsyncMock(return_value="talked about 0 and 1")
+
+    result = await SummarizeOlderTurnsPolicy(summarizer, keep_turns=1).apply(_history(3))
+
+    assert summarizer.await_args_list[-1].args[0] == [
+        *_turn(0, with_tool=True),
+        *_turn(1, with_tool=True),
+    ]
+    assert result == [
+        SYSTEM,
+        {"role": "system", "content": "Summary of the earlier conversation: talked about 0 and 1"},
+        *_turn(2, with_tool=True),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_summary_is_replaced_and_covers_previous_summary_across_turns() -> None:
+    summaries = iter(["summary 1", "summary 2", "summary 3", "summary 4"])
+    summarizer = AsyncMock(side_effect=lambda _messages: next(summaries))
+    policy = SummarizeOlderTurnsPolicy(summarizer, keep_turns=1)
+
+    history = [SYSTEM, *_turn(0), *_turn(1)]
+    for index in range(2, 5):
+        history = await policy.apply(history)
+        history = [*history, *_turn(index)]
+    history = await policy.apply(history)
+
+    summary_messages = [
+        message
+        for message in history
+        if message["role"] == "system" and message["content"].startswith("Summary")
+    ]
+    assert summary_messages == [
+        {"role": "system", "content": "Summary of the earlier conversation: summary 4"},
+    ]
+    assert history == [SYSTEM, *summary_messages, *_turn(4)]
+    assert summarizer.await_args_list[-1].args[0] == [
+        {"role": "system", "content": "Summary of the earlier conversation: summary 3"},
+        *_turn(3),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("make_policy", "match"),
+    [
+        (lambda value: KeepLastTurnsPolicy(max_turns=value), "max_turns"),
+        (lambda value: TokenBudgetPolicy(max_tokens=value), "max_tokens"),
+        (lambda value: TruncateToolOutputsPolicy(max_chars=value), "max_chars"),
+        (
+            lambda value: SummarizeOlderTurnsPolicy(AsyncMock(), keep_turns=value),
+            "keep_turns",
+        ),
+    ],
+)
+@pytest.mark.parametrize("value", [0, -1])
+def test_policies_reject_non_positive_limits(make_policy, match: str, value: int) -> None:
+    with pytest.raises(ValueError, match=match):
+        make_policy(value)
+
+
+@pytest.mark.asyncio
+async def test_client_applies_history_policies_and_records_request_size(
+    mocker: MockerFixture,
+) -> None:
+    create = AsyncMock(side_effect=[make_answer(f"answer {index}") for index in range(3)])
+    http_client = patch_openai(mocker, create)
+    client = OpenAIProxyToolCallClient(
+        system_prompts=["be brief"],
+        tools=[],
+        history_policies=[KeepLastTurnsPolicy(max_turns=1)],
+    )
+
+    for index in range(3):
+        await client.request(f"question {index}")
+    # хук httpx, через который клиент считает размер отправленных запросов
+    (record_request,) = http_client.call_args.kwargs["event_hooks"]["request"]
+    await record_request(httpx.Request("POST", "http://proxy", content=REQUEST_BODY))
+
+    assert create.await_args_list[-1].kwargs["messages"] == [
+        SYSTEM,
+        {"role": "user", "content": "question 2"},
+        {"role": "assistant", "content": "answer 2"},
+    ]
+    assert client.stats.requests == 1
+    assert client.stats.last_request_bytes == len(REQUEST_BODY)
+    await client.close()
@@ -0,0 +1,135 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import (
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+
+from openai_proxy import routers, schemas
+from openai_proxy.services.openai_service import OpenAIService, get_openai_service
+from openai_proxy.services.provider_registry import ProviderRegistry
+
+OK = 200
+
+
+class FakeStream:
+    def __init__(self, chunks: list[ChatCompletionChunk]) -> None:
+        self._chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self) -> "FakeStream":
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _make_chunk(
+    content: str | None = None,
+    tool_call: ChoiceDeltaToolCall | None = None,
+) -> ChatCompletionChunk:
+    return ChatCompletionChunk(
+        id="chatcmpl_1",
+        choices=[
+            ChunkChoice(
+                index=0,
+                delta=ChoiceDelta(
+                    content=content,
+                    tool_calls=[tool_call] if tool_call is not None else None,
+                ),
+            ),
+        ],
+        created=0,
+        model="gpt-4.1",
+        object="chat.completion.chunk",
+    )
+
+
+def _make_chunks() -> list[ChatCompletionChunk]:
+    return [
+        _make_chunk("Hel"),
+        _make_chunk("lo"),
+        _make_chunk(
+            tool_call=ChoiceDeltaToolCall(
+                index=0,
+                id="call_1",
+                function=ChoiceDeltaToolCallFunction(name="echo", arguments='{"text":'),
+            ),
+        ),
+        _make_chunk(
+            tool_call=ChoiceDeltaToolCall(
+                index=0,
+                function=ChoiceDeltaToolCallFunction(arguments='"hi"}'),
+            ),
+        ),
+    ]
+
+
+def _make_service(stream: FakeStream) -> tuple[OpenAIService, AsyncMock]:
+    provider_request = AsyncMock(return_value=stream)
+    service = OpenAIService(
+        providers=ProviderRegistry({"official": SimpleNamespace(request=provider_request)}),
+    )
+    return service, provider_request
+
+
+def _make_legacy_request(**kwargs) -> schemas.OpenAIRequest:
+    return schemas.OpenAIRequest(
+        model="official:gpt-4.1",
+        messages=[schemas.OpenAIMessage(role=schemas.OpenAIRole.USER, content="ping")],
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_legacy_stream_yields_deltas_and_assembled_message() -> None:
+    stream = FakeStream(_make_chunks())
+    service, provider_request = _make_service(stream)
+
+    events = await service.request_legacy_stream(_make_legacy_request(stream=True))
+    collected = [event async for event in events]
+
+    assert provider_request.await_args_list[0].args[0]["stream"] is True
+    deltas = [event.delta for event in collected[:-1]]
+    assert None not in deltas
+    assert [delta.content for delta in deltas if delta is not None] == ["Hel", "lo"]
+    assert collected[-1].message == schemas.OpenAIMessage(
+        role=schemas.OpenAIRole.ASSIST,
+        content="Hello",
+        tool_calls=[schemas.OpenAIToolCall(id="call_1", name="echo", arguments='{"text":"hi"}')],
+    )
+    assert stream.closed
+
+
+@pytest.mark.parametrize(
+    ("stream_format", "media_type"),
+    [("sse", "text/event-stream"), ("ndjson", "application/x-ndjson")],
+)
+def test_legacy_endpoint_streams_events(stream_format: str, media_type: str) -> None:
+    service, _ = _make_service(FakeStream(_make_chunks()))
+    app = FastAPI()
+    app.include_router(routers.openai_router)
+    app.dependency_overrides[get_openai_service] = lambda: service
+    request = _make_legacy_request(stream=True, stream_format=stream_format)
+
+    response = TestClient(app).post("/api/v1/openai/request", json=request.model_dump(mode="json"))
+
+    assert response.status_code == OK
+    assert response.headers["content-type"].startswith(media_type)
+    lines = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    events = [json.loads(line) for line in lines]
+    assert events[0] == {"delta": {"role": "assistant", "content": "Hel"}}
+    assert events[-1]["message"]["content"] == "Hello"
@@ -0,0 +1,45 @@
+from openai_proxy.openai_compat import (
+    _materialize_json_compatible_value,
+    normalize_chat_completion_request,
+)
+
+
+def test_materialize_returns_original_containers_when_nothing_changes() -> None:
+    message = {"role": "user", "content": "ping"}
+    messages = [message]
+    request = {"model": "auto", "messages": messages}
+
+    result = _materialize_json_compatible_value(request)
+
+    assert result is request
+    assert result["messages"] is messages
+
+
+def test_materialize_copies_only_changed_paths() -> None:
+    untouched_message = {"role": "user", "content": "ping"}
+    changed_message = {"role": "user", "content": "pong", "name": None}
+    request = {
+        "model": "auto",
+        "messages": [untouched_message, changed_message],
+        "stop": ("a", "b"),
+        "user": None,
+    }
+
+    result = _materialize_json_compatible_value(request)
+
+    assert result == {
+        "model": "auto",
+        "messages": [untouched_message, {"role": "user", "content": "pong"}],
+        "stop": ["a", "b"],
+    }
+    assert result["messages"][0] is untouched_message
+    assert "name" in changed_message
+    assert "user" in request
+
+
+def test_normalize_materializes_validated_iterables() -> None:
+    result = normalize_chat_completion_request(
+        {"model": "auto", "messages": iter([{"role": "user", "content": "ping"}])},
+    )
+
+    assert result == {"model": "auto", "messages": [{"role": "user", "content": "ping"}]}
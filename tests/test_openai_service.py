@@ -2,18 +2,32 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
 from openai import OpenAIError
+from openai.types.chat import ChatCompletion
 
-from openai_proxy import schemas
+from openai_proxy import openai_compat, routers, schemas
 from openai_proxy.openai_compat import normalize_chat_completion_request
+from openai_proxy.services.cost_control import CostControl, CostLimitExceededError
+from openai_proxy.services.cost_estimation import CostEstimator
 from openai_proxy.services.model_routing import (
     AUTO_OFFICIAL_MODEL,
     AUTO_POLZA_MODEL,
     DEFAULT_ROUTE_ATTEMPTS,
     ModelRouter,
 )
-from openai_proxy.services.openai_service import OpenAIService
-from openai_proxy.services.polza_cost_control import CostLimitExceededError
+from openai_proxy.services.openai_service import OpenAIService, get_openai_service
+from openai_proxy.services.provider_registry import ProviderRegistry, UnknownProviderError
+from openai_proxy.settings import (
+    CostControlSettings,
+    CostLimitSettings,
+    ModelPrice,
+    PricingSettings,
+    RouteSettings,
+)
+
+OK = 200
 
 
 class FakeStream:
@@ -33,6 +47,13 @@ class FakeStream:
         self.closed = True
 
 
+def _make_service(official, deepseek, polza, **kwargs) -> OpenAIService:
+    return OpenAIService(
+        providers=ProviderRegistry({"official": official, "deepseek": deepseek, "polza": polza}),
+        **kwargs,
+    )
+
+
 def _make_request(model: str | schemas.OpenAIModel) -> dict[str, object]:
     return normalize_chat_completion_request(
         schemas.OpenAIRequest(
@@ -64,7 +85,7 @@ async def test_auto_prefers_deepseek() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("auto")
     deepseek.request.return_value = "ok"
@@ -74,6 +95,7 @@ async def test_auto_prefers_deepseek() -> None:
     assert result == "ok"
     deepseek.request.assert_awaited_once_with(
         {**request, "model": schemas.OpenAIModel.DEEPSEEK.value},
+        normalized=True,
     )
     official.request.assert_not_called()
     polza.request.assert_not_called()
@@ -84,7 +106,7 @@ async def test_auto_fallbacks_to_official_when_deepseek_fails() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("auto")
     deepseek.request.side_effect = OpenAIError("boom")
@@ -95,8 +117,14 @@ async def test_auto_fallbacks_to_official_when_deepseek_fails() -> None:
     assert result == "official"
     assert deepseek.request.await_count == DEFAULT_ROUTE_ATTEMPTS
     assert official.request.await_count == 1
-    deepseek.request.assert_called_with({**request, "model": schemas.OpenAIModel.DEEPSEEK.value})
-    official.request.assert_awaited_once_with({**request, "model": AUTO_OFFICIAL_MODEL})
+    deepseek.request.assert_called_with(
+        {**request, "model": schemas.OpenAIModel.DEEPSEEK.value},
+        normalized=True,
+    )
+    official.request.assert_awaited_once_with(
+        {**request, "model": AUTO_OFFICIAL_MODEL},
+        normalized=True,
+    )
     polza.request.assert_not_called()
 
 
@@ -105,7 +133,7 @@ async def test_auto_fallbacks_to_polza_when_official_also_fails() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("auto")
     deepseek.request.side_effect = OpenAIError("deepseek boom")
@@ -117,7 +145,7 @@ async def test_auto_fallbacks_to_polza_when_official_also_fails() -> None:
     assert result == "polza"
     assert deepseek.request.await_count == DEFAULT_ROUTE_ATTEMPTS
     assert official.request.await_count == DEFAULT_ROUTE_ATTEMPTS
-    polza.request.assert_awaited_once_with({**request, "model": AUTO_POLZA_MODEL})
+    polza.request.assert_awaited_once_with({**request, "model": AUTO_POLZA_MODEL}, normalized=True)
 
 
 @pytest.mark.asyncio
@@ -125,7 +153,7 @@ async def test_explicit_deepseek_model_uses_deepseek_only() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request(schemas.OpenAIModel.DEEPSEEK.value)
     deepseek.request.return_value = "deepseek"
@@ -133,7 +161,7 @@ async def test_explicit_deepseek_model_uses_deepseek_only() -> None:
     result = await service.request(request)
 
     assert result == "deepseek"
-    deepseek.request.assert_awaited_once_with(request)
+    deepseek.request.assert_awaited_once_with(request, normalized=True)
     official.request.assert_not_called()
     polza.request.assert_not_called()
 
@@ -143,7 +171,7 @@ async def test_prefixed_deepseek_model_routes_to_deepseek_client() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("deepseek:reasoner")
     deepseek.request.return_value = "deepseek"
@@ -151,7 +179,7 @@ async def test_prefixed_deepseek_model_routes_to_deepseek_client() -> None:
     result = await service.request(request)
 
     assert result == "deepseek"
-    deepseek.request.assert_awaited_once_with({**request, "model": "reasoner"})
+    deepseek.request.assert_awaited_once_with({**request, "model": "reasoner"}, normalized=True)
     official.request.assert_not_called()
     polza.request.assert_not_called()
 
@@ -161,7 +189,7 @@ async def test_prefixed_official_model_routes_to_official_client() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("official:gpt-4o-mini")
     official.request.return_value = "official"
@@ -169,7 +197,7 @@ async def test_prefixed_official_model_routes_to_official_client() -> None:
     result = await service.request(request)
 
     assert result == "official"
-    official.request.assert_awaited_once_with({**request, "model": "gpt-4o-mini"})
+    official.request.assert_awaited_once_with({**request, "model": "gpt-4o-mini"}, normalized=True)
     deepseek.request.assert_not_called()
     polza.request.assert_not_called()
 
@@ -179,7 +207,7 @@ async def test_polza_model_routes_to_polza_client() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request("polza:chat-1")
     polza.request.return_value = "polza"
@@ -189,7 +217,7 @@ async def test_polza_model_routes_to_polza_client() -> None:
     assert result == "polza"
     deepseek.request.assert_not_called()
     official.request.assert_not_called()
-    polza.request.assert_awaited_once_with({**request, "model": "chat-1"})
+    polza.request.assert_awaited_once_with({**request, "model": "chat-1"}, normalized=True)
 
 
 @pytest.mark.asyncio
@@ -197,7 +225,7 @@ async def test_polza_model_checks_hard_limit_before_request() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    polza_cost_control = SimpleNamespace(
+    cost_control = SimpleNamespace(
         check_hard_limit=AsyncMock(
             side_effect=CostLimitExceededError(
                 total_cost_rub=10.0,
@@ -207,40 +235,100 @@ async def test_polza_model_checks_hard_limit_before_request() -> None:
         ),
         record_response_cost=AsyncMock(),
     )
-    service = OpenAIService(
-        official_client=official,
-        deepseek_client=deepseek,
-        polza_client=polza,
-        polza_cost_control=polza_cost_control,
-    )
+    service = _make_service(official, deepseek, polza, cost_control=cost_control)
 
     request = _make_request("polza:chat-1")
 
     with pytest.raises(CostLimitExceededError):
         await service.request(request)
 
-    polza_cost_control.check_hard_limit.assert_awaited_once_with("polza")
-    polza_cost_control.record_response_cost.assert_not_called()
+    cost_control.check_hard_limit.assert_awaited_once_with("polza", estimated_cost_rub=None)
+    cost_control.record_response_cost.assert_not_called()
     deepseek.request.assert_not_called()
     official.request.assert_not_called()
     polza.request.assert_not_called()
 
 
+def _make_route_capped_service(official, polza, cost_control: CostControl) -> OpenAIService:
+    return OpenAIService(
+        providers=ProviderRegistry({"official": official, "polza": polza}),
+        model_router=ModelRouter(
+            providers=["official", "polza"],
+            auto_routes=[
+                RouteSettings(provider="polza", model="chat-1"),
+                RouteSettings(provider="official", model="gpt-4o-mini"),
+            ],
+        ),
+        cost_control=cost_control,
+    )
+
+
+@pytest.mark.asyncio
+async def test_auto_skips_route_over_its_provider_cost_limit() -> None:
+    official = SimpleNamespace(request=AsyncMock(return_value={"id": "official"}))
+    polza = SimpleNamespace(request=AsyncMock())
+    cost_control = CostControl(
+        settings=CostControlSettings(
+            providers={"polza": CostLimitSettings(hard_threshold_rub=1.0)},
+        ),
+    )
+    await cost_control.record_response_cost("polza", {"usage": {"cost_rub": 1.0}})
+    service = _make_route_capped_service(official, polza, cost_control)
+
+    request = _make_request("auto")
+
+    assert await service.request(request) == {"id": "official"}
+    polza.request.assert_not_called()
+    official.request.assert_awaited_once_with(
+        {**request, "model": "gpt-4o-mini"},
+        normalized=True,
+    )
+
+    cost_control = CostControl(
+        settings=CostControlSettings(
+            providers={
+                "polza": CostLimitSettings(hard_threshold_rub=1.0),
+                "official": CostLimitSettings(hard_threshold_rub=1.0),
+            },
+        ),
+    )
+    await cost_control.record_response_cost("polza", {"usage": {"cost_rub": 1.0}})
+    await cost_control.record_response_cost("official", {"usage": {"cost_rub": 1.0}})
+    service = _make_route_capped_service(official, polza, cost_control)
+
+    # все маршруты за лимитом: ошибка лимита отдается клиенту
+    with pytest.raises(CostLimitExceededError):
+        await service.request(request)
+    assert official.request.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_total_cost_limit_stops_auto_chain() -> None:
+    official = SimpleNamespace(request=AsyncMock())
+    polza = SimpleNamespace(request=AsyncMock())
+    cost_control = CostControl(
+        settings=CostControlSettings(total=CostLimitSettings(hard_threshold_rub=1.0)),
+    )
+    await cost_control.record_response_cost("polza", {"usage": {"cost_rub": 1.0}})
+    service = _make_route_capped_service(official, polza, cost_control)
+
+    with pytest.raises(CostLimitExceededError):
+        await service.request(_make_request("auto"))
+
+    polza.request.assert_not_called()
+    official.request.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_polza_model_records_response_cost() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    polza_cost_control = SimpleNamespace(
+    cost_control = SimpleNamespace(
         check_hard_limit=AsyncMock(),
         record_response_cost=AsyncMock(),
     )
-    service = OpenAIService(
-        official_client=official,
-        deepseek_client=deepseek,
-        polza_client=polza,
-        polza_cost_control=polza_cost_control,
-    )
+    service = _make_service(official, deepseek, polza, cost_control=cost_control)
 
     request = _make_request("polza:chat-1")
     response = {"id": "gen_1", "usage": {"cost_rub": 0.42}}
@@ -249,15 +337,16 @@ async def test_polza_model_records_response_cost() -> None:
     result = await service.request(request)
 
     assert result == response
-    polza_cost_control.check_hard_limit.assert_awaited_once_with("polza")
-    polza_cost_control.record_response_cost.assert_awaited_once_with(
+    cost_control.check_hard_limit.assert_awaited_once_with("polza", estimated_cost_rub=None)
+    cost_control.record_response_cost.assert_awaited_once_with(
         provider="polza",
         response=response,
         request={**request, "model": "chat-1"},
+        estimated_cost_rub=None,
     )
     deepseek.request.assert_not_called()
     official.request.assert_not_called()
-    polza.request.assert_awaited_once_with({**request, "model": "chat-1"})
+    polza.request.assert_awaited_once_with({**request, "model": "chat-1"}, normalized=True)
 
 
 @pytest.mark.asyncio
@@ -267,17 +356,12 @@ async def test_polza_stream_response_is_wrapped_for_cost_tracking() -> None:
     polza = SimpleNamespace(request=AsyncMock())
     raw_stream = FakeStream([{"usage": {"cost_rub": 0.42}}])
     wrapped_stream = FakeStream()
-    polza_cost_control = SimpleNamespace(
+    cost_control = SimpleNamespace(
         check_hard_limit=AsyncMock(),
         wrap_stream=Mock(return_value=wrapped_stream),
         record_response_cost=AsyncMock(),
     )
-    service = OpenAIService(
-        official_client=official,
-        deepseek_client=deepseek,
-        polza_client=polza,
-        polza_cost_control=polza_cost_control,
-    )
+    service = _make_service(official, deepseek, polza, cost_control=cost_control)
 
     request = {**_make_request("polza:chat-1"), "stream": True}
     polza.request.return_value = raw_stream
@@ -285,16 +369,57 @@ async def test_polza_stream_response_is_wrapped_for_cost_tracking() -> None:
     result = await service.request(request)
 
     assert result is wrapped_stream
-    polza_cost_control.check_hard_limit.assert_awaited_once_with("polza")
-    polza_cost_control.wrap_stream.assert_called_once_with(
+    cost_control.check_hard_limit.assert_awaited_once_with("polza", estimated_cost_rub=None)
+    cost_control.wrap_stream.assert_called_once_with(
         provider="polza",
         response=raw_stream,
         request={**request, "model": "chat-1"},
+        estimated_cost_rub=None,
     )
-    polza_cost_control.record_response_cost.assert_not_called()
+    cost_control.record_response_cost.assert_not_called()
     deepseek.request.assert_not_called()
     official.request.assert_not_called()
-    polza.request.assert_awaited_once_with({**request, "model": "chat-1"})
+    polza.request.assert_awaited_once_with({**request, "model": "chat-1"}, normalized=True)
+
+
+@pytest.mark.asyncio
+async def test_large_auto_prompt_goes_to_cheapest_route_with_estimated_cost() -> None:
+    official = SimpleNamespace(request=AsyncMock())
+    deepseek = SimpleNamespace(request=AsyncMock())
+    polza = SimpleNamespace(request=AsyncMock(return_value="ok"))
+    cost_control = SimpleNamespace(
+        check_hard_limit=AsyncMock(),
+        record_response_cost=AsyncMock(),
+    )
+    cost_estimator = CostEstimator(
+        PricingSettings(
+            prices={
+                AUTO_POLZA_MODEL: ModelPrice(input_rub_per_million=1, output_rub_per_million=1),
+                AUTO_OFFICIAL_MODEL: ModelPrice(input_rub_per_million=9, output_rub_per_million=9),
+            },
+            default_completion_tokens=1,
+            cheap_routing_prompt_tokens=1,
+        ),
+    )
+    service = _make_service(
+        official,
+        deepseek,
+        polza,
+        cost_control=cost_control,
+        cost_estimator=cost_estimator,
+    )
+
+    result = await service.request(_make_request("auto"))
+
+    assert result == "ok"
+    deepseek.request.assert_not_called()
+    estimated_cost_rub = cost_control.check_hard_limit.await_args.kwargs[
+        "estimated_cost_rub"
+    ]
+    assert estimated_cost_rub > 0
+    assert cost_control.record_response_cost.await_args.kwargs[
+        "estimated_cost_rub"
+    ] == estimated_cost_rub
 
 
 @pytest.mark.asyncio
@@ -302,7 +427,7 @@ async def test_other_models_use_official_client() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     request = _make_request(schemas.OpenAIModel.GPT4.value)
     official.request.return_value = "official"
@@ -310,7 +435,7 @@ async def test_other_models_use_official_client() -> None:
     result = await service.request(request)
 
     assert result == "official"
-    official.request.assert_awaited_once_with(request)
+    official.request.assert_awaited_once_with(request, normalized=True)
     deepseek.request.assert_not_called()
     polza.request.assert_not_called()
 
@@ -320,7 +445,7 @@ async def test_legacy_request_is_adapted_through_compatible_flow() -> None:
     official = SimpleNamespace(request=AsyncMock())
     deepseek = SimpleNamespace(request=AsyncMock())
     polza = SimpleNamespace(request=AsyncMock())
-    service = OpenAIService(official_client=official, deepseek_client=deepseek, polza_client=polza)
+    service = _make_service(official, deepseek, polza)
 
     legacy_request = _make_legacy_request(schemas.OpenAIModel.GPT4.value)
     completion = SimpleNamespace(
@@ -351,3 +476,71 @@ def test_model_router_treats_none_as_auto() -> None:
 def test_model_router_requires_model_after_prefix() -> None:
     with pytest.raises(ValueError, match="deepseek:"):
         ModelRouter().build_routes("deepseek:")
+
+
+@pytest.mark.asyncio
+async def test_registered_provider_prefix_routes_to_its_client() -> None:
+    local = SimpleNamespace(request=AsyncMock(return_value="local"))
+    service = OpenAIService(providers=ProviderRegistry({"local": local}))
+
+    request = _make_request("local:llama-3")
+
+    result = await service.request(request)
+
+    assert result == "local"
+    local.request.assert_awaited_once_with({**request, "model": "llama-3"}, normalized=True)
+
+
+def test_model_router_resolves_configured_auto_chain() -> None:
+    router = ModelRouter(
+        providers=["local", "official"],
+        auto_routes=[
+            RouteSettings(provider="local", model="llama-3", attempts=2),
+            RouteSettings(provider="missing", model="any"),
+            RouteSettings(provider="official", model="gpt-4o-mini"),
+        ],
+    )
+
+    routes = router.build_routes("auto")
+
+    assert [(route.provider, route.model, route.attempts) for route in routes] == [
+        ("local", "llama-3", 2),
+        ("official", "gpt-4o-mini", 1),
+    ]
+
+
+def test_model_router_keeps_unknown_prefix_in_model_name() -> None:
+    routes = ModelRouter(providers=["official"]).build_routes("org:model")
+
+    assert [(route.provider, route.model) for route in routes] == [("official", "org:model")]
+
+
+def test_provider_registry_rejects_unknown_provider() -> None:
+    with pytest.raises(UnknownProviderError, match="missing"):
+        ProviderRegistry({}).get("missing")
+
+
+def test_chat_completions_endpoint_normalizes_request_once(mocker) -> None:
+    completion = ChatCompletion(
+        id="chatcmpl_1",
+        choices=[],
+        created=0,
+        model="gpt-4.1",
+        object="chat.completion",
+    )
+    official = SimpleNamespace(request=AsyncMock(return_value=completion))
+    service = _make_service(official, SimpleNamespace(), SimpleNamespace())
+    app = FastAPI()
+    app.include_router(routers.openai_router)
+    app.dependency_overrides[get_openai_service] = lambda: service
+    normalize = mocker.spy(openai_compat, "normalize_chat_completion_request")
+
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "official:gpt-4.1", "messages": [{"role": "user", "content": "ping"}]},
+    )
+
+    assert response.status_code == OK
+    assert response.json()["id"] == "chatcmpl_1"
+    assert normalize.call_count == 1
+    official.request.assert_awaited_once()
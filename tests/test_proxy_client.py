@@ -0,0 +1,222 @@
+import asyncio
+import json
+import socket
+from collections.abc import AsyncIterator
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from openai_proxy import OpenAIProxyClient, OpenAIProxyClientSettings, schemas
+
+RESPONSE = {"messages": [{"role": "assistant", "content": "pong"}]}
+STREAM_EVENTS = [
+    {"delta": {"role": "assistant", "content": "po"}},
+    {"delta": {"role": "assistant", "content": "ng"}},
+    {"message": {"role": "assistant", "content": "pong"}},
+]
+BAD_REQUEST = 400
+SERVICE_UNAVAILABLE = 503
+REQUESTS_COUNT = 3
+STREAM_CHUNK_DELAY = 0.02
+RESPONSE_DELAY = 0.2
+
+
+class StubProxy:
+    def __init__(self) -> None:
+        # статусы следующих ответов, после них - 200
+        self.statuses: list[int] = []
+        self.requests = 0
+        self.connections: set[tuple[str, int]] = set()
+        self.chunk_delay = 0.0
+        self.response_delay = 0.0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        await asyncio.sleep(self.response_delay)
+        if self.statuses:
+            return web.Response(status=self.statuses.pop(0))
+        if payload.get("stream"):
+            return await self._stream(request)
+        return web.json_response(RESPONSE)
+
+    async def _stream(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        body = "".join(f"{json.dumps(event)}\n" for event in STREAM_EVENTS).encode()
+        # режем поток посреди строк, как это может сделать сеть
+        for start in range(0, len(body), 7):
+            await asyncio.sleep(self.chunk_delay)
+            await response.write(body[start : start + 7])
+        await response.write_eof()
+        return response
+
+
+@pytest_asyncio.fixture
+async def stub() -> AsyncIterator[tuple[StubProxy, str]]:
+    proxy = StubProxy()
+    app = web.Application()
+    app.router.add_post("/api/v1/openai/request", proxy.handle)
+    async with TestServer(app) as server:
+        yield proxy, str(server.make_url("/"))
+
+
+def _make_client(base_url: str, **settings) -> OpenAIProxyClient:
+    with pytest.warns(DeprecationWarning, match="OpenAIProxyClient is deprecated"):
+        return OpenAIProxyClient(
+            OpenAIProxyClientSettings(base_url=base_url, retry_backoff=0, **settings),
+        )
+
+
+def _make_request() -> schemas.OpenAIRequest:
+    return schemas.OpenAIRequest(
+        model="auto",
+        messages=[schemas.OpenAIMessage(role=schemas.OpenAIRole.USER, content="ping")],
+    )
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_one_keep_alive_connection(stub: tuple[StubProxy, str]) -> None:
+    proxy, base_url = stub
+    client = _make_client(base_url)
+
+    async with client:
+        responses = [await client.request(_make_request()) for _ in range(REQUESTS_COUNT)]
+        session = client._get_session()
+
+    assert [response.messages[0].content for response in responses] == ["pong"] * REQUESTS_COUNT
+    assert len(proxy.connections) == 1
+    assert session.closed
+    assert client._session is None
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried(stub: tuple[StubProxy, str]) -> None:
+    proxy, base_url = stub
+    proxy.statuses = [SERVICE_UNAVAILABLE, SERVICE_UNAVAILABLE]
+
+    async with _make_client(base_url, max_retries=2) as client:
+        response = await client.request(_make_request())
+
+    assert response.messages[0].content == "pong"
+    assert proxy.requests == REQUESTS_COUNT
+
+
+@pytest.mark.asyncio
+async def test_client_errors_and_exhausted_retries_are_raised(
+    stub: tuple[StubProxy, str],
+) -> None:
+    proxy, base_url = stub
+    async with _make_client(base_url, max_retries=1) as client:
+        proxy.statuses = [BAD_REQUEST]
+        with pytest.raises(aiohttp.ClientResponseError) as bad_request:
+            await client.request(_make_request())
+
+        proxy.statuses = [SERVICE_UNAVAILABLE, SERVICE_UNAVAILABLE]
+        with pytest.raises(aiohttp.ClientResponseError) as unavailable:
+            await client.request(_make_request())
+
+    assert bad_request.value.status == BAD_REQUEST
+    assert unavailable.value.status == SERVICE_UNAVAILABLE
+    assert proxy.requests == REQUESTS_COUNT
+
+
+@pytest.mark.asyncio
+async def test_timeouts_are_retried_only_when_enabled(stub: tuple[StubProxy, str]) -> None:
+    proxy, base_url = stub
+    proxy.response_delay = RESPONSE_DELAY
+
+    async with _make_client(
+        base_url,
+        max_retries=2,
+        request_timeout=RESPONSE_DELAY / 2,
+    ) as client:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request(_make_request())
+    assert proxy.requests == 1
+
+    async with _make_client(
+        base_url,
+        max_retries=2,
+        request_timeout=RESPONSE_DELAY / 2,
+        retry_timeouts=True,
+    ) as client:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request(_make_request())
+    assert proxy.requests == 1 + REQUESTS_COUNT
+
+
+@pytest.mark.asyncio
+async def test_refused_connections_are_retried(mocker) -> None:
+    sleep = mocker.spy(asyncio, "sleep")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    async with _make_client(base_url, max_retries=2) as client:
+        with pytest.raises(aiohttp.ClientConnectorError):
+            await client.request(_make_request())
+
+    assert sleep.call_count == REQUESTS_COUNT - 1
+
+
+@pytest.mark.asyncio
+async def test_request_many_shares_pool_and_captures_errors(stub: tuple[StubProxy, str]) -> None:
+    proxy, base_url = stub
+    proxy.statuses = [BAD_REQUEST]
+
+    async with _make_client(base_url) as client:
+        results = [
+            result
+            async for result in client.request_many(
+                (_make_request() for _ in range(REQUESTS_COUNT)),
+                concurrency=1,
+            )
+        ]
+
+    assert [result.index for result in results] == list(range(REQUESTS_COUNT))
+    assert isinstance(results[0].error, aiohttp.ClientResponseError)
+    assert [result.unwrap().messages[0].content for result in results[1:]] == ["pong", "pong"]
+    assert len(proxy.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_stream_parses_ndjson_events(stub: tuple[StubProxy, str]) -> None:
+    proxy, base_url = stub
+    proxy.statuses = [SERVICE_UNAVAILABLE]
+
+    async with _make_client(base_url) as client:
+        events = [event async for event in client.request_stream(_make_request())]
+
+    assert [event.model_dump(exclude_none=True) for event in events] == STREAM_EVENTS
+    assert proxy.requests == REQUESTS_COUNT - 1
+
+
+@pytest.mark.asyncio
+async def test_request_stream_is_limited_by_idle_time_not_request_timeout(
+    stub: tuple[StubProxy, str],
+) -> None:
+    proxy, base_url = stub
+    proxy.chunk_delay = STREAM_CHUNK_DELAY
+
+    # весь поток идет дольше request_timeout, но паузы между чанками короче stream_idle_timeout
+    async with _make_client(
+        base_url,
+        request_timeout=STREAM_CHUNK_DELAY * 5,
+        stream_idle_timeout=STREAM_CHUNK_DELAY * 10,
+    ) as client:
+        events = [event async for event in client.request_stream(_make_request())]
+
+    assert [event.model_dump(exclude_none=True) for event in events] == STREAM_EVENTS
+
+    async with _make_client(
+        base_url,
+        max_retries=0,
+        stream_idle_timeout=STREAM_CHUNK_DELAY / 4,
+    ) as client:
+        with pytest.raises(asyncio.TimeoutError):
+            _ = [event async for event in client.request_stream(_make_request())]
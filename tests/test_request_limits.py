@@ -0,0 +1,71 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from openai_proxy.metrics import ProxyMetrics
+from openai_proxy.middlewares import BodySizeLimitMiddleware
+from openai_proxy.openai_compat import MessageTooLargeError, normalize_chat_completion_request
+
+BODY_LIMIT = 16
+OK = 200
+REQUEST_ENTITY_TOO_LARGE = 413
+
+
+def _make_client(metrics: ProxyMetrics) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/limited")
+    async def limited(request: Request) -> dict[str, int]:
+        return {"size": len(await request.body())}
+
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/limited": BODY_LIMIT}, metrics=metrics)
+    return TestClient(app)
+
+
+def test_body_within_limit_passes() -> None:
+    metrics = ProxyMetrics()
+
+    response = _make_client(metrics).post("/limited", content=b"x" * BODY_LIMIT)
+
+    assert response.status_code == OK
+    assert response.json() == {"size": BODY_LIMIT}
+    assert metrics.get("request_body_rejected_total", path="/limited") == 0
+
+
+def test_declared_content_length_is_rejected_before_reading() -> None:
+    metrics = ProxyMetrics()
+
+    response = _make_client(metrics).post("/limited", content=b"x" * (BODY_LIMIT + 1))
+
+    assert response.status_code == REQUEST_ENTITY_TOO_LARGE
+    assert metrics.get("request_body_rejected_total", path="/limited") == 1
+    assert metrics.get("request_body_rejected_bytes_total", path="/limited") == BODY_LIMIT + 1
+
+
+def test_chunked_body_is_rejected_while_receiving() -> None:
+    metrics = ProxyMetrics()
+
+    def chunks():
+        for _ in range(4):
+            yield b"x" * 8
+
+    response = _make_client(metrics).post("/limited", content=chunks())
+
+    assert response.status_code == REQUEST_ENTITY_TOO_LARGE
+    assert "16 bytes" in response.json()["detail"]
+    assert metrics.get("request_body_rejected_total", path="/limited") == 1
+
+
+def test_normalization_enforces_max_message_size() -> None:
+    request = {
+        "model": "auto",
+        "messages": [
+            {"role": "system", "content": "short"},
+            {"role": "user", "content": [{"type": "text", "text": "x" * 11}]},
+        ],
+    }
+
+    with pytest.raises(MessageTooLargeError, match="Message 1 is too large"):
+        normalize_chat_completion_request(request, max_message_size=10)
+
+    assert normalize_chat_completion_request(request, max_message_size=11) == request
@@ -1,6 +1,16 @@
+from types import SimpleNamespace
+from typing import Annotated, Optional
+
 import pytest
+from openai.types.chat import ChatCompletionMessage
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+from pydantic import BaseModel, Field
 
 from openai_proxy import schemas
+from openai_proxy.openai_compat import normalize_chat_completion_request
 
 
 def _base_message() -> schemas.OpenAIMessage:
@@ -58,3 +68,112 @@ def test_to_chat_completion_params_validates_tool_messages() -> None:
 
     with pytest.raises(ValueError, match="tool_call_id"):
         request.to_chat_completion_params()
+
+
+def test_to_chat_completion_params_is_already_normalized() -> None:
+    request = schemas.OpenAIRequest(
+        model="auto",
+        messages=[
+            _base_message(),
+            schemas.OpenAIMessage(
+                role=schemas.OpenAIRole.ASSIST,
+                tool_calls=[schemas.OpenAIToolCall(id="call_1", name="echo", arguments="{}")],
+            ),
+            schemas.OpenAIMessage(
+                role=schemas.OpenAIRole.TOOL,
+                content="{}",
+                tool_call_id="call_1",
+            ),
+        ],
+    )
+
+    params = request.to_chat_completion_params()
+
+    assert normalize_chat_completion_request(params) == params
+
+
+def test_response_reuses_request_messages_or_returns_only_new_one() -> None:
+    request = schemas.OpenAIRequest(model="auto", messages=[_base_message()])
+    gpt_message = ChatCompletionMessage(
+        role="assistant",
+        content=None,
+        tool_calls=[
+            ChatCompletionMessageToolCall(
+                id="call_1",
+                type="function",
+                function=Function(name="echo", arguments="{}"),
+            ),
+        ],
+    )
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=gpt_message)])
+
+    response = schemas.OpenAIResponse.from_gpt(request, completion)
+    request.only_new_message = True
+    only_new = schemas.OpenAIResponse.from_gpt(request, completion)
+
+    assert response.messages[0] is request.messages[0]
+    assert response.messages[1].role is schemas.OpenAIRole.ASSIST
+    assert response.messages[1].tool_calls == [
+        schemas.OpenAIToolCall(id="call_1", name="echo", arguments="{}"),
+    ]
+    assert only_new.messages == response.messages[1:]
+    assert schemas.OpenAIResponse.model_validate_json(response.model_dump_json()) == response
+
+
+class EchoArguments(BaseModel):
+    text: Annotated[str, Field(description="Text to echo")]
+    times: Annotated[Optional[int], Field(description="How many times")] = None
+
+
+def _echo_tool() -> schemas.OpenAITool:
+    return schemas.OpenAITool(
+        name="echo",
+        description="Echo text",
+        parameters=[
+            schemas.OpenAIToolParameter(
+                name="text",
+                type="string",
+                format="string",
+                description="Text to echo",
+                required=True,
+            ),
+            schemas.OpenAIToolParameter(
+                name="times",
+                type="int",
+                format="",
+                description="How many times",
+                required=False,
+            ),
+        ],
+    )
+
+
+def test_tool_schemas_are_compiled_once_per_definition() -> None:
+    schema = _echo_tool().to_gpt()
+
+    assert schema == {
+        "type": "function",
+        "function": {
+            "name": "echo",
+            "description": "Echo text",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string", "format": "string", "description": "Text to echo"},
+                    "times": {"type": "int", "format": "", "description": "How many times"},
+                },
+                "required": ["text"],
+            },
+        },
+    }
+    assert _echo_tool().to_gpt() is schema
+    changed_tool = _echo_tool()
+    changed_tool.parameters[0].required = False
+    assert changed_tool.to_gpt()["function"]["parameters"]["required"] == []
+
+
+def test_tool_from_pydantic_model_is_built_once() -> None:
+    tool = schemas.OpenAITool.from_pydantic_model("echo", "Echo text", EchoArguments)
+
+    assert tool == _echo_tool()
+    assert schemas.OpenAITool.from_pydantic_model("echo", "Echo text", EchoArguments) is tool
@@ -0,0 +1,157 @@
+import json
+from typing import Any
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+
+from openai_proxy import openai_compat, routers
+from openai_proxy.services.model_routing import ModelRouter
+from openai_proxy.services.openai_service import OpenAIService, get_openai_service
+from openai_proxy.services.provider_registry import ProviderRegistry
+from openai_proxy.services.stream_failover import StreamFailoverMode
+from openai_proxy.settings import RouteSettings, StreamingSettings
+
+OK = 200
+
+
+class FaultyStream:
+    """Stream of content chunks that breaks like a dropped connection after fail_after chunks."""
+
+    def __init__(self, contents: list[str], fail_after: int | None = None) -> None:
+        self._contents = list(contents)
+        self._fail_after = fail_after
+        self._sent = 0
+        self.closed = False
+
+    def __aiter__(self) -> "FaultyStream":
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        if self._fail_after is not None and self._sent >= self._fail_after:
+            err = "connection reset by peer"
+            raise httpx.ReadError(err)
+        if not self._contents:
+            raise StopAsyncIteration
+
+        self._sent += 1
+        return ChatCompletionChunk(
+            id="chatcmpl_1",
+            choices=[ChunkChoice(index=0, delta=ChoiceDelta(content=self._contents.pop(0)))],
+            created=0,
+            model="stub",
+            object="chat.completion.chunk",
+        )
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class StubProvider:
+    def __init__(self, stream: FaultyStream) -> None:
+        self.stream = stream
+        self.requests: list[openai_compat.OpenAICompatibleRequest] = []
+
+    async def request(
+        self,
+        request: openai_compat.OpenAICompatibleRequest,
+        *,
+        normalized: bool = False,
+    ) -> openai_compat.OpenAICompatibleResponse:
+        del normalized
+        self.requests.append(request)
+        return self.stream
+
+
+def _stream(
+    deepseek: FaultyStream,
+    official: FaultyStream,
+    failover: StreamFailoverMode,
+) -> tuple[list[dict[str, Any]], StubProvider, StubProvider]:
+    providers = {"deepseek": StubProvider(deepseek), "official": StubProvider(official)}
+    service = OpenAIService(
+        providers=ProviderRegistry(providers),
+        model_router=ModelRouter(
+            providers=providers,
+            auto_routes=[
+                RouteSettings(provider="deepseek", model="deepseek-chat", attempts=1),
+                RouteSettings(provider="official", model="gpt-4o", attempts=1),
+            ],
+        ),
+        streaming_settings=StreamingSettings(failover=failover),
+    )
+    app = FastAPI()
+    app.include_router(routers.openai_router)
+    app.dependency_overrides[get_openai_service] = lambda: service
+
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={"model": "auto", "messages": [{"role": "user", "content": "ping"}], "stream": True},
+    )
+
+    assert response.status_code == OK
+    frames = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    events = [json.loads(frame) for frame in frames if frame != "[DONE]"]
+    if frames[-1] == "[DONE]":
+        events.append({"done": True})
+    return events, providers["deepseek"], providers["official"]
+
+
+def _content(events: list[dict[str, Any]]) -> str:
+    return "".join(
+        event["choices"][0]["delta"]["content"] for event in events if "choices" in event
+    )
+
+
+def test_failure_before_first_token_retries_next_route() -> None:
+    deepseek = FaultyStream(["never"], fail_after=0)
+    official = FaultyStream(["po", "ng"])
+
+    events, _, official_provider = _stream(deepseek, official, "before_first_token")
+
+    assert _content(events) == "pong"
+    assert events[-1] == {"done": True}
+    assert deepseek.closed
+    assert official_provider.requests[0]["model"] == "gpt-4o"
+
+
+def test_failure_after_tokens_ends_with_error_frame() -> None:
+    deepseek = FaultyStream(["po", "ng"], fail_after=1)
+
+    events, _, official_provider = _stream(deepseek, FaultyStream(["pong"]), "before_first_token")
+
+    assert _content(events) == "po"
+    assert events[-1]["error"]["type"] == "upstream_error"
+    assert "connection reset" in events[-1]["error"]["message"]
+    assert not official_provider.requests
+    assert deepseek.closed
+
+
+def test_failure_after_tokens_continues_with_prefix() -> None:
+    deepseek = FaultyStream(["po", "ng"], fail_after=1)
+    official = FaultyStream(["ng"])
+
+    events, _, official_provider = _stream(deepseek, official, "continue")
+
+    assert _content(events) == "pong"
+    assert events[-1] == {"done": True}
+    last_message = list(official_provider.requests[0]["messages"])[-1]
+    assert last_message == {"role": "assistant", "content": "po"}
+
+
+def test_failover_is_disabled_with_none() -> None:
+    events, _, official_provider = _stream(
+        FaultyStream(["never"], fail_after=0),
+        FaultyStream(["pong"]),
+        "none",
+    )
+
+    assert [event["error"]["code"] for event in events] == ["upstream_error"]
+    assert not official_provider.requests
+
+
+def test_failover_is_disabled_by_default() -> None:
+    assert StreamingSettings.model_construct().failover == "none"
@@ -0,0 +1,244 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Sequence
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+from starlette.types import Message
+
+from openai_proxy import openai_compat, routers
+from openai_proxy.metrics import ProxyMetrics, get_proxy_metrics
+from openai_proxy.services.openai_service import OpenAIService, get_openai_service
+from openai_proxy.services.provider_registry import ProviderRegistry
+from openai_proxy.settings import StreamingSettings
+from openai_proxy.streaming import (
+    DisconnectAwareStreamingResponse,
+    StreamTimeoutError,
+    TimeLimitedAsyncStream,
+    coalesce_frames,
+)
+
+OK = 200
+TIMEOUT = 0.05
+FRAME_BYTES = 100
+FRAMES_COUNT = 5000
+MAX_BYTES = 1024
+
+
+class SlowStream:
+    def __init__(self, delays: Sequence[float]) -> None:
+        self._delays = list(delays)
+        self.closed = False
+
+    def __aiter__(self) -> "SlowStream":
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        if not self._delays:
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delays.pop(0))
+        return ChatCompletionChunk(
+            id="chatcmpl_1",
+            choices=[ChunkChoice(index=0, delta=ChoiceDelta(content="x"))],
+            created=0,
+            model="gpt-4.1",
+            object="chat.completion.chunk",
+        )
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_time_limited_stream_fails_on_idle_and_max_duration() -> None:
+    idle = TimeLimitedAsyncStream(SlowStream([0, 1]), idle_timeout=TIMEOUT, max_duration=None)
+    long = TimeLimitedAsyncStream(
+        SlowStream([TIMEOUT / 2] * 10),
+        idle_timeout=TIMEOUT,
+        max_duration=TIMEOUT * 2,
+    )
+
+    with pytest.raises(StreamTimeoutError) as idle_error:
+        _ = [chunk async for chunk in idle]
+    with pytest.raises(StreamTimeoutError) as long_error:
+        _ = [chunk async for chunk in long]
+
+    assert idle_error.value.reason == "idle_timeout"
+    assert long_error.value.reason == "max_duration"
+
+
+def test_stalled_upstream_ends_with_sse_error_frame() -> None:
+    upstream = SlowStream([0, 1])
+    service = OpenAIService(
+        providers=ProviderRegistry({"official": _Provider(upstream)}),
+        streaming_settings=StreamingSettings(idle_timeout=TIMEOUT, max_duration=None),
+    )
+    app = FastAPI()
+    app.include_router(routers.openai_router)
+    app.dependency_overrides[get_openai_service] = lambda: service
+    aborted_before = _aborted("idle_timeout", "/v1/chat/completions")
+
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={
+            "model": "official:gpt-4.1",
+            "messages": [{"role": "user", "content": "ping"}],
+            "stream": True,
+        },
+    )
+
+    frames = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    assert response.status_code == OK
+    assert json.loads(frames[0])["choices"][0]["delta"]["content"] == "x"
+    assert json.loads(frames[-1])["error"]["code"] == "idle_timeout"
+    assert "[DONE]" not in frames
+    assert upstream.closed
+    assert _aborted("idle_timeout", "/v1/chat/completions") == aborted_before + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("disconnect_after", [0, TIMEOUT])
+async def test_client_disconnect_closes_upstream_at_once(disconnect_after: float) -> None:
+    upstream = SlowStream([0] + [10] * 10)
+    metrics = ProxyMetrics()
+    sent: list[Message] = []
+
+    async def body() -> AsyncIterator[str]:
+        async for chunk in upstream:
+            yield chunk.model_dump_json()
+
+    async def receive() -> Message:
+        await asyncio.sleep(disconnect_after)
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    response = DisconnectAwareStreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        upstream=upstream,
+        metrics=metrics,
+    )
+    await asyncio.wait_for(response({"type": "http", "path": "/stream"}, receive, send), 1)
+
+    assert upstream.closed
+    assert metrics.get("stream_aborted_total", reason="client_disconnect", path="/stream") == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesce_frames_passes_first_token_at_once_and_batches_the_rest() -> None:
+    written: list[tuple[float, str]] = []
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def frames() -> AsyncIterator[tuple[str, bool]]:
+        yield "role;", False
+        yield "a;", True
+        for _ in range(3):
+            await asyncio.sleep(TIMEOUT / 10)
+            yield "b;", True
+        yield "c" * 10, True
+        raise StreamTimeoutError(reason="idle_timeout", timeout=TIMEOUT)
+
+    async def write() -> None:
+        async for batch in coalesce_frames(frames(), max_delay=TIMEOUT, max_bytes=10):
+            written.append((loop.time() - started, batch))
+
+    with pytest.raises(StreamTimeoutError):
+        await write()
+
+    assert [batch for _, batch in written] == ["role;a;", "b;b;b;" + "c" * 10]
+    assert written[0][0] < TIMEOUT / 10
+
+
+@pytest.mark.asyncio
+async def test_coalesce_frames_flushes_on_delay_while_upstream_stalls() -> None:
+    written: list[str] = []
+
+    async def frames() -> AsyncIterator[tuple[str, bool]]:
+        yield "a;", True
+        await asyncio.sleep(TIMEOUT / 10)
+        yield "b;", True
+        await asyncio.sleep(TIMEOUT * 4)
+        yield "c;", True
+
+    async for batch in coalesce_frames(frames(), max_delay=TIMEOUT, max_bytes=1024):
+        written.append(batch)
+
+    assert written == ["a;", "b;", "c;"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_frames_stops_reading_while_consumer_is_slow() -> None:
+    frame = "x" * FRAME_BYTES
+    read_frames = 0
+
+    async def frames() -> AsyncIterator[tuple[str, bool]]:
+        nonlocal read_frames
+        for _ in range(FRAMES_COUNT):
+            read_frames += 1
+            yield frame, True
+
+    batches: list[str] = []
+    async for batch in coalesce_frames(frames(), max_delay=TIMEOUT, max_bytes=MAX_BYTES):
+        if not batches:
+            await asyncio.sleep(TIMEOUT)
+            # пока потребитель стоит, поток читается не дальше одного полного буфера
+            assert read_frames * FRAME_BYTES <= MAX_BYTES + 2 * FRAME_BYTES
+        batches.append(batch)
+
+    assert "".join(batches) == frame * FRAMES_COUNT
+    assert max(map(len, batches)) < MAX_BYTES + FRAME_BYTES
+
+
+def test_coalesced_chat_stream_keeps_every_frame(monkeypatch: pytest.MonkeyPatch) -> None:
+    upstream = SlowStream([0] * 5)
+    service = OpenAIService(
+        providers=ProviderRegistry({"official": _Provider(upstream)}),
+        streaming_settings=StreamingSettings(),
+    )
+    settings = StreamingSettings(coalesce_max_delay=TIMEOUT)
+    monkeypatch.setattr(routers, "get_streaming_settings", lambda: settings)
+    app = FastAPI()
+    app.include_router(routers.openai_router)
+    app.dependency_overrides[get_openai_service] = lambda: service
+
+    response = TestClient(app).post(
+        "/v1/chat/completions",
+        json={
+            "model": "official:gpt-4.1",
+            "messages": [{"role": "user", "content": "ping"}],
+            "stream": True,
+        },
+    )
+
+    frames = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    assert [json.loads(frame)["choices"][0]["delta"]["content"] for frame in frames[:-1]] == [
+        "x",
+    ] * 5
+    assert frames[-1] == "[DONE]"
+    assert upstream.closed
+
+
+class _Provider:
+    def __init__(self, stream: SlowStream) -> None:
+        self._stream = stream
+
+    async def request(
+        self,
+        request: openai_compat.OpenAICompatibleRequest,
+        *,
+        normalized: bool = False,
+    ) -> openai_compat.OpenAICompatibleResponse:
+        # поток отдается на любой запрос
+        del request, normalized
+        return self._stream
+
+
+def _aborted(reason: str, path: str) -> float:
+    return get_proxy_metrics().get("stream_aborted_total", reason=reason, path=path)
@@ -0,0 +1,153 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion
+from pytest_mock import MockerFixture
+
+from openai_proxy.tool_call_client import ToolCallBudget
+from tests.tool_call_stubs import (
+    EchoToolClient,
+    RecordingEchoClient,
+    make_looping_stream_openai,
+    make_tool_call,
+    make_tool_calls_answer,
+    patch_openai,
+)
+
+MAX_ROUND_TRIPS = 2
+SLOW_MODEL_SECONDS = 0.04
+
+
+def _make_looping_openai(mocker: MockerFixture, usage: CompletionUsage) -> AsyncMock:
+    # модель бесконечно просит вызвать тул
+    completion = make_tool_calls_answer([make_tool_call()], content="step")
+    create = AsyncMock(return_value=completion.model_copy(update={"usage": usage}))
+    patch_openai(mocker, create)
+    return create
+
+
+@pytest.mark.asyncio
+async def test_request_with_usage_stops_on_max_round_trips(mocker: MockerFixture) -> None:
+    usage = CompletionUsage.model_validate(
+        {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "cost_rub": 0.5},
+    )
+    create = _make_looping_openai(mocker, usage)
+    client = EchoToolClient()
+
+    result = await client.request_with_usage(
+        "ping",
+        ToolCallBudget(max_round_trips=MAX_ROUND_TRIPS),
+    )
+
+    assert create.await_count == MAX_ROUND_TRIPS
+    assert result.stop_reason == "max_round_trips"
+    assert result.content == "\n".join(["step"] * MAX_ROUND_TRIPS)
+    assert result.usage.round_trips == MAX_ROUND_TRIPS
+    assert result.usage.total_tokens == MAX_ROUND_TRIPS * usage.total_tokens
+    assert result.usage.cost == pytest.approx(MAX_ROUND_TRIPS * 0.5)
+    # на последний запрос тулов история все равно получает ответы
+    assert client.session.messages[-1]["role"] == "tool"
+    assert "max_round_trips" in client.session.messages[-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_request_with_usage_stops_on_cost_and_tokens(mocker: MockerFixture) -> None:
+    usage = CompletionUsage.model_validate(
+        {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "cost_rub": 0.5},
+    )
+    create = _make_looping_openai(mocker, usage)
+    client = EchoToolClient()
+
+    by_cost = await client.request_with_usage("ping", ToolCallBudget(max_cost=1.0))
+    by_tokens = await client.request_with_usage("ping", ToolCallBudget(max_total_tokens=40))
+
+    assert by_cost.stop_reason == "max_cost"
+    assert by_cost.usage.round_trips == MAX_ROUND_TRIPS
+    assert by_tokens.stop_reason == "max_total_tokens"
+    assert create.await_count == MAX_ROUND_TRIPS + MAX_ROUND_TRIPS + 1
+
+
+@pytest.mark.asyncio
+async def test_request_with_usage_stops_on_deadline(mocker: MockerFixture) -> None:
+    create = _make_looping_openai(
+        mocker,
+        CompletionUsage(prompt_tokens=1, completion_tokens=1, total_tokens=2),
+    )
+    completion = create.return_value
+
+    async def slow_create(**_kwargs: object) -> ChatCompletion:
+        await asyncio.sleep(SLOW_MODEL_SECONDS)
+        return completion
+
+    create.side_effect = slow_create
+    client = EchoToolClient()
+
+    result = await client.request_with_usage(
+        "ping",
+        ToolCallBudget(deadline_seconds=SLOW_MODEL_SECONDS * 2.5),
+    )
+
+    assert result.stop_reason == "deadline"
+    assert result.usage.round_trips == MAX_ROUND_TRIPS
+    assert client.session.messages[-1]["role"] == "tool"
+
+
+@pytest.mark.asyncio
+async def test_request_stream_stops_on_round_trips_and_cost(mocker: MockerFixture) -> None:
+    events: list[str] = []
+    usage = CompletionUsage.model_validate(
+        {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15, "cost_rub": 0.5},
+    )
+    create = make_looping_stream_openai(mocker, events, usage)
+    client = RecordingEchoClient(events)
+
+    by_round_trips = [
+        delta
+        async for delta in client.request_stream(
+            "ping",
+            ToolCallBudget(max_round_trips=MAX_ROUND_TRIPS),
+        )
+    ]
+
+    assert by_round_trips == ["step", "\n", "step"]
+    assert create.await_count == MAX_ROUND_TRIPS
+    assert create.await_args_list[-1].kwargs["stream_options"] == {"include_usage": True}
+    # на последнем круге тул не запускается, но история получает ответ на его вызов
+    assert events.count("tool:a") == MAX_ROUND_TRIPS - 1
+    assert client.session.messages[-1]["role"] == "tool"
+    assert "max_round_trips" in client.session.messages[-1]["content"]
+
+    by_cost = [
+        delta async for delta in client.request_stream("ping", ToolCallBudget(max_cost=1.0))
+    ]
+
+    assert by_cost == ["step", "\n", "step"]
+    assert create.await_count == MAX_ROUND_TRIPS * 2
+    assert "max_cost" in client.session.messages[-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_request_stream_stops_on_deadline(mocker: MockerFixture) -> None:
+    events: list[str] = []
+    create = make_looping_stream_openai(
+        mocker,
+        events,
+        CompletionUsage(prompt_tokens=1, completion_tokens=1, total_tokens=2),
+    )
+    client = RecordingEchoClient(events)
+
+    deltas = [
+        delta
+        async for delta in client.request_stream(
+            "ping",
+            ToolCallBudget(deadline_seconds=SLOW_MODEL_SECONDS * 2.5),
+        )
+    ]
+
+    # каждый поток идет ~0.04 секунды, дедлайн обрывает второй или третий
+    assert MAX_ROUND_TRIPS <= create.await_count <= MAX_ROUND_TRIPS + 1
+    assert deltas[0] == "step"
+    assert client.session.messages[-1]["role"] in {"assistant", "tool"}
+    assert not client.session.messages[-1].get("tool_calls")
@@ -0,0 +1,159 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from openai.types.chat import ChatCompletion
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from pydantic import BaseModel
+from pytest_mock import MockerFixture
+
+from openai_proxy import OpenAIProxyToolCallClient
+from openai_proxy.tool_call_client import ToolCachePolicy
+from openai_proxy.tool_call_client.tool_cache import ToolResultCache
+from tests.tool_call_stubs import (
+    SYSTEM_PROMPT,
+    make_answer,
+    make_tool_call,
+    make_tool_calls_answer,
+    patch_openai,
+    tool_messages,
+)
+
+TTL_SECONDS = 10.0
+MAX_ENTRIES = 2
+CONCURRENT_CALLS = 5
+OTHER_MULTIPLIER = 10
+
+
+class SquareRequest(BaseModel):
+    value: int
+
+
+class SquareResponse(BaseModel):
+    square: int
+
+
+class CountingClient(OpenAIProxyToolCallClient):
+    def __init__(self, multiplier: int = 1) -> None:
+        super().__init__(system_prompts=[SYSTEM_PROMPT])
+        self.calls = 0
+        self.multiplier = multiplier
+
+    @OpenAIProxyToolCallClient.tool("Square in session", cache=ToolCachePolicy())
+    async def square(self, req: SquareRequest) -> SquareResponse:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return SquareResponse(square=req.value**2)
+
+    @OpenAIProxyToolCallClient.tool(
+        "Square for everyone",
+        cache=ToolCachePolicy(scope="global"),
+    )
+    async def shared_square(self, req: SquareRequest) -> SquareResponse:
+        self.calls += 1
+        return SquareResponse(square=req.value**2 * self.multiplier)
+
+
+def _tool_round(*tool_calls: ChatCompletionMessageToolCall) -> list[ChatCompletion]:
+    return [make_tool_calls_answer(list(tool_calls)), make_answer("done")]
+
+
+@pytest.fixture(name="create")
+def create_fixture(mocker: MockerFixture) -> AsyncMock:
+    create = AsyncMock()
+    patch_openai(mocker, create)
+    return create
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_are_coalesced(create: AsyncMock) -> None:
+    client = CountingClient()
+    # одинаковые аргументы в разной записи дают одну и ту же провалидированную модель
+    tool_calls = [
+        make_tool_call(name="square", arguments='{"value": 3}' if index % 2 else '{"value":3}')
+        for index in range(CONCURRENT_CALLS)
+    ]
+    create.side_effect = [*_tool_round(*tool_calls), *_tool_round(tool_calls[0])]
+
+    await client.request("ping")
+    await client.request("ping")
+
+    assert client.calls == 1
+    assert [json.loads(m["content"]) for m in tool_messages(client.session)] == [
+        {"square": 9},
+    ] * (CONCURRENT_CALLS + 1)
+
+
+@pytest.mark.asyncio
+async def test_session_scope_is_isolated_and_global_scope_is_shared(
+    create: AsyncMock,
+) -> None:
+    client = CountingClient()
+    other = client.create_session()
+    square = make_tool_call(name="square", arguments='{"value":2}')
+    shared_square = make_tool_call(name="shared_square", arguments='{"value":2}')
+    create.side_effect = [
+        *_tool_round(square),
+        *_tool_round(square),
+        *_tool_round(shared_square),
+        *_tool_round(shared_square),
+    ]
+
+    await client.request("ping")
+    await other.request("ping")
+    assert client.calls == MAX_ENTRIES
+
+    await client.request("ping")
+    await other.request("ping")
+    assert client.calls == MAX_ENTRIES + 1
+
+
+@pytest.mark.asyncio
+async def test_global_scope_is_not_shared_between_clients(create: AsyncMock) -> None:
+    client = CountingClient()
+    other_client = CountingClient(multiplier=OTHER_MULTIPLIER)
+    shared_square = make_tool_call(name="shared_square", arguments='{"value":2}')
+    create.side_effect = [*_tool_round(shared_square), *_tool_round(shared_square)]
+
+    await client.request("ping")
+    await other_client.request("ping")
+
+    assert json.loads(tool_messages(client.session)[-1]["content"]) == {"square": 4}
+    assert json.loads(tool_messages(other_client.session)[-1]["content"]) == {
+        "square": 4 * OTHER_MULTIPLIER,
+    }
+    assert (client.calls, other_client.calls) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_result_cache_expires_evicts_and_skips_errors() -> None:
+    now = 0.0
+    cache = ToolResultCache(
+        ToolCachePolicy(ttl_seconds=TTL_SECONDS, max_entries=MAX_ENTRIES),
+        now_provider=lambda: now,
+    )
+    calls: list[str] = []
+
+    async def call(result: str) -> str:
+        calls.append(result)
+        return result
+
+    async def fail() -> str:
+        calls.append("fail")
+        raise RuntimeError
+
+    assert await cache.get_or_call("a", lambda: call("a1")) == "a1"
+    assert await cache.get_or_call("a", lambda: call("a2")) == "a1"
+    now = TTL_SECONDS
+    assert await cache.get_or_call("a", lambda: call("a3")) == "a3"
+
+    await cache.get_or_call("b", lambda: call("b"))
+    await cache.get_or_call("c", lambda: call("c"))
+    assert len(cache) == MAX_ENTRIES
+    assert await cache.get_or_call("a", lambda: call("a4")) == "a4"
+
+    for _ in range(MAX_ENTRIES):
+        with pytest.raises(RuntimeError):
+            await cache.get_or_call("d", fail)
+    assert calls == ["a1", "a3", "b", "c", "a4", "fail", "fail"]
@@ -1,116 +1,57 @@
-from types import SimpleNamespace
-from typing import Annotated
+import asyncio
+import json
 from unittest.mock import AsyncMock
 
 import pytest
-from openai.types.chat import ChatCompletion, ChatCompletionMessage
-from openai.types.chat.chat_completion import Choice
-from openai.types.chat.chat_completion_message_tool_call import (
-    ChatCompletionMessageToolCall,
-    Function,
-)
-from pydantic import BaseModel, Field
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from pytest_mock import MockerFixture
 
 from openai_proxy import OpenAIProxyToolCallClient
+from tests.tool_call_stubs import (
+    SYSTEM_PROMPT,
+    EchoRequest,
+    EchoResponse,
+    EchoToolClient,
+    FakeChunkStream,
+    RecordingEchoClient,
+    make_answer,
+    make_chunk,
+    make_tool_call,
+    make_tool_call_delta_chunk,
+    make_tool_calls_answer,
+    mock_tool_round,
+    patch_openai,
+    tool_messages,
+)
 
 EXPECTED_CHAT_COMPLETION_CALLS = 2
-
-
-class EchoRequest(BaseModel):
-    text: Annotated[str, Field(description="Text to echo")]
-
-
-class EchoResponse(BaseModel):
-    echoed: Annotated[str, Field(description="Echoed text")]
-
-
-class EchoToolClient(OpenAIProxyToolCallClient):
-    def __init__(self) -> None:
-        super().__init__(system_prompts=["You are a helpful assistant"])
-
-    @OpenAIProxyToolCallClient.tool("Echo text")
-    async def echo(self, req: EchoRequest) -> EchoResponse:
-        return EchoResponse(echoed=req.text)
-
-
-def _make_tool_call() -> ChatCompletionMessageToolCall:
-    return ChatCompletionMessageToolCall(
-        id="call_1",
-        type="function",
-        function=Function(
-            name="echo",
-            arguments='{"text":"hi"}',
-        ),
-    )
-
-
-def _make_completion(
-    message: ChatCompletionMessage,
-    finish_reason: str,
-) -> ChatCompletion:
-    return ChatCompletion(
-        id="chatcmpl_1",
-        choices=[Choice(finish_reason=finish_reason, index=0, message=message)],
-        created=0,
-        model="gpt-4.1",
-        object="chat.completion",
-    )
+MAX_PARALLEL_TOOLS = 2
 
 
 @pytest.mark.asyncio
 async def test_call_tool_reads_name_and_arguments_from_function_payload(
-    mocker,
+    mocker: MockerFixture,
 ) -> None:
-    fake_openai = SimpleNamespace(close=AsyncMock())
-    mocker.patch(
-        "openai_proxy.tool_call_client.client.DefaultAsyncHttpxClient",
-        return_value=object(),
-    )
-    mocker.patch(
-        "openai_proxy.tool_call_client.client.AsyncOpenAI",
-        return_value=fake_openai,
-    )
+    mock_tool_round(mocker, [make_tool_call()])
     client = EchoToolClient()
 
-    await client._call_tool(_make_tool_call())
+    await client.request("ping")
 
-    assert client._messages[-1] == {
-        "role": "tool",
-        "content": '{"echoed":"hi"}',
-        "tool_call_id": "call_1",
-    }
+    assert tool_messages(client.session) == [
+        {
+            "role": "tool",
+            "content": '{"echoed":"hi"}',
+            "tool_call_id": "call_1",
+        },
+    ]
     await client.close()
 
 
 @pytest.mark.asyncio
 async def test_request_executes_tool_call_from_official_openai_response(
-    mocker,
+    mocker: MockerFixture,
 ) -> None:
-    tool_call = _make_tool_call()
-    create = AsyncMock(
-        side_effect=[
-            _make_completion(
-                ChatCompletionMessage(role="assistant", content=None, tool_calls=[tool_call]),
-                "tool_calls",
-            ),
-            _make_completion(
-                ChatCompletionMessage(role="assistant", content="done", tool_calls=None),
-                "stop",
-            ),
-        ],
-    )
-    fake_openai = SimpleNamespace(
-        chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
-        close=AsyncMock(),
-    )
-    mocker.patch(
-        "openai_proxy.tool_call_client.client.DefaultAsyncHttpxClient",
-        return_value=object(),
-    )
-    mocker.patch(
-        "openai_proxy.tool_call_client.client.AsyncOpenAI",
-        return_value=fake_openai,
-    )
+    create = mock_tool_round(mocker, [make_tool_call()])
     client = EchoToolClient()
 
     result = await client.request("ping")
@@ -136,3 +77,149 @@ async def test_request_executes_tool_call_from_official_openai_response(
         "tool_call_id": "call_1",
     }
     await client.close()
+
+
+class SlowToolClient(OpenAIProxyToolCallClient):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(system_prompts=[SYSTEM_PROMPT], **kwargs)
+        self.running = 0
+        self.max_running = 0
+
+    @OpenAIProxyToolCallClient.tool("Echo text after a delay")
+    async def slow_echo(self, req: EchoRequest) -> EchoResponse:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        # первый вызов самый медленный, чтобы порядок завершения отличался от порядка вызовов
+        await asyncio.sleep(0.05 if req.text == "0" else 0.01)
+        self.running -= 1
+        if req.text == "fail":
+            err = "tool failed"
+            raise RuntimeError(err)
+        return EchoResponse(echoed=req.text)
+
+
+def _make_slow_tool_call(call_id: str, text: str) -> ChatCompletionMessageToolCall:
+    return make_tool_call(call_id, "slow_echo", json.dumps({"text": text}))
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_and_keep_order(mocker: MockerFixture) -> None:
+    tool_calls = [
+        _make_slow_tool_call("call_0", "0"),
+        _make_slow_tool_call("call_1", "fail"),
+        _make_slow_tool_call("call_2", "2"),
+        make_tool_call("call_3", "slow_echo", "{not json"),
+        make_tool_call("call_4", "unknown", "{}"),
+    ]
+    mock_tool_round(mocker, tool_calls)
+    client = SlowToolClient(max_parallel_tools=MAX_PARALLEL_TOOLS)
+
+    await client.request("ping")
+
+    messages = tool_messages(client.session)
+    assert [m["tool_call_id"] for m in messages] == [c.id for c in tool_calls]
+    assert messages[0]["content"] == '{"echoed":"0"}'
+    assert "RuntimeError: tool failed" in messages[1]["content"]
+    assert messages[2]["content"] == '{"echoed":"2"}'
+    assert "ValidationError" in messages[3]["content"]
+    assert "NotImplementedError" in messages[4]["content"]
+    assert client.max_running == MAX_PARALLEL_TOOLS
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout_becomes_error_message(mocker: MockerFixture) -> None:
+    mock_tool_round(mocker, [_make_slow_tool_call("call_0", "0")])
+    client = SlowToolClient(tool_timeout=0.001)
+
+    await client.request("ping")
+
+    assert "TimeoutError" in tool_messages(client.session)[-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_request_stream_starts_tools_before_stream_ends(mocker: MockerFixture) -> None:
+    events: list[str] = []
+    first_turn = FakeChunkStream(
+        [
+            make_chunk(content="Let me check"),
+            make_tool_call_delta_chunk(0, '{"text":', "call_1"),
+            make_tool_call_delta_chunk(0, '"a"}'),
+            make_tool_call_delta_chunk(1, '{"text":"b"}', "call_2"),
+            make_chunk(content="."),
+        ],
+        events,
+    )
+    second_turn = FakeChunkStream([make_chunk(content="do"), make_chunk(content="ne")], events)
+    create = AsyncMock(side_effect=[first_turn, second_turn])
+    patch_openai(mocker, create)
+    client = RecordingEchoClient(events)
+
+    deltas = [delta async for delta in client.request_stream("ping")]
+
+    assert deltas == ["Let me check", ".", "\n", "do", "ne"]
+    # первый тул выполнен, пока первый поток еще не закончился
+    first_turn_last_chunk = [i for i, event in enumerate(events) if event == "chunk"][4]
+    assert events.index("tool:a") < first_turn_last_chunk
+    assert events.index("tool:a") < events.index("tool:b")
+    assert first_turn.closed is True
+    assert create.await_args_list[0].kwargs["stream"] is True
+    assistant_message, *messages = client.session.messages[2:5]
+    assert assistant_message["content"] == "Let me check."
+    assert [c["function"]["arguments"] for c in assistant_message["tool_calls"]] == [
+        '{"text":"a"}',
+        '{"text":"b"}',
+    ]
+    assert [m["content"] for m in messages] == ['{"echoed":"a"}', '{"echoed":"b"}']
+    assert client.session.messages[-1] == {"role": "assistant", "content": "done"}
+
+
+class PlainClient(OpenAIProxyToolCallClient):
+    def __init__(self) -> None:
+        super().__init__(system_prompts=[SYSTEM_PROMPT])
+
+    async def shout(self, req: EchoRequest) -> EchoResponse:
+        return EchoResponse(echoed=req.text.upper())
+
+
+@pytest.mark.asyncio
+async def test_tools_are_cached_per_class_and_refreshed_on_marking(
+    mocker: MockerFixture,
+) -> None:
+    shout_call = make_tool_call(name="shout")
+    create = AsyncMock(
+        side_effect=[
+            make_tool_calls_answer([make_tool_call(arguments='{"text":"a"}')]),
+            make_answer("done"),
+            make_tool_calls_answer([make_tool_call(arguments='{"text":"b"}')]),
+            make_answer("done"),
+            make_tool_calls_answer([shout_call]),
+            make_answer("done"),
+            make_tool_calls_answer([shout_call]),
+            make_answer("done"),
+        ],
+    )
+    patch_openai(mocker, create)
+    first_events: list[str] = []
+    second_events: list[str] = []
+    first = RecordingEchoClient(first_events)
+    second = RecordingEchoClient(second_events)
+    plain = PlainClient()
+
+    await first.request("ping")
+    await second.request("ping")
+    await plain.request("ping")
+
+    # описание тулов собирается один раз на класс, но тулы вызываются у своего объекта
+    assert (first_events, second_events) == (["tool:a"], ["tool:b"])
+    first_tools, second_tools = (call.kwargs["tools"] for call in create.await_args_list[:2])
+    assert first_tools is second_tools
+    assert "tools" not in create.await_args_list[4].kwargs
+    assert "NotImplementedError" in tool_messages(plain.session)[-1]["content"]
+
+    OpenAIProxyToolCallClient.mark_tool_methods(plain, {"shout": "Shout text"})
+    await plain.request("ping")
+
+    assert tool_messages(plain.session)[-1]["content"] == '{"echoed":"HI"}'
+    assert [tool.name for tool in OpenAIProxyToolCallClient.collect_tools(PlainClient())] == [
+        "shout",
+    ]
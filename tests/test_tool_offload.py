@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from pydantic import BaseModel
+from pytest_mock import MockerFixture
+
+from openai_proxy import OpenAIProxyToolCallClient
+from openai_proxy.tool_call_client.models import ClientTool
+from tests.tool_call_stubs import SYSTEM_PROMPT, make_tool_call, mock_tool_round, tool_messages
+
+WORK_ARGUMENTS = '{"seconds": 0.05}'
+
+
+class WorkRequest(BaseModel):
+    seconds: float
+
+
+class WorkResponse(BaseModel):
+    pid: int
+    thread_id: int
+
+
+class OffloadClient(OpenAIProxyToolCallClient):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(system_prompts=[SYSTEM_PROMPT], **kwargs)
+
+    @OpenAIProxyToolCallClient.tool("Blocking work in a thread")
+    def blocking(self, req: WorkRequest) -> WorkResponse:
+        time.sleep(req.seconds)
+        return WorkResponse(pid=os.getpid(), thread_id=threading.get_ident())
+
+    @staticmethod
+    @OpenAIProxyToolCallClient.tool("CPU work in a process", offload="process")
+    def in_process(req: WorkRequest) -> WorkResponse:
+        time.sleep(req.seconds)
+        return WorkResponse(pid=os.getpid(), thread_id=threading.get_ident())
+
+
+@pytest.mark.asyncio
+async def test_sync_tools_run_off_the_event_loop(mocker: MockerFixture) -> None:
+    mock_tool_round(
+        mocker,
+        [
+            make_tool_call("call_0", "blocking", WORK_ARGUMENTS),
+            make_tool_call("call_1", "blocking", WORK_ARGUMENTS),
+            make_tool_call("call_2", "in_process", WORK_ARGUMENTS),
+        ],
+    )
+    with (
+        ThreadPoolExecutor(max_workers=2) as thread_pool,
+        ProcessPoolExecutor(max_workers=1) as process_pool,
+    ):
+        client = OffloadClient(thread_pool=thread_pool, process_pool=process_pool)
+
+        await client.request("ping")
+
+    results = [json.loads(message["content"]) for message in tool_messages(client.session)]
+    thread_ids = {result["thread_id"] for result in results[:2]}
+    assert threading.get_ident() not in thread_ids
+    assert len(thread_ids) == len(results[:2])
+    assert results[0]["pid"] == os.getpid()
+    assert results[2]["pid"] != os.getpid()
+
+
+def test_decorator_validates_offload() -> None:
+    # декоратор проверяет только сигнатуры, тела не вызываются
+    async def async_tool(self, req: WorkRequest) -> WorkResponse:
+        del self, req
+        raise NotImplementedError
+
+    def method_tool(self, req: WorkRequest) -> WorkResponse:
+        del self, req
+        raise NotImplementedError
+
+    with pytest.raises(TypeError, match="runs on the event loop"):
+        OpenAIProxyToolCallClient.tool("async", offload="thread")(async_tool)
+    with pytest.raises(TypeError, match="staticmethod"):
+        OpenAIProxyToolCallClient.tool("method", offload="process")(method_tool)
+    with pytest.raises(TypeError, match="can not be offloaded"):
+        ClientTool(
+            name="async",
+            description="async",
+            tool_schema={},
+            param_type=WorkRequest,
+            python_method=async_tool,
+            offload="thread",
+        )
@@ -0,0 +1,94 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion
+from pytest_mock import MockerFixture
+
+from openai_proxy.tool_call_client import ToolCallBudget
+from tests.tool_call_stubs import (
+    SYSTEM_PROMPT,
+    EchoToolClient,
+    RecordingEchoClient,
+    make_answer,
+    make_looping_stream_openai,
+    patch_openai,
+)
+
+MAX_ROUND_TRIPS = 2
+SESSIONS_COUNT = 3
+SESSION_MESSAGES_AFTER_ONE_REQUEST = 3
+
+
+def _make_replying_create(
+    sent_messages: list[list[dict[str, Any]]],
+) -> Callable[..., Awaitable[ChatCompletion]]:
+    async def create(**kwargs: Any) -> ChatCompletion:
+        sent_messages.append(list(kwargs["messages"]))
+        # переключаемся между сессиями посреди запроса
+        await asyncio.sleep(0.01)
+        return make_answer(f"re: {kwargs['messages'][-1]['content']}")
+
+    return create
+
+
+@pytest.mark.asyncio
+async def test_sessions_keep_isolated_histories_over_one_client(mocker: MockerFixture) -> None:
+    http_client = patch_openai(mocker, _make_replying_create([]))
+    client = EchoToolClient()
+    sessions = [client.create_session() for _ in range(SESSIONS_COUNT)]
+
+    answers = await asyncio.gather(
+        *(session.request(f"hi {index}") for index, session in enumerate(sessions)),
+    )
+    await sessions[0].request("again")
+
+    # все сессии ходят через один пул соединений клиента
+    assert http_client.call_count == 1
+    assert answers == [f"re: hi {index}" for index in range(SESSIONS_COUNT)]
+    assert [m["content"] for m in sessions[0].messages] == [
+        SYSTEM_PROMPT,
+        "hi 0",
+        "re: hi 0",
+        "again",
+        "re: again",
+    ]
+    assert len(sessions[1].messages) == SESSION_MESSAGES_AFTER_ONE_REQUEST
+    assert client.session.messages == [{"role": "system", "content": SYSTEM_PROMPT}]
+
+
+@pytest.mark.asyncio
+async def test_request_many_answers_each_prompt_in_new_session(mocker: MockerFixture) -> None:
+    sent_messages: list[list[dict[str, Any]]] = []
+    patch_openai(mocker, _make_replying_create(sent_messages))
+    client = EchoToolClient()
+    prompts = [f"hi {index}" for index in range(SESSIONS_COUNT)]
+
+    results = [result async for result in client.request_many(prompts, concurrency=2)]
+
+    assert [result.unwrap() for result in results] == [f"re: {prompt}" for prompt in prompts]
+    # каждый запрос видит только системный промпт и свой вопрос
+    assert [len(messages) for messages in sent_messages] == [2] * SESSIONS_COUNT
+    assert len(client.session.messages) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_request_stream_passes_budget(mocker: MockerFixture) -> None:
+    events: list[str] = []
+    usage = CompletionUsage(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+    create = make_looping_stream_openai(mocker, events, usage)
+    session = RecordingEchoClient(events).create_session()
+
+    deltas = [
+        delta
+        async for delta in session.request_stream(
+            "ping",
+            ToolCallBudget(max_round_trips=MAX_ROUND_TRIPS),
+        )
+    ]
+
+    assert deltas == ["step", "\n", "step"]
+    assert create.await_count == MAX_ROUND_TRIPS
+    assert "max_round_trips" in session.messages[-1]["content"]
@@ -0,0 +1,205 @@
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Annotated, Any, Literal
+from unittest.mock import AsyncMock, MagicMock
+
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import (
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+from pydantic import BaseModel, Field
+from pytest_mock import MockerFixture
+
+from openai_proxy import OpenAIProxyToolCallClient
+from openai_proxy.tool_call_client import ToolCallSession
+
+SYSTEM_PROMPT = "You are a helpful assistant"
+
+
+class EchoRequest(BaseModel):
+    text: Annotated[str, Field(description="Text to echo")]
+
+
+class EchoResponse(BaseModel):
+    echoed: Annotated[str, Field(description="Echoed text")]
+
+
+class EchoToolClient(OpenAIProxyToolCallClient):
+    def __init__(self) -> None:
+        super().__init__(system_prompts=[SYSTEM_PROMPT])
+
+    @OpenAIProxyToolCallClient.tool("Echo text")
+    async def echo(self, req: EchoRequest) -> EchoResponse:
+        return EchoResponse(echoed=req.text)
+
+
+class RecordingEchoClient(EchoToolClient):
+    def __init__(self, events: list[str]) -> None:
+        super().__init__()
+        self.events = events
+
+    @OpenAIProxyToolCallClient.tool("Echo text")
+    async def echo(self, req: EchoRequest) -> EchoResponse:
+        self.events.append(f"tool:{req.text}")
+        return EchoResponse(echoed=req.text)
+
+
+def make_tool_call(
+    call_id: str = "call_1",
+    name: str = "echo",
+    arguments: str = '{"text":"hi"}',
+) -> ChatCompletionMessageToolCall:
+    return ChatCompletionMessageToolCall(
+        id=call_id,
+        type="function",
+        function=Function(name=name, arguments=arguments),
+    )
+
+
+def make_completion(
+    message: ChatCompletionMessage,
+    finish_reason: Literal["stop", "tool_calls"],
+) -> ChatCompletion:
+    return ChatCompletion(
+        id="chatcmpl_1",
+        choices=[Choice(finish_reason=finish_reason, index=0, message=message)],
+        created=0,
+        model="gpt-4.1",
+        object="chat.completion",
+    )
+
+
+def make_answer(content: str) -> ChatCompletion:
+    return make_completion(ChatCompletionMessage(role="assistant", content=content), "stop")
+
+
+def make_tool_calls_answer(
+    tool_calls: list[ChatCompletionMessageToolCall],
+    content: str | None = None,
+) -> ChatCompletion:
+    message = ChatCompletionMessage(role="assistant", content=content, tool_calls=tool_calls)
+    return make_completion(message, "tool_calls")
+
+
+def patch_openai(mocker: MockerFixture, create: Callable[..., Any] | None = None) -> MagicMock:
+    """
+    Replaces the OpenAI SDK client of OpenAIProxyToolCallClient with one calling create.
+    :return: mock of DefaultAsyncHttpxClient, its call holds the request hooks of the client.
+    """
+    http_client: MagicMock = mocker.patch(
+        "openai_proxy.tool_call_client.client.DefaultAsyncHttpxClient",
+        return_value=object(),
+    )
+    mocker.patch(
+        "openai_proxy.tool_call_client.client.AsyncOpenAI",
+        return_value=SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+            close=AsyncMock(),
+        ),
+    )
+    return http_client
+
+
+def mock_tool_round(
+    mocker: MockerFixture,
+    tool_calls: list[ChatCompletionMessageToolCall],
+) -> AsyncMock:
+    # модель один раз просит вызвать тулы и затем отвечает
+    create = AsyncMock(side_effect=[make_tool_calls_answer(tool_calls), make_answer("done")])
+    patch_openai(mocker, create)
+    return create
+
+
+def tool_messages(session: ToolCallSession) -> list[dict[str, Any]]:
+    return [message for message in session.messages if message["role"] == "tool"]
+
+
+class FakeChunkStream:
+    def __init__(self, chunks: list[ChatCompletionChunk], events: list[str]) -> None:
+        self._chunks = list(chunks)
+        self._events = events
+        self.closed = False
+
+    def __aiter__(self) -> "FakeChunkStream":
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        # отдаем управление циклу, чтобы уже запущенные тулы успели выполниться
+        await asyncio.sleep(0.01)
+        if not self._chunks:
+            raise StopAsyncIteration
+        self._events.append("chunk")
+        return self._chunks.pop(0)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def make_chunk(
+    content: str | None = None,
+    tool_call: ChoiceDeltaToolCall | None = None,
+) -> ChatCompletionChunk:
+    return ChatCompletionChunk(
+        id="chatcmpl_1",
+        choices=[
+            ChunkChoice(
+                index=0,
+                delta=ChoiceDelta(
+                    content=content,
+                    tool_calls=[tool_call] if tool_call is not None else None,
+                ),
+            ),
+        ],
+        created=0,
+        model="gpt-4.1",
+        object="chat.completion.chunk",
+    )
+
+
+def make_tool_call_delta_chunk(
+    index: int,
+    arguments: str,
+    call_id: str | None = None,
+) -> ChatCompletionChunk:
+    return make_chunk(
+        tool_call=ChoiceDeltaToolCall(
+            index=index,
+            id=call_id,
+            function=ChoiceDeltaToolCallFunction(
+                name="echo" if call_id is not None else None,
+                arguments=arguments,
+            ),
+        ),
+    )
+
+
+def make_looping_stream_openai(
+    mocker: MockerFixture,
+    events: list[str],
+    usage: CompletionUsage,
+) -> AsyncMock:
+    # модель в каждом потоке бесконечно просит вызвать тул
+    def stream_turn(**_kwargs: object) -> FakeChunkStream:
+        usage_chunk = make_chunk().model_copy(update={"choices": [], "usage": usage})
+        return FakeChunkStream(
+            [
+                make_chunk(content="step"),
+                make_tool_call_delta_chunk(0, '{"text":"a"}', "call_1"),
+                usage_chunk,
+            ],
+            events,
+        )
+
+    create = AsyncMock(side_effect=stream_turn)
+    patch_openai(mocker, create)
+    return create